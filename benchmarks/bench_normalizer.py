@@ -0,0 +1,120 @@
+"""Micro-Benchmark für die Titelbereinigung.
+
+Vergleicht die alte Schleife (ein re.sub pro Muster und Titel) mit normalize_title()
+über einen Korpus realistischer Suchtreffer, prüft dabei die identische Ausgabe und
+bricht mit Exit-Code 1 ab, wenn der Speedup des ungecachten Pfads (_normalize_title_uncached)
+unter --min-speedup fällt; der Korpus wiederholt Titel, die Memo-Zahlen sind nur informativ.
+
+    python benchmarks/bench_normalizer.py [--solves 200] [--min-speedup 1.5]
+"""
+import argparse
+import importlib
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+quiz = importlib.import_module('spotify-quiz')
+
+BASE_TITLES = [
+    "Bohemian Rhapsody", "Hotel California", "Wonderwall", "Smells Like Teen Spirit",
+    "Billie Jean", "Like a Rolling Stone", "Purple Rain", "Dancing Queen",
+    "Sweet Child O' Mine", "Heroes", "Take On Me", "Africa", "Paint It Black",
+    "Don't Stop Me Now", "Yesterday", "Imagine", "Hey Jude", "Respect",
+    "Stayin' Alive", "Born to Run", "Atemlos durch die Nacht", "99 Luftballons",
+]
+
+SUFFIXES = [
+    "", "", "", " - Remastered", " - 2011 Remaster", " - Remastered 2009", " - 2015 Remastered",
+    " (Remastered)", " [Remastered]", " (Remaster)", " [Remaster]", " - Live", " - Live at Wembley",
+    " (Live)", " [Live]", " - Edit", " (Edit)", " - Single Version", " (Single Version)",
+    " - Mono", " (Mono Version)", " - Stereo Mix", " (Stereo Version)", " - Original Mix",
+    " (Original Version)", " (Original)", " - Radio Edit", " (Radio Version)", " (Radio)",
+    " (feat. Someone)", " - From \"Some Movie\" Soundtrack", " (Live) - 2011 Remaster",
+    " - Acoustic", " (Deluxe)", " (Remastered) - Live", "  - Live",
+]
+
+EDGE_CASES = [
+    "", "   ", "(Live)", "- Live", " - Live", "(Remastered) - Live", "Song -(Live) Edit",
+    "Song (LIVE)", "Song - REMASTERED", "Song-Remaster", "Song  (Live)  [Remaster] ",
+    "Radio Ga Ga", "Live and Let Die", "Original Sin - Live", "Song - 1999 Remastered - Live",
+    "Song - Ra(Remaster)dio", "Song (Li(Edit)ve)", "Song -(Remastered) Mono",
+]
+
+
+def legacy_normalize(title):
+    """Die ursprüngliche Schleife aus home(): Liste pro Aufruf, ein re.sub je Muster."""
+    terms_to_remove = list(quiz.TITLE_CLEANUP_PATTERNS)
+    for pattern in terms_to_remove:
+        title = re.sub(pattern, "", title, flags=re.IGNORECASE).strip()
+    return title
+
+
+def build_corpus(solves, seed=42):
+    """Simuliert pro Auflösung den aktuellen Titel plus 50 Suchtreffer."""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(solves):
+        base = rng.choice(BASE_TITLES)
+        corpus.append(base + rng.choice(SUFFIXES))
+        for _ in range(50):
+            corpus.append(rng.choice([base, rng.choice(BASE_TITLES)]) + rng.choice(SUFFIXES))
+    return corpus
+
+
+def fuzz_titles(count, seed=7):
+    """Zufällige Kombinationen aus Fragmenten, um die Gleichheit auch abseits des Korpus zu prüfen."""
+    rng = random.Random(seed)
+    fragments = ["Song", " ", "  ", "-", " - ", "(Live)", "[Live]", "Live", "Remaster", "Remastered",
+                 "(Remastered)", "2011", "Edit", "(Edit)", "Radio", "(Radio)", "Mono", "Original", "x"]
+    return ["".join(rng.choice(fragments) for _ in range(rng.randint(1, 6))) for _ in range(count)]
+
+
+def timed(func, titles, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for title in titles:
+            func(title)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--solves', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-speedup', type=float, default=1.5)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.solves)
+    for title in corpus + EDGE_CASES + fuzz_titles(20000):
+        expected, actual = legacy_normalize(title), quiz._normalize_title_uncached(title)
+        if expected != actual:
+            print(f"ABWEICHUNG für {title!r}: alt={expected!r} neu={actual!r}")
+            return 1
+
+    legacy = timed(legacy_normalize, corpus, args.repeat)
+    uncached = timed(quiz._normalize_title_uncached, corpus, args.repeat)
+    quiz.normalize_title.cache_clear()
+    cold = timed(quiz.normalize_title, corpus, 1)
+    warm = timed(quiz.normalize_title, corpus, args.repeat)
+
+    per_title = lambda seconds: seconds / len(corpus) * 1e6
+    print(f"Titel: {len(corpus)} ({args.solves} Auflösungen à 51 Titel)")
+    print(f"alt (re.sub je Muster):   {per_title(legacy):8.2f} µs/Titel")
+    print(f"neu ohne Memo:            {per_title(uncached):8.2f} µs/Titel  ({legacy / uncached:5.1f}x)")
+    print(f"neu mit Memo (kalt):      {per_title(cold):8.2f} µs/Titel  ({legacy / cold:5.1f}x)")
+    print(f"neu mit Memo (warm):      {per_title(warm):8.2f} µs/Titel  ({legacy / warm:5.1f}x)")
+
+    speedup = legacy / uncached
+    if speedup < args.min_speedup:
+        print(f"REGRESSION: Speedup ohne Memo {speedup:.1f}x liegt unter {args.min_speedup}x")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
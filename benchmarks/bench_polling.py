@@ -0,0 +1,120 @@
+"""Simulation des Abfrageplans: festes Intervall gegen next_check_delay() der App.
+
+Erzeugt für --clients Hörer je --hours Stunden Wiedergabe (Songs von 2:30 bis 5:00 min, ein Teil
+wird mittendrin extern übersprungen, ein Teil pausiert) und lässt jeden Client einmal im festen
+polling_interval_seconds-Takt und einmal nach dem Hinweis des Servers abfragen. Verglichen werden
+Abfragen pro Stunde und die Verzögerung, bis ein Songwechsel erkannt wird (natürliches Songende
+bzw. Überspringen in einer anderen Spotify-App; Steuerbefehle aus der Quiz-App selbst bestätigt
+die Seite ohnehin sofort).
+
+    python benchmarks/bench_polling.py [--clients 200] [--hours 2]
+"""
+import argparse
+import bisect
+import importlib
+import random
+import statistics
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+quiz = importlib.import_module('spotify-quiz')
+
+
+class Timeline:
+    """Wiedergabeverlauf eines Hörers als Abschnitte (Start, Track, Dauer, Fortschritt beim Start, spielt)."""
+
+    def __init__(self, rng, seconds, skip_ratio, pause_ratio):
+        self.segments = []
+        self.changes = []
+        t = 0.0
+        number = 0
+        while t < seconds:
+            track_id = f"track{number}"
+            number += 1
+            duration = rng.uniform(150, 300)
+            if rng.random() < skip_ratio:
+                play_for, kind = rng.uniform(5, duration * 0.8), 'skip'
+            else:
+                play_for, kind = duration, 'natural'
+            if rng.random() < pause_ratio:
+                pause_at = rng.uniform(0, play_for)
+                pause_for = rng.uniform(30, 120)
+                self.segments.append((t, track_id, duration, 0.0, True))
+                self.segments.append((t + pause_at, track_id, duration, pause_at, False))
+                self.segments.append((t + pause_at + pause_for, track_id, duration, pause_at, True))
+                t += pause_for
+            else:
+                self.segments.append((t, track_id, duration, 0.0, True))
+            t += play_for
+            self.changes.append((t, kind))
+        self.starts = [segment[0] for segment in self.segments]
+
+    def current_track(self, t):
+        """Antwort von currently_playing() zum Zeitpunkt t."""
+        start, track_id, duration, progress, playing = self.segments[bisect.bisect_right(self.starts, t) - 1]
+        if playing:
+            progress += t - start
+        return {'item': {'id': track_id, 'duration_ms': int(duration * 1000)},
+                'progress_ms': int(progress * 1000), 'is_playing': playing}
+
+
+def simulate(timeline, seconds, next_delay):
+    polls = []
+    t = 0.0
+    while t < seconds:
+        polls.append(t)
+        t += next_delay(timeline.current_track(t))
+    delays = {'natural': [], 'skip': []}
+    for changed_at, kind in timeline.changes:
+        index = bisect.bisect_left(polls, changed_at)
+        if index < len(polls):
+            delays[kind].append(polls[index] - changed_at)
+    return len(polls), delays
+
+
+def quantile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--hours', type=float, default=2.0)
+    parser.add_argument('--skip-ratio', type=float, default=0.2, help='Anteil der Songs, die extern übersprungen werden.')
+    parser.add_argument('--pause-ratio', type=float, default=0.1, help='Anteil der Songs mit einer Pause.')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    seconds = args.hours * 3600
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+    timelines = [Timeline(rng, seconds, args.skip_ratio, args.pause_ratio) for _ in range(args.clients)]
+    modes = {
+        f"fest {quiz.polling_interval_seconds} s": lambda current_track: quiz.polling_interval_seconds,
+        'adaptiv': quiz.next_check_delay,
+    }
+
+    print(f"{args.clients} Clients × {args.hours:g} h, {args.skip_ratio:.0%} übersprungen, {args.pause_ratio:.0%} mit Pause\n")
+    print(f"{'Modus':<10}{'Abfragen/h':>12}{'Songende p50/p95 s':>22}{'Überspringen p50/p95 s':>26}")
+    checks_per_hour = {}
+    for name, next_delay in modes.items():
+        polls = 0
+        delays = {'natural': [], 'skip': []}
+        for timeline in timelines:
+            count, timeline_delays = simulate(timeline, seconds, next_delay)
+            polls += count
+            for kind, values in timeline_delays.items():
+                delays[kind].extend(values)
+        checks_per_hour[name] = polls / args.clients / args.hours
+        natural, skip = delays['natural'], delays['skip']
+        print(f"{name:<10}{checks_per_hour[name]:>12.0f}"
+              f"{statistics.median(natural):>13.2f} / {quantile(natural, 0.95):<6.2f}"
+              f"{statistics.median(skip):>17.2f} / {quantile(skip, 0.95):<6.2f}")
+    fixed, adaptive = checks_per_hour.values()
+    print(f"\n{fixed / adaptive:.1f}x weniger Abfragen")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Benchmark für das Rendern der Quiz-Seite.
+
+"vorher": eingefrorene Kopie des alten home() (benchmarks/legacy_home.py): rund 14 KB HTML
+als f-String mit CSS und Skript inline, pro Request mit render_template_string() neu geparst
+und kompiliert.
+"nachher": render_template('quiz.html') mit vorkompiliertem Template und nur den
+Song- und Quizwerten als Kontext (CSS und Skript kommen als gecachte Assets).
+
+Gemessen werden Zeit und Speicherspitze (tracemalloc) pro Request.
+
+    python benchmarks/bench_render.py [--requests 300]
+"""
+import argparse
+import importlib
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from flask import render_template
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+quiz = importlib.import_module('spotify-quiz')
+import legacy_home
+
+
+def make_context(i, solved):
+    state = {
+        'track_id': f"track{i:018d}", 'progress_ms': 1000 * i, 'duration_ms': 215000, 'is_playing': True,
+        'is_player_mode': False, 'is_solved': solved, 'show_solution': solved,
+    }
+    if solved:
+        state['solution'] = {
+            'track_name': f"Song Nummer {i} - 2011 Remaster",
+            'artists': "Interpret A, Interpret B",
+            'album_name': f"Album {i}",
+            'album_image_url': f"https://i.scdn.co/image/{i:040d}",
+            'initial_release_year': 2011,
+            'original_release_year': 1975,
+            'original_album_name': "Original",
+            'cleaned_track_name': f"Song Nummer {i}",
+            'has_original': True,
+        }
+    return {
+        'palette': quiz.PALETTE_FRAGMENTS['default'],
+        'page_data': state,
+        'is_player_mode': False,
+        'show_solution': solved,
+        'solution': state.get('solution') or {},
+    }
+
+
+def make_legacy_args(i, solved):
+    """Dieselben Songdaten in der Form, die das alte home() von Spotify und der Auflösung bekam."""
+    current_track = {
+        'item': {
+            'id': f"track{i:018d}", 'name': f"Song Nummer {i} - 2011 Remaster", 'duration_ms': 215000,
+            'artists': [{'name': "Interpret A"}, {'name': "Interpret B"}],
+            'album': {'name': f"Album {i}", 'release_date': "2011-03-01",
+                      'images': [{'url': f"https://i.scdn.co/image/{i:040d}"}]},
+        },
+        'progress_ms': 1000 * i, 'is_playing': True,
+    }
+    resolution = {'original_year': 1975, 'original_album': "Original", 'cleaned_title': f"Song Nummer {i}"}
+    return current_track, False, solved, resolution
+
+
+def measure(render, count):
+    durations = []
+    peaks = []
+    tracemalloc.start()
+    for i in range(count):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        render(i)
+        durations.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    return durations, peaks
+
+
+def report(label, durations, peaks):
+    durations_ms = sorted(d * 1000 for d in durations)
+    p95 = durations_ms[int(len(durations_ms) * 0.95) - 1]
+    print(f"{label:<8} median {statistics.median(durations_ms):7.3f} ms  p95 {p95:7.3f} ms  "
+          f"Speicherspitze {statistics.median(peaks) / 1024:8.1f} KiB/Request")
+    return statistics.median(durations_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=300)
+    args = parser.parse_args()
+
+    with quiz.app.test_request_context('/'):
+        for solved in (False, True):
+            before = measure(lambda i: legacy_home.render_quiz_page(*make_legacy_args(i, solved)), args.requests)
+            after = measure(lambda i: render_template('quiz.html', **make_context(i, solved)), args.requests)
+
+            sizes = (len(legacy_home.render_quiz_page(*make_legacy_args(0, solved))), len(render_template('quiz.html', **make_context(0, solved))))
+            print(f"Quiz-Seite ({'aufgelöst' if solved else 'Frage'}), {args.requests} Requests, "
+                  f"Dokument vorher {sizes[0] / 1024:.1f} KiB, nachher {sizes[1] / 1024:.1f} KiB")
+            before_median = report('vorher', *before)
+            after_median = report('nachher', *after)
+            print(f"Speedup {before_median / after_median:.1f}x\n")
+
+
+if __name__ == '__main__':
+    main()
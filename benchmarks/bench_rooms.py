@@ -0,0 +1,166 @@
+"""Fan-out-Benchmark für Räume: ein Host, viele Gäste an /room/<code>/events.
+
+Startet wie benchmarks/loadtest.py die Spotify-Attrappe und die App (gevent, ein Worker), meldet
+einen Host an, öffnet einen Raum und verbindet nacheinander --viewers Gäste (z. B. 10,100,250).
+Pro Stufe wechselt der Host --changes-mal den Song und löst jeweils auf; gemessen werden
+
+  - die Fan-out-Latenz (published_at des Snapshots bis Empfang beim Gast), p50/p95/p99/max,
+  - wie viele der erwarteten Events ankamen,
+  - die Spotify-Aufrufe der Stufe, die unabhängig von der Zahl der Gäste gleich bleiben sollen.
+
+    python benchmarks/bench_rooms.py [--viewers 10,100,250] [--changes 5] [--output rooms.json]
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import loadtest
+
+
+class Viewer(threading.Thread):
+    """Ein Gast, der den Raum-Stream offen hält und für jedes 'state'-Event die Verzögerung notiert."""
+
+    def __init__(self, app_url, code, stop):
+        super().__init__(daemon=True)
+        self.url = f"{app_url}/room/{code}/events"
+        self.stop = stop
+        self.connected = threading.Event()
+        self.delays = []
+        self.events = 0
+        self.errors = 0
+        self.response = None
+
+    def run(self):
+        while not self.stop.is_set():
+            try:
+                self.response = requests.get(self.url, stream=True, timeout=(30, 90))
+                self.connected.set()
+                event = None
+                for line in self.response.iter_lines():
+                    if line.startswith(b'event: '):
+                        event = line[7:]
+                    elif line.startswith(b'data: ') and event == b'state':
+                        received = time.time()
+                        self.delays.append(received - json.loads(line[6:])['published_at'])
+                        self.events += 1
+            except Exception:
+                # close() beendet den Stream am Ende von außen
+                if not self.stop.is_set():
+                    self.errors += 1
+                    time.sleep(0.5)
+
+    def close(self):
+        if self.response is not None:
+            self.response.close()
+
+
+def open_room(app_url):
+    host = requests.Session()
+    if not loadtest.login(host, app_url, 'roomhost'):
+        raise RuntimeError("Host-Anmeldung fehlgeschlagen")
+    host.get(f"{app_url}/", timeout=30)
+    host.post(f"{app_url}/rooms", allow_redirects=False, timeout=30)
+    code = host.get(f"{app_url}/api/state", timeout=30).json()['hosted_room']['code']
+    return host, code
+
+
+def run_stage(app_url, fake_url, host, code, viewer_count, changes, pause):
+    stop = threading.Event()
+    viewers = [Viewer(app_url, code, stop) for _ in range(viewer_count)]
+    for viewer in viewers:
+        viewer.start()
+    for viewer in viewers:
+        viewer.connected.wait(timeout=30)
+    # Der erste Snapshot beim Verbinden zählt nicht mit
+    time.sleep(1)
+    for viewer in viewers:
+        viewer.delays.clear()
+        viewer.events = 0
+    requests.post(f"{fake_url}/_fake/reset", timeout=5)
+
+    started = time.time()
+    for _ in range(changes):
+        # Songwechsel und Auflösung wie auf der Host-Seite: /next bzw. /solve mit anschließender Seitenanzeige
+        host.get(f"{app_url}/next", timeout=30)
+        time.sleep(pause)
+        host.get(f"{app_url}/solve", timeout=30)
+        time.sleep(pause)
+    elapsed = time.time() - started
+    fake_stats = requests.get(f"{fake_url}/_fake/stats", timeout=5).json()
+
+    stop.set()
+    for viewer in viewers:
+        viewer.close()
+    delays = sorted(delay for viewer in viewers for delay in viewer.delays)
+    expected = viewer_count * changes * 2
+    return {
+        'viewers': viewer_count,
+        'connected': sum(viewer.connected.is_set() for viewer in viewers),
+        'events_expected': expected,
+        'events_received': sum(viewer.events for viewer in viewers),
+        'stream_errors': sum(viewer.errors for viewer in viewers),
+        'fanout_ms': {
+            'p50': round(loadtest.percentile(delays, 0.50) * 1000, 2) if delays else None,
+            'p95': round(loadtest.percentile(delays, 0.95) * 1000, 2) if delays else None,
+            'p99': round(loadtest.percentile(delays, 0.99) * 1000, 2) if delays else None,
+            'max': round(delays[-1] * 1000, 2) if delays else None,
+        },
+        'upstream_calls': fake_stats['total_calls'],
+        'upstream_per_second': round(fake_stats['total_calls'] / elapsed, 2),
+        'by_endpoint': fake_stats['calls'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--viewers', default='10,100,250', help='Kommagetrennte Zahl der Gäste pro Stufe.')
+    parser.add_argument('--changes', type=int, default=5, help='Songwechsel (mit Auflösung) pro Stufe.')
+    parser.add_argument('--pause', type=float, default=1.0, help='Sekunden zwischen den Aktionen des Hosts.')
+    parser.add_argument('--latency-ms', type=float, default=50.0)
+    parser.add_argument('--output', help='Ergebnis als JSON in diese Datei schreiben.')
+    args = parser.parse_args()
+
+    setup = loadtest.build_parser().parse_args([
+        '--serving-mode', 'gevent', '--gunicorn-args', '--workers 1',
+        '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.latency_ms / 2),
+    ])
+    processes = []
+    try:
+        process, fake_url = loadtest.start_fake(setup)
+        processes.append(process)
+        process, app_url = loadtest.start_app(setup, fake_url)
+        processes.append(process)
+        host, code = open_room(app_url)
+        stages = [run_stage(app_url, fake_url, host, code, int(count), args.changes, args.pause)
+                  for count in args.viewers.split(',')]
+        app_stats = loadtest.fetch_app_stats(app_url, setup.metrics_token)
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except Exception:
+                process.kill()
+
+    print(f"{'Gäste':>6}{'Events':>14}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'Spotify-Aufrufe':>17}", file=sys.stderr)
+    for stage in stages:
+        fanout = stage['fanout_ms']
+        print(f"{stage['viewers']:>6}{stage['events_received']:>7}/{stage['events_expected']:<6}{fanout['p50']!s:>9}{fanout['p95']!s:>9}"
+              f"{fanout['p99']!s:>9}{fanout['max']!s:>9}{stage['upstream_calls']:>17}", file=sys.stderr)
+
+    result = {'revision': loadtest.git_revision(), 'room': code, 'changes': args.changes, 'stages': stages, 'app_rooms': app_stats['rooms']}
+    output = json.dumps(result, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Vergleich der Betriebsmodi sync, gthread und gevent mit genau einem Gunicorn-Prozess.
+
+Fährt für jeden Modus denselben Lasttest (benchmarks/loadtest.py) mit vielen gleichzeitigen
+Nutzern, von denen ein Teil wie die Quiz-Seite einen /events-Stream offen hält, und stellt
+Durchsatz, Latenzen und Fehler gegenüber.
+
+    python benchmarks/bench_serving_modes.py [--users 300] [--sse-users 100] [--duration 20] [--output modes.json]
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import loadtest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', default='sync,gthread,gevent')
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--sse-users', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--think-ms', type=float, default=1000.0)
+    parser.add_argument('--latency-ms', type=float, default=100.0)
+    parser.add_argument('--output', help='Alle Ergebnisse als JSON in diese Datei schreiben.')
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.modes.split(','):
+        run_args = loadtest.build_parser().parse_args([
+            '--serving-mode', mode, '--gunicorn-args', '--workers 1',
+            '--users', str(args.users), '--sse-users', str(args.sse_users), '--duration', str(args.duration),
+            '--think-ms', str(args.think_ms), '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.latency_ms / 2),
+        ])
+        print(f"--- {mode} ---", file=sys.stderr)
+        results[mode] = loadtest.run(run_args)
+        loadtest.print_summary(results[mode])
+
+    print(f"\n{'Modus':<9}{'req/s':>8}{'Fehler':>8}{'/ p95':>10}{'/check-song p95':>17}{'SSE offen':>11}", file=sys.stderr)
+    for mode, result in results.items():
+        routes, sse = result['routes'], result['sse']
+        home_p95 = routes['/']['p95_ms']
+        check_p95 = routes['/check-song']['p95_ms']
+        print(f"{mode:<9}{result['totals']['throughput_rps']:>8.1f}{result['totals']['errors']:>8}"
+              f"{home_p95 if home_p95 is not None else float('nan'):>10.0f}"
+              f"{check_p95 if check_p95 is not None else float('nan'):>17.0f}"
+              f"{sse['connections'] - sse['errors']:>11}", file=sys.stderr)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + '\n', encoding='utf-8')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,476 @@
+"""Lokaler Ersatz für die Spotify-Web- und Accounts-API (für Lasttests ohne echte Spotify-Aufrufe).
+
+Deckt alles ab, was die App aufruft: currently-playing, Queue, Suche, Player-Steuerung,
+Token-Tausch und -Erneuerung sowie Playlists/Tracks für 'build-index'. Jeder Nutzer
+(/authorize?user=<name>) hört eine eigene, deterministische Wiedergabeliste aus einem
+generierten Katalog mit Original-, Remaster-, Live- und Compilation-Versionen.
+
+Wie bei Spotify gilt nur der beim Login angefragte Scope: Player-Endpunkte ohne passenden
+Scope im Token antworten mit 403.
+
+Latenz und 429-Antworten sind einstellbar, alle Aufrufe werden gezählt:
+
+    python benchmarks/fake_spotify.py --port 8900 --latency-ms 80 --jitter-ms 40 --rate-limit-ratio 0.01
+
+    GET  /_fake/stats    Aufrufzähler pro Endpunkt, injizierte 429 und aktuelle Einstellungen
+    POST /_fake/reset    Zähler zurücksetzen
+    POST /_fake/config   Einstellungen zur Laufzeit ändern (JSON, gleiche Namen wie die Optionen)
+
+Die App zeigt per SPOTIFY_API_URL=http://127.0.0.1:8900/v1/ und
+SPOTIFY_ACCOUNTS_URL=http://127.0.0.1:8900 auf diesen Server.
+"""
+import argparse
+import hashlib
+import random
+import re
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlencode
+
+from flask import Flask, jsonify, redirect, request, Response
+
+SONG_COUNT = 500
+ARTIST_COUNT = 120
+QUEUE_LENGTH = 10
+PLAYLIST_LENGTH = 40
+# Benötigte Scopes je Endpunkt (einer der genannten genügt)
+REQUIRED_SCOPES = {
+    '/v1/me/player/currently-playing': ('user-read-currently-playing', 'user-read-playback-state'),
+    '/v1/me/player': ('user-read-playback-state',),
+    '/v1/me/player/queue': ('user-read-playback-state',),
+    '/v1/me/player/play': ('user-modify-playback-state',),
+    '/v1/me/player/pause': ('user-modify-playback-state',),
+    '/v1/me/player/next': ('user-modify-playback-state',),
+    '/v1/me/player/previous': ('user-modify-playback-state',),
+    '/v1/me/player/seek': ('user-modify-playback-state',),
+}
+
+app = Flask(__name__)
+
+config = {
+    'latency_ms': 0.0,
+    'jitter_ms': 0.0,
+    'rate_limit_ratio': 0.0,
+    'max_rps': 0.0,
+    'retry_after': 1,
+    'token_ttl': 3600,
+}
+
+_lock = threading.Lock()
+calls = Counter()
+rate_limited = Counter()
+_window = {'second': 0, 'count': 0}
+
+
+### 🎼 KATALOG ###
+
+def _track_id(song, version):
+    """Stabile, Spotify-ähnliche 22-stellige Track-ID."""
+    return hashlib.sha1(f"{song}:{version}".encode()).hexdigest()[:22]
+
+def _build_catalog(seed=1):
+    """Erzeugt pro Song ein Original und mehrere spätere Versionen (Remaster, Live, Compilation mit gleicher ISRC)."""
+    rng = random.Random(seed)
+    tracks = {}
+    songs = []
+    for song in range(SONG_COUNT):
+        title = f"Song {song}"
+        artists = [{'id': f"artist{song % ARTIST_COUNT}", 'name': f"Artist {song % ARTIST_COUNT}"}]
+        if song % 7 == 0:
+            artists.append({'id': f"artist{(song * 3) % ARTIST_COUNT}", 'name': f"Artist {(song * 3) % ARTIST_COUNT}"})
+        year = rng.randint(1960, 2005)
+        duration_ms = rng.randint(150, 300) * 1000
+        isrc = f"FAKE{song:08d}"
+        remaster_year = year + rng.randint(10, 20)
+        versions = [
+            (title, f"Album {song}", year, isrc),
+            (f"{title} - {remaster_year} Remaster", f"Album {song} (Remastered)", remaster_year, f"FAKR{song:08d}"),
+            (f"{title} - Live", f"Live at Fake Arena {song % 30}", year + rng.randint(1, 15), f"FAKL{song:08d}"),
+            (title, f"Greatest Hits Vol. {song % 12}", year + rng.randint(5, 25), isrc),
+        ]
+        ids = []
+        for version, (name, album_name, release_year, version_isrc) in enumerate(versions):
+            track_id = _track_id(song, version)
+            tracks[track_id] = {
+                'id': track_id,
+                'name': name,
+                'uri': f"spotify:track:{track_id}",
+                'type': 'track',
+                'duration_ms': duration_ms,
+                'artists': artists,
+                'external_ids': {'isrc': version_isrc},
+                'album': {
+                    'id': f"album{song}v{version}",
+                    'name': album_name,
+                    'release_date': f"{release_year}-01-01",
+                    'release_date_precision': 'day',
+                    'images': [{'url': f"https://i.fake.invalid/{track_id}.jpg", 'width': 640, 'height': 640}],
+                },
+            }
+            ids.append(track_id)
+        songs.append({'title': title, 'artists': [artist['name'] for artist in artists], 'ids': ids})
+    return tracks, songs
+
+TRACKS, SONGS = _build_catalog()
+SONGS_BY_TITLE = {song['title'].lower(): song for song in SONGS}
+# Gespielt werden bevorzugt die späteren Versionen, damit das Quiz etwas aufzulösen hat
+PLAYABLE_IDS = [track_id for song in SONGS for track_id in song['ids'][1:]]
+
+
+### 👤 NUTZER, TOKENS UND WIEDERGABE ###
+
+class Player:
+    """Wiedergabezustand eines Nutzers; der Fortschritt läuft in Echtzeit, am Songende geht es automatisch weiter."""
+
+    def __init__(self, user):
+        rng = random.Random(user)
+        self.playlist = rng.sample(PLAYABLE_IDS, min(200, len(PLAYABLE_IDS)))
+        self.position = 0
+        self.offset_ms = rng.randint(0, 60000)
+        self.started_at = time.time()
+        self.is_playing = True
+        self.lock = threading.Lock()
+
+    def _progress(self, now):
+        if not self.is_playing:
+            return self.offset_ms
+        return self.offset_ms + int((now - self.started_at) * 1000)
+
+    def _advance_finished(self, now):
+        progress = self._progress(now)
+        duration = TRACKS[self.current_id()]['duration_ms']
+        while self.is_playing and progress >= duration:
+            self.started_at += (duration - self.offset_ms) / 1000
+            self.offset_ms = 0
+            self.position += 1
+            progress = self._progress(now)
+            duration = TRACKS[self.current_id()]['duration_ms']
+
+    def current_id(self):
+        return self.playlist[self.position % len(self.playlist)]
+
+    def state(self):
+        now = time.time()
+        with self.lock:
+            self._advance_finished(now)
+            return self.current_id(), self._progress(now), self.is_playing, [
+                self.playlist[(self.position + i) % len(self.playlist)] for i in range(1, QUEUE_LENGTH + 1)]
+
+    def seek(self, position_ms):
+        with self.lock:
+            self.offset_ms = max(0, min(position_ms, TRACKS[self.current_id()]['duration_ms']))
+            self.started_at = time.time()
+
+    def skip(self, step):
+        with self.lock:
+            self._advance_finished(time.time())
+            self.position = max(0, self.position + step)
+            self.offset_ms = 0
+            self.started_at = time.time()
+
+    def set_playing(self, playing):
+        with self.lock:
+            now = time.time()
+            self._advance_finished(now)
+            self.offset_ms = self._progress(now)
+            self.started_at = now
+            self.is_playing = playing
+
+players = {}
+# access_token -> (Nutzer, Ablaufzeit)
+access_tokens = {}
+authorization_codes = {}
+refresh_tokens = {}
+_token_counter = Counter()
+
+def player_for(user):
+    with _lock:
+        player = players.get(user)
+        if player is None:
+            player = players[user] = Player(user)
+        return player
+
+def issue_access_token(user, scope=''):
+    with _lock:
+        _token_counter[user] += 1
+        token = f"fake.{user}.{_token_counter[user]}"
+        access_tokens[token] = (user, time.time() + config['token_ttl'], frozenset(scope.split()))
+    return token
+
+def spotify_error(status, message, headers=None):
+    return jsonify({'error': {'status': status, 'message': message}}), status, headers or {}
+
+def current_token():
+    """(Nutzer, Ablaufzeit, Scopes) zum Bearer-Token; None, wenn das Token unbekannt oder abgelaufen ist."""
+    header = request.headers.get('Authorization', '')
+    token = header[7:] if header.startswith('Bearer ') else ''
+    with _lock:
+        entry = access_tokens.get(token)
+    if not entry or entry[1] < time.time():
+        return None
+    return entry
+
+def current_user():
+    entry = current_token()
+    return entry[0] if entry else None
+
+
+### ⏱️ LATENZ, 429 UND ZÄHLER ###
+
+@app.before_request
+def simulate_upstream():
+    """Zählt den Aufruf, verzögert ihn und beantwortet ihn bei Bedarf mit 429."""
+    if request.path.startswith('/_fake/'):
+        return None
+    endpoint = f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
+    now = time.time()
+    with _lock:
+        calls[endpoint] += 1
+        # Wie bei Spotify gilt das Ratenlimit nur für die Web-API, nicht für den Token-Endpunkt
+        web_api = request.path.startswith('/v1/')
+        throttled = web_api and random.random() < config['rate_limit_ratio']
+        if web_api and config['max_rps']:
+            second = int(now)
+            if _window['second'] != second:
+                _window['second'], _window['count'] = second, 0
+            _window['count'] += 1
+            throttled = throttled or _window['count'] > config['max_rps']
+        if throttled:
+            rate_limited[endpoint] += 1
+    delay = config['latency_ms'] + random.uniform(-config['jitter_ms'], config['jitter_ms'])
+    if delay > 0:
+        time.sleep(delay / 1000)
+    if throttled:
+        return spotify_error(429, 'API rate limit exceeded', {'Retry-After': str(config['retry_after'])})
+    if request.path.startswith('/v1/'):
+        entry = current_token()
+        if entry is None:
+            return spotify_error(401, 'The access token expired')
+        required = REQUIRED_SCOPES.get(request.url_rule.rule if request.url_rule else None)
+        if required and not entry[2].intersection(required):
+            return spotify_error(403, 'Insufficient client scope')
+    return None
+
+@app.route('/_fake/stats')
+def fake_stats():
+    with _lock:
+        return jsonify({
+            'calls': dict(calls),
+            'total_calls': sum(calls.values()),
+            'rate_limited': dict(rate_limited),
+            'total_rate_limited': sum(rate_limited.values()),
+            'users': len(players),
+            'config': dict(config),
+        })
+
+@app.route('/_fake/reset', methods=['POST'])
+def fake_reset():
+    with _lock:
+        calls.clear()
+        rate_limited.clear()
+    return jsonify({'success': True})
+
+@app.route('/_fake/config', methods=['POST'])
+def fake_config():
+    updates = request.get_json() or {}
+    with _lock:
+        for key, value in updates.items():
+            if key in config:
+                config[key] = type(config[key])(value)
+        return jsonify(dict(config))
+
+
+### 🔑 ACCOUNTS-API ###
+
+@app.route('/authorize')
+def authorize():
+    """Meldet sofort an; der Nutzername kommt aus ?user= (sonst zufällig), der Code merkt sich den angefragten Scope."""
+    user = request.args.get('user') or f"user{random.randrange(10**6)}"
+    code = f"{user}.{random.randrange(10**9)}"
+    with _lock:
+        authorization_codes[code] = (user, request.args.get('scope', ''))
+    params = {'code': code}
+    if request.args.get('state'):
+        params['state'] = request.args['state']
+    return redirect(f"{request.args['redirect_uri']}?{urlencode(params)}")
+
+@app.route('/api/token', methods=['POST'])
+def token():
+    grant_type = request.form.get('grant_type')
+    if grant_type == 'authorization_code':
+        with _lock:
+            grant = authorization_codes.pop(request.form.get('code', ''), None)
+        if grant is None:
+            return jsonify({'error': 'invalid_grant', 'error_description': 'Invalid authorization code'}), 400
+        user, scope = grant
+        refresh_token = f"refresh.{user}.{random.randrange(10**9)}"
+        with _lock:
+            refresh_tokens[refresh_token] = grant
+        return jsonify({
+            'access_token': issue_access_token(user, scope), 'token_type': 'Bearer', 'expires_in': config['token_ttl'],
+            'refresh_token': refresh_token, 'scope': scope,
+        })
+    if grant_type == 'refresh_token':
+        with _lock:
+            grant = refresh_tokens.get(request.form.get('refresh_token', ''))
+        if grant is None:
+            return jsonify({'error': 'invalid_grant', 'error_description': 'Invalid refresh token'}), 400
+        # Wie Spotify meist: kein neues Refresh-Token in der Antwort, der Scope bleibt der des Logins
+        user, scope = grant
+        return jsonify({
+            'access_token': issue_access_token(user, scope), 'token_type': 'Bearer',
+            'expires_in': config['token_ttl'], 'scope': scope,
+        })
+    if grant_type == 'client_credentials':
+        return jsonify({'access_token': issue_access_token('app'), 'token_type': 'Bearer', 'expires_in': config['token_ttl']})
+    return jsonify({'error': 'unsupported_grant_type'}), 400
+
+
+### 🎧 PLAYER ###
+
+def playback_response(user, with_device=False):
+    track_id, progress_ms, is_playing, _ = player_for(user).state()
+    body = {
+        'timestamp': int(time.time() * 1000),
+        'progress_ms': progress_ms,
+        'is_playing': is_playing,
+        'currently_playing_type': 'track',
+        'item': TRACKS[track_id],
+    }
+    if with_device:
+        body['device'] = {'id': 'fake-device', 'name': 'Fake Speaker', 'type': 'Speaker', 'is_active': True, 'volume_percent': 50}
+    return jsonify(body)
+
+@app.route('/v1/me/player/currently-playing')
+def currently_playing():
+    return playback_response(current_user())
+
+@app.route('/v1/me/player')
+def current_playback():
+    return playback_response(current_user(), with_device=True)
+
+@app.route('/v1/me/player/queue')
+def player_queue():
+    track_id, _, _, upcoming = player_for(current_user()).state()
+    return jsonify({'currently_playing': TRACKS[track_id], 'queue': [TRACKS[i] for i in upcoming]})
+
+@app.route('/v1/me/player/play', methods=['PUT'])
+def play():
+    player_for(current_user()).set_playing(True)
+    return Response(status=204)
+
+@app.route('/v1/me/player/pause', methods=['PUT'])
+def pause():
+    player_for(current_user()).set_playing(False)
+    return Response(status=204)
+
+@app.route('/v1/me/player/next', methods=['POST'])
+def next_track():
+    player_for(current_user()).skip(1)
+    return Response(status=204)
+
+@app.route('/v1/me/player/previous', methods=['POST'])
+def previous_track():
+    player_for(current_user()).skip(-1)
+    return Response(status=204)
+
+@app.route('/v1/me/player/seek', methods=['PUT'])
+def seek():
+    try:
+        position_ms = int(request.args['position_ms'])
+    except (KeyError, ValueError):
+        return spotify_error(400, 'Missing or invalid position_ms')
+    player_for(current_user()).seek(position_ms)
+    return Response(status=204)
+
+
+### 🔎 SUCHE, TRACKS UND PLAYLISTS ###
+
+_FIELD = re.compile(r'(track|artist|year):(.*?)(?=\s+(?:track|artist|year):|$)')
+
+def _matches(query):
+    """Wertet track:/artist:/year: wie Spotify aus; ohne Feldfilter zählt ein im Text enthaltener Songtitel."""
+    fields = {key: value.strip().lower() for key, value in _FIELD.findall(query)}
+    free_text = _FIELD.sub('', query).strip().lower()
+    if 'track' in fields:
+        song = SONGS_BY_TITLE.get(re.sub(r'\s*-.*$', '', fields['track']))
+        candidates = [song] if song else []
+    else:
+        text = free_text or query.lower()
+        candidates = [song for song in SONGS if re.search(rf"\b{re.escape(song['title'].lower())}\b", text)]
+    years = None
+    if 'year' in fields:
+        bounds = fields['year'].split('-')
+        try:
+            years = (int(bounds[0]), int(bounds[-1]))
+        except ValueError:
+            years = None
+    results = []
+    for song in candidates:
+        wanted_artists = {name.strip() for name in fields.get('artist', '').split(',')}
+        if 'artist' in fields and not any(artist.lower() in wanted_artists for artist in song['artists']):
+            continue
+        for track_id in song['ids']:
+            track = TRACKS[track_id]
+            year = int(track['album']['release_date'][:4])
+            if years and not years[0] <= year <= years[1]:
+                continue
+            results.append(track)
+    return results
+
+@app.route('/v1/search')
+def search():
+    limit = min(int(request.args.get('limit', 10)), 50)
+    offset = int(request.args.get('offset', 0))
+    results = _matches(request.args.get('q', ''))
+    return jsonify({'tracks': {
+        'href': request.url, 'items': results[offset:offset + limit], 'limit': limit, 'offset': offset,
+        'next': None, 'previous': None, 'total': len(results),
+    }})
+
+@app.route('/v1/tracks/')
+@app.route('/v1/tracks')
+def tracks():
+    ids = [track_id for track_id in request.args.get('ids', '').split(',') if track_id]
+    return jsonify({'tracks': [TRACKS.get(track_id) for track_id in ids[:50]]})
+
+@app.route('/v1/tracks/<track_id>')
+def track(track_id):
+    if track_id not in TRACKS:
+        return spotify_error(404, 'Non existing id')
+    return jsonify(TRACKS[track_id])
+
+@app.route('/v1/playlists/<playlist_id>/tracks')
+def playlist_items(playlist_id):
+    rng = random.Random(playlist_id)
+    ids = rng.sample(PLAYABLE_IDS, PLAYLIST_LENGTH)
+    limit = min(int(request.args.get('limit', 100)), 100)
+    offset = int(request.args.get('offset', 0))
+    next_url = None
+    if offset + limit < len(ids):
+        next_url = f"{request.base_url}?{urlencode({'limit': limit, 'offset': offset + limit})}"
+    return jsonify({
+        'href': request.url, 'items': [{'track': TRACKS[track_id]} for track_id in ids[offset:offset + limit]],
+        'limit': limit, 'offset': offset, 'next': next_url, 'previous': None, 'total': len(ids),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Mittlere Latenz pro Aufruf.')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Gleichverteilte Abweichung um die Latenz.')
+    parser.add_argument('--rate-limit-ratio', type=float, default=0.0, help='Anteil der Aufrufe, die mit 429 enden.')
+    parser.add_argument('--max-rps', type=float, default=0.0, help='Ab dieser Rate pro Sekunde gibt es 429 (0 = aus).')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After-Header der 429-Antworten (Sekunden).')
+    parser.add_argument('--token-ttl', type=int, default=3600, help='Gültigkeit der Access-Tokens (Sekunden).')
+    args = parser.parse_args()
+    config.update(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, rate_limit_ratio=args.rate_limit_ratio,
+                  max_rps=args.max_rps, retry_after=args.retry_after, token_ttl=args.token_ttl)
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+"""Eingefrorene Kopie der Quiz-Seite vor den Jinja-Templates, als "vorher"-Fall für bench_render.py.
+
+Bis zur Umstellung baute home() pro Request ein rund 14 KB großes HTML-Dokument als f-String
+(CSS und Skript inline, Songdaten direkt eingesetzt) und gab es an render_template_string(), das
+es jedes Mal neu parste und kompilierte. Der Code unten ist dieser Teil von home() unverändert;
+nur Spotify-Abfrage, Session und Auflösung sind durch Parameter ersetzt. Farbpaletten und
+Einstellungen sind ebenfalls auf dem damaligen Stand eingefroren.
+"""
+from flask import render_template_string
+
+PALETTES = {
+    'default': {
+        'name': 'Lila (Standard)',
+        'highlight_color': '#C06EF3',
+        'button_hover_color': '#9F47D6',
+        'button_text_color': '#FFFFFF'
+    },
+    'spotify_green': {
+        'name': 'Spotify Grün',
+        'highlight_color': '#1DB954',
+        'button_hover_color': '#1AA34A',
+        'button_text_color': '#FFFFFF'
+    },
+    'ocean_blue': {
+        'name': 'Ozeanblau',
+        'highlight_color': '#2D8BBA',
+        'button_hover_color': '#246D92',
+        'button_text_color': '#FFFFFF'
+    },
+    'butter_yellow': {
+        'name': 'Buttergelb',
+        'highlight_color': '#f2d34c',
+        'button_hover_color': '#efc23b',
+        'button_text_color': '#1a1a1a'
+    },
+    'sunset_orange': {
+        'name': 'Sonnenuntergang',
+        'highlight_color': '#F56E28',
+        'button_hover_color': '#C45820',
+        'button_text_color': '#FFFFFF'
+    }
+}
+# --- ENDE DER FARBPALETTE ---
+
+# --- STATISCHE EINSTELLUNGEN ---
+wave_animation_speed = 60
+polling_interval_seconds = 3
+arrow_size = "60px"
+arrow_thickness = 4
+progress_bar_thickness = 10
+album_art_hover_scale = 1.03
+arrow_hover_scale = 1.15
+button_hover_scale = 1.05
+progress_bar_hover_increase_px = 3
+
+
+def render_quiz_page(current_track, is_player_mode, show_solution, resolution, theme_name='default'):
+    """Rendert die Quiz-Seite wie das alte home(); resolution ersetzt den Aufruf von resolve_original_version()."""
+    colors = PALETTES.get(theme_name, PALETTES['default'])
+    current_track_id = current_track['item']['id']
+    progress_ms = current_track.get('progress_ms', 0)
+    duration_ms = current_track['item'].get('duration_ms', 0)
+    is_playing = current_track.get('is_playing', False)
+
+    display_title = "Welcher Song ist das?"
+    display_artist = "Wer ist der Interpret?"
+    year_question_html = f'<h3 class="year-question">Aus welchem Jahr?</h3>'
+    info_section_html = ""
+    button_text = "Auflösen"
+    button_link = "/solve"
+    player_mode_checked = 'checked' if is_player_mode else ''
+
+    image_html = f"""
+    <div class="placeholder-quiz">
+        <svg class="quiz-icon" xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24" fill="none" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
+            <circle cx="12" cy="12" r="10"></circle>
+            <path d="M9.09 9a3 3 0 0 1 5.83 1c0 2-3 3-3 3"></path>
+            <line x1="12" y1="17" x2="12.01" y2="17"></line>
+        </svg>
+    </div>
+    """
+
+    track_name_raw = current_track["item"]["name"]
+    artists_string = ", ".join([artist["name"] for artist in current_track["item"]["artists"]])
+    album_name = current_track["item"]["album"]["name"]
+    initial_release_year = int(current_track["item"]["album"]["release_date"].split('-')[0])
+    album_image_url = "https://via.placeholder.com/300/1a1a1a?text=Error"
+    if current_track["item"]["album"]["images"]:
+        album_image_url = current_track["item"]["album"]["images"][0]["url"]
+
+    if show_solution:
+        display_title = track_name_raw
+        display_artist = artists_string
+        year_question_html = ""
+        button_text = "Nächstes Lied"
+        button_link = "/next"
+        image_html = f'<img class="album-art" src="{album_image_url}" alt="Album Cover">'
+
+        original_release_year = resolution['original_year']
+        original_album_name = resolution['original_album']
+        cleaned_track_name = resolution['cleaned_title']
+
+        initial_year_html = ""
+        original_info_html = ""
+        prominent_year_html = f'<p class="prominent-year">{initial_release_year}</p>'
+        if original_release_year < initial_release_year: #or track_name_raw != cleaned_track_name:
+            prominent_year_html = f'<p class="prominent-year">{original_release_year}</p>'
+            initial_year_html = f'<p><strong>Veröffentlichungsjahr:</strong> {initial_release_year}</p>'
+            original_info_html = f"""<div class="info-box"><h3>Originalversion</h3><p><strong>Original-Titel für Suche:</strong> {cleaned_track_name}</p><p><strong>Original-Album:</strong> {original_album_name}</p></div>"""
+        
+        info_section_html = f"""
+        <div class="info-section">
+            <hr class="info-divider">
+            <div class="info-box">
+                <p><strong>Album:</strong> {album_name}</p>
+                {initial_year_html}
+            </div>
+            {original_info_html}
+            {prominent_year_html}
+        </div>
+        """
+    
+    # HTML-Block für den interaktiven Farbwähler erstellen
+    options_html = ""
+    for key, palette in PALETTES.items():
+        options_html += f'<a href="/set-theme/{key}" class="theme-dot" style="background-color: {palette["highlight_color"]};" title="{palette["name"]}"></a>'
+
+    theme_selector_html = f"""
+    <div class="theme-picker">
+        <div id="theme-picker-toggle" class="theme-dot main-dot" style="background-color: {colors['highlight_color']};" title="Farbe ändern"></div>
+        <div id="theme-options" class="theme-options-container">
+            {options_html}
+        </div>
+    </div>
+    """
+    
+    html_content = f"""
+    <!DOCTYPE html>
+    <html lang="de">
+    <head>
+    <meta charset="UTF-8"><meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <link rel="preconnect" href="https://fonts.googleapis.com">
+    <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
+    <link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;700&display=swap" rel="stylesheet">
+    <title>Spotify Song Quiz</title>
+    <style>
+        * {{ box-sizing: border-box; }}
+        body {{ font-family: 'Inter', -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif; background-color: #121212; color: #B3B3B3; display: flex; flex-direction: column; align-items: center;justify-content: flex-start;min-height: 100vh; margin: 0; text-align: center;padding-top: 5vh;padding-bottom: 5vh;}}
+        .container {{ width: calc(100% - 2rem); max-width: 600px; padding: 2rem; border-radius: 12px; background-color: #1a1a1a; box-shadow: 0 4px 15px rgba(0, 0, 0, 0.5); }}
+        .album-art-container {{ display: flex; align-items: center; justify-content: center; gap: 20px; width: 100%; max-width: 450px; margin: 0 auto 1.5rem; }}
+        .album-art-link {{ flex: 1 1 0; min-width: 0; display: flex; justify-content: center; transition: transform 0.3s ease; }}
+        .album-art-link:hover {{ transform: scale({album_art_hover_scale}); }}
+        .album-art, .placeholder-quiz {{ width: 100%; max-width: 300px; height: auto; aspect-ratio: 1 / 1; border-radius: 8px; box-shadow: 0 4px 10px rgba(0, 0, 0, 0.3); }}
+        .placeholder-quiz {{ display: flex; align-items: center; justify-content: center; background-color: #282828; }}
+        .quiz-icon {{ width: 60%; height: auto; stroke: {colors['highlight_color']}; transition: stroke 0.2s ease-in-out; }}
+        .album-art-link:hover .quiz-icon {{ stroke: {colors['button_hover_color']}; }}
+        .control-arrow svg {{ width: {arrow_size}; height: {arrow_size}; stroke: {colors['highlight_color']}; stroke-width: {arrow_thickness}; transition: transform 0.3s ease, stroke 0.3s ease; }}
+        .control-arrow:hover svg {{ stroke: {colors['button_hover_color']}; transform: scale({arrow_hover_scale}); }}
+        h1 {{ color: #FFFFFF; font-size: clamp(1.5rem, 6vw, 2.5rem); margin-bottom: 0.5rem; min-height: 1.2em; }}
+        h2 {{ color: #B3B3B3; font-size: clamp(1rem, 3vw, 1.2rem); margin: 0.5rem 0 1.5rem; min-height: 1.2em; }}
+        .year-question {{ color: {colors['highlight_color']}; font-size: clamp(1.1rem, 4vw, 1.4rem); font-weight: bold; margin-top: 2rem; margin-bottom: 1.5rem;}}
+        .info-section {{ width: 100%; text-align: center; }}
+        .info-box strong {{ color: #FFFFFF; }}
+        .info-box h3 {{ color: #FFFFFF; margin-top: 1.5rem; margin-bottom: 0.5rem;}}
+        .info-divider {{ margin: 2rem 0; border: 0; border-top: 1px solid #333; }}
+        .button {{ padding: 12px 24px; background-color: {colors['highlight_color']}; color: {colors['button_text_color']}; text-decoration: none; border-radius: 50px; font-weight: bold; margin-top: 20px; display: inline-block; transition: background-color 0.3s, transform 0.3s ease; }}
+        .button:hover {{ background-color: {colors['button_hover_color']}; transform: scale({button_hover_scale}); }}
+        .prominent-year {{ font-size: clamp(3rem, 12vw, 4rem); font-weight: bold; color: {colors['highlight_color']}; margin: 1rem 0; }}
+        .progress-svg-container {{ width: 80%; max-width: 350px; margin: 20px auto 0; }}
+        .progress-interactive-area {{ width: 80%; margin: 0 auto; height: 14px; cursor: pointer; }}
+        .progress-interactive-area svg {{ width: 100%; height: 100%; overflow: visible; }}
+        #progressTrack, #progressFill {{ fill: none; stroke-width: {progress_bar_thickness}; stroke-linecap: round; stroke-linejoin: round; transition: stroke-width 0.2s ease, stroke 0.2s ease; }}
+        #progressTrack {{ stroke: #444; }}
+        #progressFill {{ stroke: {colors['highlight_color']}; }}
+        .progress-interactive-area:hover #progressFill, .progress-interactive-area:hover #progressTrack {{ stroke-width: {progress_bar_thickness + progress_bar_hover_increase_px}; }}
+        .progress-interactive-area:hover #progressFill {{ stroke: {colors['button_hover_color']}; }}
+        .player-mode-toggle {{ margin-top: 30px; margin-bottom: 15px; display: flex; flex-direction: column; align-items: center; gap: 10px; }}
+        .toggle-label {{ font-size: 0.9rem; color: #B3B3B3; }}
+        .switch {{ position: relative; display: inline-block; width: 50px; height: 28px; }}
+        .switch input {{ opacity: 0; width: 0; height: 0; }}
+        .slider {{ position: absolute; cursor: pointer; top: 0; left: 0; right: 0; bottom: 0; background-color: #444; transition: .4s; border-radius: 28px; }}
+        .slider:before {{ position: absolute; content: ""; height: 22px; width: 22px; left: 3px; bottom: 3px; background-color: white; transition: .4s; border-radius: 50%; }}
+        input:checked + .slider {{ background-color: {colors['highlight_color']}; }}
+        input:checked + .slider:before {{ transform: translateX(22px); }}
+        
+        /* --- CSS für den interaktiven Farbwähler --- */
+        .theme-picker {{
+            position: relative;
+            margin-top: 25px;
+            margin-bottom: 20px;
+            display: flex;
+            justify-content: center;
+        }}
+        .theme-options-container {{
+            position: absolute;
+            bottom: 130%;
+            left: 50%;
+            transform: translateX(-50%);
+            display: flex;
+            gap: 12px;
+            padding: 10px;
+            background-color: #282828;
+            border-radius: 50px;
+            box-shadow: 0 4px 10px rgba(0,0,0,0.4);
+            opacity: 0;
+            visibility: hidden;
+            transform: translate(-50%, 10px);
+            transition: opacity 0.3s ease, transform 0.3s ease, visibility 0.3s;
+        }}
+        .theme-options-container.active {{
+            opacity: 1;
+            visibility: visible;
+            transform: translate(-50%, 0);
+        }}
+        .theme-dot {{
+            width: 24px;
+            height: 24px;
+            border-radius: 50%;
+            border: 2px solid #555;
+            transition: transform 0.2s;
+            display: block;
+            cursor: pointer;
+        }}
+        .theme-dot:hover {{
+            transform: scale(1.2);
+        }}
+        .main-dot {{
+             width: 30px;
+             height: 30px;
+             border-color: #888;
+        }}
+    </style>
+    </head>
+    <body>
+    <div class="container">
+        <div class="album-art-container">
+            <a href="/previous" class="control-arrow"><svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-linecap="round" stroke-linejoin="round"><polyline points="15 18 9 12 15 6"></polyline></svg></a>
+            <a href="/play_pause" class="album-art-link">{image_html}</a>
+            <a href="/next" class="control-arrow"><svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-linecap="round" stroke-linejoin="round"><polyline points="9 18 15 12 9 6"></polyline></svg></a>
+        </div>
+        <div class="progress-svg-container"><div class="progress-interactive-area"><svg viewBox="0 0 300 14"><path id="progressTrack" d=""></path><path id="progressFill" d=""></path></svg></div></div>
+        <h1>{display_title}</h1><h2>{display_artist}</h2>{year_question_html}{info_section_html}
+        <a href="{button_link}" class="button">{button_text}</a>
+        <div class="player-mode-toggle"><label for="playerMode" class="toggle-label">Player-Modus</label><label class="switch"><input type="checkbox" id="playerMode" name="playerMode" {player_mode_checked}><span class="slider"></span></label></div>
+        {theme_selector_html}
+        <a href="/logout" style="font-size: 0.8rem; color: #888; margin-top: 10px; display:inline-block;">Logout</a>
+    </div>
+    
+    <script>
+        document.addEventListener('DOMContentLoaded', function() {{
+            const progressTrack = document.getElementById('progressTrack'); const progressFill = document.getElementById('progressFill'); const interactiveArea = document.querySelector('.progress-interactive-area'); const svgWidth = 300; const svgHeight = 14; const midHeight = svgHeight / 2; const amplitude = 6; const frequency = 0.05; const segments = 150; const waveSpeed = {wave_animation_speed};
+            let initialTrackId = '{current_track_id}'; const pollingInterval = {polling_interval_seconds} * 1000;
+            if (initialTrackId === 'None') {{ initialTrackId = null; }}
+            let currentProgress = {progress_ms}; const totalDuration = {duration_ms}; const isPlaying = {str(is_playing).lower()};
+            let animationFrameId = null; let animationStartTime = performance.now();
+            function generateWavePath(phase) {{ let path = `M 0 ${{midHeight}}`; for (let i = 0; i <= segments; i++) {{ const x = (i / segments) * svgWidth; const fadeWidth = svgWidth * 0.1; let currentAmplitude = amplitude; if (x < fadeWidth) {{ currentAmplitude = amplitude * Math.sin((x / fadeWidth) * (Math.PI / 2)); }} else if (x > svgWidth - fadeWidth) {{ currentAmplitude = amplitude * Math.sin(((svgWidth - x) / fadeWidth) * (Math.PI / 2)); }} const y = midHeight + Math.sin(x * frequency + phase) * currentAmplitude; path += ` L ${{x.toFixed(3)}} ${{y.toFixed(3)}}`; }} return path; }}
+            function updateProgressBar(progress) {{ if (totalDuration > 0) {{ const progressRatio = Math.min(progress / totalDuration, 1); const dynamicPhase = progressRatio * Math.PI * waveSpeed; const wavePath = generateWavePath(dynamicPhase); progressTrack.setAttribute('d', wavePath); progressFill.setAttribute('d', wavePath); const totalLength = progressFill.getTotalLength(); if (totalLength > 0) {{ progressFill.style.strokeDasharray = totalLength; progressFill.style.strokeDashoffset = totalLength * (1 - progressRatio); }} }} }}
+            function animate(currentTime) {{ const elapsedTime = currentTime - animationStartTime; const newProgress = currentProgress + elapsedTime; updateProgressBar(newProgress); if (newProgress < totalDuration) {{ animationFrameId = requestAnimationFrame(animate); }} }}
+            function startAnimation() {{ if (isPlaying) {{ animationStartTime = performance.now(); animationFrameId = requestAnimationFrame(animate); }} }}
+            function stopAnimation() {{ if (animationFrameId) {{ cancelAnimationFrame(animationFrameId); animationFrameId = null; }} }}
+            updateProgressBar(currentProgress); startAnimation();
+            interactiveArea.addEventListener('click', function(event) {{ if (totalDuration > 0) {{ stopAnimation(); const rect = interactiveArea.getBoundingClientRect(); const clickX = event.clientX - rect.left; const clickPercentage = Math.max(0, Math.min(1, clickX / rect.width)); const seekPositionMs = Math.round(clickPercentage * totalDuration); currentProgress = seekPositionMs; updateProgressBar(currentProgress); startAnimation(); fetch('/seek', {{ method: 'POST', headers: {{ 'Content-Type': 'application/json' }}, body: JSON.stringify({{ position_ms: seekPositionMs }}) }}).catch(error => console.error('Error seeking track:', error)); }} }});
+            function handleTrackId(trackId) {{ if (trackId !== initialTrackId) {{ window.location.reload(); }} }}
+            if (window.EventSource) {{ const trackEvents = new EventSource('/events'); trackEvents.addEventListener('track', function(event) {{ handleTrackId(JSON.parse(event.data).track_id); }}); }}
+            else {{ setInterval(function() {{ fetch('/check-song').then(response => response.ok ? response.json() : Promise.reject('Network response was not ok')).then(data => {{ if (data) {{ handleTrackId(data.track_id); }} }}).catch(error => console.error('Error during polling:', error)); }}, pollingInterval); }}
+            const playerModeToggle = document.getElementById('playerMode');
+            if (playerModeToggle) {{ playerModeToggle.addEventListener('change', function() {{ const isEnabled = this.checked; fetch('/toggle-player-mode', {{ method: 'POST', headers: {{ 'Content-Type': 'application/json' }}, body: JSON.stringify({{ playerMode: isEnabled }}) }}).then(response => response.ok ? response.json() : Promise.reject('Failed to toggle mode')).then(data => {{ if (data.success) {{ window.location.reload(); }} }}).catch(error => console.error('Error:', error)); }}); }}
+            
+            const themePickerToggle = document.getElementById('theme-picker-toggle');
+            const themeOptions = document.getElementById('theme-options');
+
+            if (themePickerToggle && themeOptions) {{
+                themePickerToggle.addEventListener('click', function(event) {{
+                    event.stopPropagation(); 
+                    themeOptions.classList.toggle('active');
+                }});
+
+                document.addEventListener('click', function() {{
+                    if (themeOptions.classList.contains('active')) {{
+                        themeOptions.classList.remove('active');
+                    }}
+                }});
+            }}
+        }});
+    </script>
+    </body>
+    </html>
+    """
+    
+    return render_template_string(html_content)
@@ -0,0 +1,429 @@
+"""Lasttest aller Quiz-Routen über Gunicorn gegen die lokale Spotify-Attrappe.
+
+Startet benchmarks/fake_spotify.py und die App unter Gunicorn als eigene Prozesse, meldet
+--users simulierte Nutzer über den OAuth-Ablauf der App (/login, /authorize?user=<name>, /callback) an und lässt sie für --duration Sekunden
+die Routen /, /check-song, /solve, /next und /seek im Verhältnis von --mix aufrufen.
+Weiterleitungen folgt jeder Nutzer wie ein Browser (die Seite nach /solve und /next zählt als /).
+
+Mit --sse-users hält zusätzlich ein Teil der Nutzer wie die Quiz-Seite einen /events-Stream offen.
+Mit --conditional merken sich die Nutzer wie ein Browser-Cache die ETags und fragen mit If-None-Match.
+
+Das Ergebnis (Durchsatz, p50/p95/p99 pro Route, Upstream-Aufrufe pro Seitenaufruf, /stats der App)
+geht als JSON nach --output bzw. stdout; mit --baseline wird ein früheres Ergebnis gegenübergestellt.
+
+    python benchmarks/loadtest.py --users 50 --duration 30 --latency-ms 80 --output loadtest.json
+    python benchmarks/loadtest.py --serving-mode gevent --gunicorn-args "--workers 1" --baseline loadtest.json
+"""
+import argparse
+import json
+import os
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import requests
+
+ROOT = Path(__file__).resolve().parent.parent
+ROUTES = ['/', '/check-song', '/solve', '/next', '/seek', '/events']
+DEFAULT_MIX = 'check-song=70,home=15,solve=5,next=5,seek=5'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(url, process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Prozess beendet mit Code {process.returncode}: {url}")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"Nicht erreichbar: {url}")
+
+
+def start_fake(args):
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, str(ROOT / 'benchmarks' / 'fake_spotify.py'), '--port', str(port),
+         '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.jitter_ms),
+         '--rate-limit-ratio', str(args.rate_limit_ratio), '--max-rps', str(args.max_rps),
+         '--retry-after', str(args.retry_after)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    wait_until_up(f"{url}/_fake/stats", process)
+    return process, url
+
+
+def start_app(args, fake_url):
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ,
+               CLIENT_ID='loadtest', CLIENT_SECRET='loadtest', SECRET_KEY='loadtest',
+               REDIRECT_URI=f"{url}/callback",
+               SPOTIFY_API_URL=f"{fake_url}/v1/", SPOTIFY_ACCOUNTS_URL=fake_url,
+               # Kein lokal gebauter Index, damit jede Revision dieselbe Arbeit macht
+               ORIGINAL_INDEX_PATH=str(ROOT / 'benchmarks' / '.loadtest-no-index.sqlite3'))
+    if args.serving_mode:
+        env['SERVING_MODE'] = args.serving_mode
+    if args.session_backend:
+        env['SESSION_BACKEND'] = args.session_backend
+    env['METRICS_TOKEN'] = args.metrics_token
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'spotify-quiz:app', '--bind', f"127.0.0.1:{port}",
+         '--log-level', 'warning', *shlex.split(args.gunicorn_args)],
+        cwd=ROOT, env=env)
+    wait_until_up(f"{url}/stats", process)
+    return process, url
+
+
+def login(http, app_url, user):
+    """Meldet wie ein Browser an: /login leitet zur Attrappe, die mit ?user= sofort zu /callback zurückleitet."""
+    response = http.get(f"{app_url}/login", allow_redirects=False, timeout=30)
+    if response.status_code != 302:
+        return False
+    response = http.get(response.headers['Location'], params={'user': user}, allow_redirects=False, timeout=30)
+    if response.status_code != 302:
+        return False
+    return http.get(response.headers['Location'], allow_redirects=False, timeout=30).status_code == 302
+
+
+def fetch_app_stats(app_url, metrics_token):
+    return requests.get(f"{app_url}/stats", headers={'Authorization': f"Bearer {metrics_token}"}, timeout=5).json()
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, weight = part.split('=')
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+class Recorder:
+    """Sammelt Latenzen und Fehler pro Route über alle Nutzer-Threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.not_modified = defaultdict(int)
+        self.sse_events = 0
+
+    def record(self, route, seconds, ok, not_modified=False):
+        with self.lock:
+            self.latencies[route].append(seconds)
+            if not ok:
+                self.errors[route] += 1
+            if not_modified:
+                self.not_modified[route] += 1
+
+
+class SimulatedUser(threading.Thread):
+    """Ein angemeldeter Nutzer, der zufällig gewichtete Aktionen mit kurzer Denkpause ausführt."""
+
+    def __init__(self, name, app_url, mix, recorder, start_event, stop_at, think_seconds, seed, sse=False, conditional=False):
+        super().__init__(daemon=True)
+        self.name_ = name
+        self.app_url = app_url
+        self.mix = mix
+        self.recorder = recorder
+        self.start_event = start_event
+        self.stop_at = stop_at
+        self.think_seconds = think_seconds
+        self.rng = random.Random(seed)
+        self.http = requests.Session()
+        self.logged_in = False
+        self.ready = threading.Event()
+        self.sse = sse
+        self.conditional = conditional
+        self.etags = {}
+        self._events_response = None
+
+    def login(self):
+        self.logged_in = login(self.http, self.app_url, self.name_)
+
+    def timed(self, route, method, path, **kwargs):
+        if self.conditional and method == 'GET' and path in self.etags:
+            kwargs['headers'] = {'If-None-Match': self.etags[path]}
+        start = time.perf_counter()
+        try:
+            response = self.http.request(method, f"{self.app_url}{path}", allow_redirects=False, timeout=30, **kwargs)
+            ok = response.status_code < 400
+            if route == '/' and ok and '<title>Fehler</title>' in response.text:
+                ok = False
+        except requests.RequestException:
+            response, ok = None, False
+        self.recorder.record(route, time.perf_counter() - start, ok, response is not None and response.status_code == 304)
+        if self.conditional and response is not None and response.headers.get('ETag'):
+            self.etags[path] = response.headers['ETag']
+        return response
+
+    def follow(self, route, path):
+        response = self.timed(route, 'GET', path)
+        if response is not None and response.is_redirect:
+            self.timed('/', 'GET', '/')
+
+    def run(self):
+        try:
+            self.login()
+            if self.logged_in:
+                # Erster Seitenaufruf vor dem Start, damit alle Nutzer gleich warm sind
+                self.http.get(f"{self.app_url}/", timeout=30)
+        except requests.RequestException:
+            self.logged_in = False
+        finally:
+            self.ready.set()
+        if not self.logged_in:
+            return
+        self.start_event.wait()
+        if self.sse:
+            threading.Thread(target=self.hold_events, daemon=True).start()
+        actions, weights = zip(*self.mix.items())
+        while time.time() < self.stop_at():
+            action = self.rng.choices(actions, weights)[0]
+            if action == 'home':
+                self.timed('/', 'GET', '/')
+            elif action == 'check-song':
+                self.timed('/check-song', 'GET', '/check-song')
+            elif action == 'solve':
+                self.follow('/solve', '/solve')
+            elif action == 'next':
+                self.follow('/next', '/next')
+            elif action == 'seek':
+                self.timed('/seek', 'POST', '/seek', json={'position_ms': self.rng.randrange(0, 120000)})
+            if self.think_seconds:
+                time.sleep(self.rng.uniform(0.5, 1.5) * self.think_seconds)
+
+
+    def hold_events(self):
+        """Hält wie EventSource einen /events-Stream offen und verbindet nach dessen Ende neu."""
+        while time.time() < self.stop_at():
+            start = time.perf_counter()
+            try:
+                response = self.http.get(f"{self.app_url}/events", stream=True, timeout=(30, 60))
+                self._events_response = response
+                self.recorder.record('/events', time.perf_counter() - start, response.status_code == 200)
+                if response.status_code != 200:
+                    return
+                for line in response.iter_lines():
+                    if line.startswith(b'event: track'):
+                        with self.recorder.lock:
+                            self.recorder.sse_events += 1
+                    if time.time() >= self.stop_at():
+                        break
+            except Exception:
+                # close_events() schließt den Stream am Ende von außen, urllib3 meldet das unterschiedlich
+                if time.time() < self.stop_at():
+                    self.recorder.record('/events', time.perf_counter() - start, False)
+                    time.sleep(1)
+            finally:
+                if self._events_response is not None:
+                    self._events_response.close()
+
+    def close_events(self):
+        response = self._events_response
+        if response is not None:
+            response.close()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(recorder, elapsed):
+    routes = {}
+    for route in ROUTES:
+        values = sorted(recorder.latencies.get(route, []))
+        routes[route] = {
+            'count': len(values),
+            'errors': recorder.errors.get(route, 0),
+            'not_modified': recorder.not_modified.get(route, 0),
+            'throughput_rps': round(len(values) / elapsed, 2),
+            'mean_ms': round(sum(values) / len(values) * 1000, 2) if values else None,
+            'p50_ms': round(percentile(values, 0.50) * 1000, 2) if values else None,
+            'p95_ms': round(percentile(values, 0.95) * 1000, 2) if values else None,
+            'p99_ms': round(percentile(values, 0.99) * 1000, 2) if values else None,
+            'max_ms': round(values[-1] * 1000, 2) if values else None,
+        }
+    return routes
+
+
+def git_revision():
+    try:
+        revision = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+        dirty = bool(subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT, text=True).strip())
+        return revision + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_summary(result, baseline=None, stream=sys.stderr):
+    print(f"Revision {result['revision']}  {result['config']['users']} Nutzer, {result['elapsed_seconds']} s, "
+          f"Modus: {result['config'].get('serving_mode') or 'Standard'}, Gunicorn: {result['config']['gunicorn_args']}", file=stream)
+    print(f"{'Route':<12}{'Anzahl':>8}{'Fehler':>8}{'304':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}", file=stream)
+    for route, stats in result['routes'].items():
+        if not stats['count']:
+            continue
+        line = (f"{route:<12}{stats['count']:>8}{stats['errors']:>8}{stats.get('not_modified', 0):>7}{stats['throughput_rps']:>9.1f}"
+                f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}")
+        old = (baseline or {}).get('routes', {}).get(route)
+        if old and old.get('count'):
+            line += f"   vorher p95 {old['p95_ms']:.1f} ms, {old['throughput_rps']:.1f} req/s"
+        print(line, file=stream)
+    totals, upstream = result['totals'], result['upstream']
+    print(f"Gesamt {totals['requests']} Requests, {totals['throughput_rps']:.1f} req/s, {totals['errors']} Fehler; "
+          f"Upstream {upstream['calls']} Aufrufe = {upstream['per_page_view']} pro Seitenaufruf "
+          f"({upstream['rate_limited']} mit 429)", file=stream)
+    sse = result.get('sse')
+    if sse and sse['connections']:
+        print(f"SSE: {sse['connections']} Verbindungen, {sse['errors']} Fehler, {sse['track_events']} Songwechsel empfangen", file=stream)
+    if baseline:
+        print(f"vorher ({baseline.get('revision')}): {baseline['totals']['throughput_rps']:.1f} req/s, "
+              f"{baseline['upstream']['per_page_view']} Upstream-Aufrufe pro Seitenaufruf", file=stream)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--sse-users', type=int, default=0, help='Davon Nutzer, die zusätzlich /events offen halten (SSE gibt es nur mit --serving-mode gevent).')
+    parser.add_argument('--duration', type=float, default=30.0, help='Messdauer in Sekunden.')
+    parser.add_argument('--think-ms', type=float, default=200.0, help='Mittlere Pause zwischen zwei Aktionen eines Nutzers.')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Gewichte der Aktionen home, check-song, solve, next, seek.')
+    parser.add_argument('--serving-mode', choices=['gthread', 'gevent', 'sync'], help='SERVING_MODE für gunicorn.conf.py.')
+    parser.add_argument('--gunicorn-args', default='--workers 2', help='Zusätzliche Gunicorn-Optionen (überschreiben gunicorn.conf.py).')
+    parser.add_argument('--session-backend', choices=['memory', 'redis', 'cookie'],
+                        help='SESSION_BACKEND der App (memory nur mit einem Worker-Prozess).')
+    parser.add_argument('--app-url', help='Bereits laufende App verwenden (muss auf --fake-url zeigen).')
+    parser.add_argument('--metrics-token', default='loadtest', help='METRICS_TOKEN der App für /stats.')
+    parser.add_argument('--fake-url', help='Bereits laufende Spotify-Attrappe verwenden.')
+    parser.add_argument('--latency-ms', type=float, default=80.0, help='Latenz der Spotify-Attrappe.')
+    parser.add_argument('--jitter-ms', type=float, default=40.0)
+    parser.add_argument('--rate-limit-ratio', type=float, default=0.0, help='Anteil zufälliger 429-Antworten.')
+    parser.add_argument('--max-rps', type=float, default=0.0, help='Upstream-Ratenlimit der Attrappe (0 = aus).')
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--conditional', action='store_true', help='ETags merken und mit If-None-Match fragen (wie ein Browser-Cache).')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='JSON-Ergebnis in diese Datei statt nach stdout schreiben.')
+    parser.add_argument('--baseline', help='Früheres JSON-Ergebnis zum Vergleich.')
+    return parser
+
+
+def run(args):
+    """Führt einen Lasttest aus und gibt das Ergebnis als Dictionary zurück."""
+    processes = []
+    try:
+        fake_url = args.fake_url
+        if not fake_url:
+            process, fake_url = start_fake(args)
+            processes.append(process)
+        app_url = args.app_url
+        if not app_url:
+            process, app_url = start_app(args, fake_url)
+            processes.append(process)
+
+        recorder = Recorder()
+        start_event = threading.Event()
+        stop = {'at': float('inf')}
+        users = [SimulatedUser(f"loaduser{i}", app_url, parse_mix(args.mix), recorder, start_event,
+                               lambda: stop['at'], args.think_ms / 1000, args.seed * 100003 + i, sse=i < args.sse_users,
+                               conditional=args.conditional)
+                 for i in range(args.users)]
+        for user in users:
+            user.start()
+        # Anmeldung und erster Seitenaufruf laufen vor der Messung
+        warmup_deadline = time.time() + 60
+        for user in users:
+            user.ready.wait(timeout=max(warmup_deadline - time.time(), 0))
+        requests.post(f"{fake_url}/_fake/reset", timeout=5)
+
+        started = time.time()
+        stop['at'] = started + args.duration
+        start_event.set()
+        for user in users:
+            user.join(timeout=max(started + args.duration + 60 - time.time(), 0))
+        elapsed = time.time() - started
+        for user in users:
+            user.close_events()
+
+        fake_stats = requests.get(f"{fake_url}/_fake/stats", timeout=5).json()
+        try:
+            app_stats = fetch_app_stats(app_url, args.metrics_token)
+        except (requests.RequestException, ValueError):
+            app_stats = None
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    routes = summarize(recorder, elapsed)
+    # Die SSE-Verbindungen zählen nicht als Requests, sie laufen über die ganze Messung
+    request_routes = [stats for route, stats in routes.items() if route != '/events']
+    total_requests = sum(stats['count'] for stats in request_routes)
+    page_views = routes['/']['count']
+    return {
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'config': {
+            'users': args.users, 'sse_users': args.sse_users, 'logged_in': sum(user.logged_in for user in users),
+            'duration': args.duration, 'think_ms': args.think_ms, 'mix': parse_mix(args.mix),
+            'serving_mode': args.serving_mode, 'session_backend': args.session_backend, 'gunicorn_args': args.gunicorn_args if not args.app_url else None,
+            'latency_ms': args.latency_ms, 'jitter_ms': args.jitter_ms, 'rate_limit_ratio': args.rate_limit_ratio,
+            'max_rps': args.max_rps, 'conditional': args.conditional,
+        },
+        'elapsed_seconds': round(elapsed, 2),
+        'totals': {
+            'requests': total_requests,
+            'errors': sum(stats['errors'] for stats in request_routes),
+            'throughput_rps': round(total_requests / elapsed, 2),
+        },
+        'routes': routes,
+        'sse': {'connections': routes['/events']['count'], 'errors': routes['/events']['errors'], 'track_events': recorder.sse_events},
+        'upstream': {
+            'calls': fake_stats['total_calls'],
+            'per_page_view': round(fake_stats['total_calls'] / page_views, 2) if page_views else None,
+            'per_request': round(fake_stats['total_calls'] / total_requests, 2) if total_requests else None,
+            'rate_limited': fake_stats['total_rate_limited'],
+            'by_endpoint': fake_stats['calls'],
+        },
+        'app_stats': app_stats,
+    }
+
+
+def main():
+    args = build_parser().parse_args()
+    result = run(args)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as handle:
+            baseline = json.load(handle)
+    print_summary(result, baseline)
+
+    output = json.dumps(result, indent=2, sort_keys=False)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+    else:
+        print(output)
+    return 0 if result['config']['logged_in'] == args.users else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
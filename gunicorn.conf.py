@@ -0,0 +1,38 @@
+"""Gunicorn-Konfiguration; der Betriebsmodus kommt aus SERVING_MODE (gthread, gevent oder sync).
+
+    SERVING_MODE=gevent gunicorn spotify-quiz:app
+
+gevent:  kooperative Greenlets, ein Prozess hält Hunderte gleichzeitige Polls, Seitenaufrufe und
+         SSE-Streams (/events), weil fast jeder Request nur auf Spotify-HTTP wartet. HTTP, Redis,
+         Locks, Queues, time.sleep und die Hintergrund-Threads laufen nach dem Patch kooperativ;
+         blockierend bleiben nur die kurzen Lesezugriffe auf den lokalen SQLite-Index.
+gthread: feste Zahl von Threads pro Prozess (GUNICORN_THREADS); weil jeder offene SSE-Stream einen
+         Thread belegen würde, schaltet die App SSE hier ab und die Seiten fragen /check-song ab.
+sync:    ein Request pro Prozess; nur zum Vergleich, ebenfalls ohne SSE.
+
+SSE_ENABLED=1 bzw. =0 überschreibt die Wahl der App (Standard: nur unter gevent).
+
+Die Zahl der Prozesse kommt wie üblich aus WEB_CONCURRENCY bzw. --workers.
+"""
+import os
+
+serving_mode = os.environ.get('SERVING_MODE', 'gthread')
+
+if serving_mode == 'gevent':
+    # So früh wie möglich patchen (auch im Master), damit ssl, socket, threading, time.sleep und queue
+    # schon vor dem ersten Import kooperativ sind
+    from gevent import monkey
+    monkey.patch_all()
+    worker_class = 'gevent'
+    worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+elif serving_mode == 'gthread':
+    worker_class = 'gthread'
+    threads = int(os.environ.get('GUNICORN_THREADS', 32))
+elif serving_mode == 'sync':
+    worker_class = 'sync'
+else:
+    raise RuntimeError(f"Unbekannter SERVING_MODE {serving_mode!r} (erlaubt: gthread, gevent, sync)")
+
+# Die App erst im Worker (nach dem Fork und dem gevent-Patch) importieren: Locks, Redis- und
+# HTTP-Verbindungen entstehen dann kooperativ, Hintergrund-Threads starten erst beim ersten Request
+preload_app = False
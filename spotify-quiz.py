@@ -1,10 +1,33 @@
 import spotipy
-from spotipy.oauth2 import SpotifyOAuth
-from flask import Flask, render_template_string, redirect, url_for, request, session, jsonify
+from spotipy.oauth2 import SpotifyOAuth, SpotifyClientCredentials
+from flask import Flask, render_template, redirect, url_for, request, session, jsonify, Response, abort, g, has_request_context, make_response
+from flask import before_render_template, template_rendered
+from flask.sessions import SessionInterface, SecureCookieSession, SecureCookieSessionInterface
 import re
 import os
 import time
 import json
+import sqlite3
+import threading
+import functools
+import hashlib
+import gzip
+import queue
+import bisect
+import contextlib
+import secrets
+import hmac
+import math
+import contextvars
+import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import OrderedDict
+import redis
+from markupsafe import Markup
+import click
+import requests
+from urllib3.util.retry import Retry
 
 # 1. FLASK-ANWENDUNG INITIALISIEREN
 app = Flask(__name__)
@@ -20,8 +43,8 @@ class FlaskSessionCacheHandler(spotipy.cache_handler.CacheHandler):
     def save_token_to_cache(self, token_info):
         self.session['spotify_token_info'] = token_info
         
-# Scope kann global bleiben
-scope = "user-read-currently-playing user-modify-playback-state"
+# Scope kann global bleiben; user-read-playback-state braucht das Vorausladen für die Warteschlange
+scope = "user-read-currently-playing user-modify-playback-state user-read-playback-state"
 
 # --- FARBPALETTEN ---
 PALETTES = {
@@ -60,7 +83,15 @@ PALETTES = {
 
 # --- STATISCHE EINSTELLUNGEN ---
 wave_animation_speed = 60
+progress_bar_fps = 30
+progress_wave_frames = 60
 polling_interval_seconds = 3
+polling_min_interval_seconds = 1
+polling_max_interval_seconds = 10
+polling_paused_interval_seconds = 15
+polling_track_end_margin_seconds = 0.5
+polling_jitter_ratio = 0.2
+polling_after_control_seconds = 1.0
 arrow_size = "60px"
 arrow_thickness = 4
 progress_bar_thickness = 10
@@ -68,48 +99,2186 @@ album_art_hover_scale = 1.03
 arrow_hover_scale = 1.15
 button_hover_scale = 1.05
 progress_bar_hover_increase_px = 3
+resolution_cache_ttl_seconds = 7 * 24 * 3600
+resolution_cache_max_entries = 5000
+sse_stream_seconds = 55
+sse_keepalive_seconds = 15
+watcher_idle_grace_seconds = 10
+playback_snapshot_max_age_seconds = 1.0
+playback_snapshot_max_users = 10000
+control_confirm_timeout_seconds = 1.5
+control_confirm_initial_delay_seconds = 0.05
+control_confirm_max_delay_seconds = 0.4
+spotify_client_pool_size = 256
+spotify_http_pool_maxsize = 32
+token_refresh_margin_seconds = 60
+token_proactive_refresh_seconds = 300
+token_refresher_interval_seconds = 30
+token_refresher_active_user_seconds = 900
+prefetch_workers = 4
+prefetch_lookahead = 3
+prefetch_max_pending = 64
+prefetch_budget_per_user = 30
+prefetch_budget_window_seconds = 600
+prefetch_wait_seconds = 3
+version_cluster_max_entries = 50000
+search_fanout_workers = 16
+search_fanout_background_workers = 6
+search_variant_limit = 20
+search_max_artist_variants = 3
+search_deadline_seconds = 1.5
+session_ttl_seconds = 30 * 24 * 3600
+session_store_max_entries = 100000
+spotify_rate_limit_per_second = 20
+spotify_rate_limit_burst = 60
+spotify_background_reserve_ratio = 0.3
+spotify_interactive_max_wait_seconds = 2.0
+spotify_background_max_wait_seconds = 0.2
+metrics_latency_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+metrics_normalize_buckets = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005)
+room_code_length = 5
+room_max_rooms = 1000
+room_idle_seconds = 2 * 3600
+room_viewer_queue_size = 4
+room_progress_drift_ms = 2000
 # --- ENDE DER EINSTELLUNGEN ---
 
+# --- REGELN ZUR TITELBEREINIGUNG ---
+# Reihenfolge ist relevant: die Regeln werden nacheinander angewendet, nach jeder Regel wird getrimmt.
+TITLE_CLEANUP_PATTERNS = [
+    r"\s*-\s*\d{4}\s*Remastered.*", r"\s*-\s*Remastered.*",
+    r"\s*-\s*\d{4}\s*Remaster.*", r"\s*-\s*Remaster.*",
+    r"\(Remastered\)", r"\[Remastered\]",
+    r"\(Remaster\)", r"\[Remaster\]",
+    r"\s+-\s*Live.*", r"\(Live\)", r"\[Live\]",
+    r"\s*-\s*Edit.*", r"\(Edit\)",
+    r"\s*-\s*Single.*",  r"\(Single Version\)",
+    r"\s*-\s*Mono.*", r"\(Mono Version\)",
+    r"\s*-\s*Stereo.*", r"\(Stereo Version\)",
+    r"\s*-\s*Original.*", r"\(Original Version\)", r"\(Original\)",
+    r"\s*-\s*Radio.*", r"\(Radio Version\)", r"\(Radio\)"
+]
+title_cache_max_entries = 20000
+# --- ENDE DER TITELBEREINIGUNG ---
+
+# Optionaler gemeinsamer Speicher für alle Gunicorn-Worker
+REDIS_URL = os.environ.get('REDIS_URL')
+# Vorab erstellter Index der Originaljahre (siehe 'flask --app spotify-quiz build-index --help')
+ORIGINAL_INDEX_PATH = os.environ.get('ORIGINAL_INDEX_PATH', 'original_index.sqlite3')
+# Basis-URLs der Spotify-APIs, für Lasttests auf benchmarks/fake_spotify.py umstellbar
+SPOTIFY_API_URL = os.environ.get('SPOTIFY_API_URL', 'https://api.spotify.com/v1/')
+SPOTIFY_ACCOUNTS_URL = os.environ.get('SPOTIFY_ACCOUNTS_URL', 'https://accounts.spotify.com').rstrip('/')
+# Session-Speicher: 'redis' (Standard mit REDIS_URL), 'cookie' (Standard ohne) oder 'memory'
+# (nur auf ausdrücklichen Wunsch und nur mit einem einzigen Worker-Prozess)
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND') or ('redis' if REDIS_URL else 'cookie')
+# Betriebsmodus aus gunicorn.conf.py; offene SSE-Streams (/events) nur unter gevent, denn bei gthread/sync
+# belegt jeder Stream für sse_stream_seconds einen Thread. Ohne SSE fragt die Seite /check-song ab.
+SERVING_MODE = os.environ.get('SERVING_MODE', 'gthread')
+SSE_ENABLED = os.environ.get('SSE_ENABLED', '1' if SERVING_MODE == 'gevent' else '0') == '1'
+# Requests, die länger dauern, werden mit Aufschlüsselung nach Phasen geloggt (0 = aus)
+SLOW_REQUEST_LOG_SECONDS = float(os.environ.get('SLOW_REQUEST_LOG_SECONDS') or 0)
+# /stats und /metrics nur mit "Authorization: Bearer <METRICS_TOKEN>"; ohne Token sind beide abgeschaltet
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
 # Konstante für den Session-Key
 TOKEN_INFO_KEY = 'spotify_token_info'
 
+### 📊 METRIKEN ###
+
+class Metrics:
+    """Histogramme und Zähler dieses Prozesses im Prometheus-Textformat (ohne zusätzliche Abhängigkeit)."""
+
+    def __init__(self):
+        # Name -> (Typ, Hilfetext, Buckets)
+        self._families = {}
+        # (Name, Labels) -> Zählungen je Bucket (letzter Eintrag +Inf) und Summe bzw. Zählerstand
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help_text, buckets=metrics_latency_buckets):
+        self._families[name] = ('histogram', help_text, tuple(buckets))
+
+    def counter(self, name, help_text):
+        self._families[name] = ('counter', help_text, None)
+
+    def observe(self, name, value, **labels):
+        buckets = self._families[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect.bisect_left(buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(buckets) + 1), 0.0]
+            histogram[0][index] += 1
+            histogram[1] += value
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def render(self, component_stats=None):
+        with self._lock:
+            histograms = {key: (list(counts), total) for key, (counts, total) in self._histograms.items()}
+            counters = dict(self._counters)
+        lines = []
+        for name, (kind, help_text, buckets) in self._families.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            if kind == 'counter':
+                for (series, labels), value in sorted(counters.items()):
+                    if series == name:
+                        lines.append(f"{name}{_prometheus_labels(labels)} {value}")
+                continue
+            for (series, labels), (counts, total) in sorted(histograms.items()):
+                if series != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(float(bound))
+                    lines.append(f"{name}_bucket{_prometheus_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_prometheus_labels(labels)} {total!r}")
+                lines.append(f"{name}_count{_prometheus_labels(labels)} {cumulative}")
+        if component_stats:
+            # Die Zahlen aus /stats als Gauges, z.B. quiz_component_stat{component="tokens",stat="refreshes"}
+            lines += ["# HELP quiz_component_stat Zähler und Größen der Caches und Hintergrunddienste (wie /stats).",
+                      "# TYPE quiz_component_stat gauge"]
+            for component, values in component_stats.items():
+                for stat, value in _flatten_stats(values or {}):
+                    lines.append(f"quiz_component_stat{_prometheus_labels((('component', component), ('stat', stat)))} {value}")
+        return "\n".join(lines) + "\n"
+
+def _prometheus_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label_value(value)}"' for key, value in labels) + "}"
+
+def _escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _flatten_stats(values, prefix=""):
+    for key, value in values.items():
+        if isinstance(value, dict):
+            yield from _flatten_stats(value, f"{prefix}{key}_")
+        elif isinstance(value, (int, float)):
+            yield f"{prefix}{key}", float(value)
+
+metrics = Metrics()
+metrics.histogram('quiz_http_request_duration_seconds', 'Dauer der Flask-Requests pro Route.')
+metrics.histogram('quiz_spotify_request_duration_seconds', 'Dauer der Spotify-API-Aufrufe pro Endpunkt (inkl. Retries).')
+metrics.counter('quiz_spotify_errors_total', 'Fehlgeschlagene Spotify-API-Aufrufe pro Endpunkt und Status.')
+metrics.counter('quiz_spotify_throttled_total', 'Vom Ratenbudget abgelehnte Spotify-Aufrufe pro Priorität und Grund.')
+metrics.histogram('quiz_phase_duration_seconds', 'Dauer einzelner Abschnitte (Auflösung, Token-Erneuerung, Bestätigung von Steuerbefehlen ...).')
+metrics.histogram('quiz_template_render_seconds', 'Renderzeit der Seiten-Templates.')
+metrics.histogram('quiz_title_normalize_seconds', 'Dauer der Titelbereinigung bei Cache-Fehlgriffen.', metrics_normalize_buckets)
+metrics.histogram('quiz_room_broadcast_seconds', 'Dauer der Verteilung eines Raum-Stands an alle Gäste.')
+
+def record_phase(phase, seconds):
+    """Addiert die Dauer zur Phasenübersicht des laufenden Requests (für das Slow-Request-Log)."""
+    if has_request_context():
+        phases = g.get('phases')
+        if phases is not None:
+            entry = phases.setdefault(phase, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+@contextlib.contextmanager
+def timed_phase(phase):
+    """Misst einen Abschnitt als Histogramm und ordnet ihn dem laufenden Request zu."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.observe('quiz_phase_duration_seconds', elapsed, phase=phase)
+        record_phase(phase, elapsed)
+
+# Objekt-Sammlungen der Web-API, deren nächstes Pfadsegment eine ID ist
+_SPOTIFY_COLLECTIONS = frozenset(['tracks', 'albums', 'artists', 'playlists', 'users', 'shows', 'episodes',
+                                  'audiobooks', 'chapters', 'audio-features', 'audio-analysis'])
+
+def spotify_endpoint(method, url):
+    """'GET playlists/{id}/tracks' statt der vollen URL, damit die Zahl der Label-Werte begrenzt bleibt."""
+    path = url.split('?', 1)[0]
+    if path.startswith('http'):
+        path = path.split('/v1/', 1)[-1]
+    segments = path.strip('/').split('/')
+    for index in range(1, len(segments)):
+        if segments[index - 1] in _SPOTIFY_COLLECTIONS and segments[index - 1] != segments[index]:
+            segments[index] = '{id}'
+    return f"{method} {'/'.join(segments)}"
+
 ### 🧠 HELFER-FUNKTIONEN FÜR DIE AUTHENTIFIZIERUNG ###
 
-def create_spotify_oauth():
+def use_accounts_url(auth_manager):
+    """Richtet einen Spotipy-Auth-Manager auf die konfigurierte Accounts-API aus."""
+    auth_manager.OAUTH_AUTHORIZE_URL = f"{SPOTIFY_ACCOUNTS_URL}/authorize"
+    auth_manager.OAUTH_TOKEN_URL = f"{SPOTIFY_ACCOUNTS_URL}/api/token"
+    return auth_manager
+
+def create_spotify_oauth(cache_handler=None):
     """Erstellt eine SpotifyOAuth-Instanz und liest die Konfiguration aus den Umgebungsvariablen."""
-    return SpotifyOAuth(
+    return use_accounts_url(SpotifyOAuth(
         client_id=os.environ.get('CLIENT_ID'),
         client_secret=os.environ.get('CLIENT_SECRET'),
         redirect_uri=os.environ.get('REDIRECT_URI'),
         scope=scope,
-        cache_handler=FlaskSessionCacheHandler(session)
-    )
+        cache_handler=cache_handler or FlaskSessionCacheHandler(session)
+    ))
+
+def user_key_for(token_info):
+    """Leitet aus dem Refresh-Token einen stabilen, nicht geheimen Schlüssel für den Nutzer ab."""
+    return hashlib.sha256(token_info['refresh_token'].encode('utf-8')).hexdigest()[:16]
+
+def get_user_key():
+    """Gibt den Nutzer-Schlüssel der aktuellen Session zurück (wird beim Login festgelegt)."""
+    user_key = session.get('user_key')
+    if not user_key:
+        token_info = session.get(TOKEN_INFO_KEY)
+        if not token_info:
+            return None
+        user_key = user_key_for(token_info)
+        session['user_key'] = user_key
+    return user_key
 
 def get_token():
-    """Holt das Token aus der Session, falls vorhanden, und erneuert es bei Bedarf."""
+    """Holt das Token aus der Session, falls vorhanden, und erneuert es bei Bedarf (über den TokenManager)."""
     token_info = session.get(TOKEN_INFO_KEY, None)
     if not token_info:
         return None
+    # Tokens aus einem Login mit kleinerem Scope führen zurück zum Login, statt einzelne Aufrufe scheitern zu lassen
+    if not set(scope.split()) <= set(token_info.get('scope', scope).split()):
+        session.pop(TOKEN_INFO_KEY, None)
+        return None
 
-    now = int(time.time())
-    is_expired = token_info['expires_at'] - now < 60
-    if is_expired:
-        sp_oauth = create_spotify_oauth()
-        token_info = sp_oauth.refresh_access_token(token_info['refresh_token'])
-        session[TOKEN_INFO_KEY] = token_info
+    fresh_token_info = token_manager.get_valid_token(get_user_key(), token_info)
+    if fresh_token_info['access_token'] != token_info['access_token']:
+        session[TOKEN_INFO_KEY] = fresh_token_info
         
-    return token_info
+    return fresh_token_info
+
+class PooledSpotify(spotipy.Spotify):
+    """Spotipy-Client auf der gemeinsamen HTTP-Session; schließt die Session beim Aufräumen nicht."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prefix = SPOTIFY_API_URL
+
+    def __del__(self):
+        pass
+
+    def _internal_call(self, method, url, payload, params):
+        endpoint = spotify_endpoint(method, url)
+        start = time.perf_counter()
+        try:
+            return self._governed_call(method, url, payload, params)
+        except Exception as e:
+            status = 'throttled' if isinstance(e, SpotifyRateLimited) else getattr(e, 'http_status', None) or type(e).__name__
+            metrics.inc('quiz_spotify_errors_total', endpoint=endpoint, status=str(status))
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.observe('quiz_spotify_request_duration_seconds', elapsed, endpoint=endpoint)
+            record_phase('spotify', elapsed)
+
+    def _governed_call(self, method, url, payload, params):
+        """Nimmt vorher ein Token aus dem gemeinsamen Budget; nach einem 429 wird ein interaktiver Aufruf einmal wiederholt."""
+        priority = spotify_call_priority.get()
+        for attempt in range(2):
+            rate_governor.acquire(priority)
+            try:
+                return super()._internal_call(method, url, payload, params)
+            except spotipy.SpotifyException as e:
+                if e.http_status != 429:
+                    raise
+                retry_after = rate_governor.rate_limited(e.headers)
+                if attempt or priority != PRIORITY_INTERACTIVE or retry_after > rate_governor.interactive_max_wait:
+                    raise SpotifyRateLimited(retry_after) from e
+
+def _build_http_session():
+    """Eine Keep-alive-Session für alle Spotify-Aufrufe, mit Spotipys Retry-Regeln außer für 429 (das übernimmt der RateGovernor)."""
+    http_session = requests.Session()
+    retry = Retry(
+        total=spotipy.Spotify.max_retries,
+        connect=None,
+        read=False,
+        allowed_methods=frozenset(['GET', 'POST', 'PUT', 'DELETE']),
+        status=spotipy.Spotify.max_retries,
+        backoff_factor=0.3,
+        status_forcelist=[code for code in spotipy.Spotify.default_retry_codes if code != 429],
+        # Sonst wiederholt urllib3 jedes 429 mit Retry-After trotzdem und schläft dabei im Worker
+        respect_retry_after_header=False)
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=spotify_http_pool_maxsize, max_retries=retry)
+    http_session.mount('https://', adapter)
+    http_session.mount('http://', adapter)
+    return http_session
+
+class SpotifyClientPool:
+    """Wiederverwendbare Spotipy-Clients je Access-Token; alle teilen sich eine HTTP-Session mit Connection-Pool."""
+
+    def __init__(self, max_clients):
+        self.max_clients = max_clients
+        self.http_session = _build_http_session()
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, access_token, expires_at=None):
+        now = time.time()
+        with self._lock:
+            entry = self._clients.get(access_token)
+            if entry is not None and entry[0] > now:
+                self._clients.move_to_end(access_token)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            self._evict_expired(now)
+            client = PooledSpotify(auth=access_token, requests_session=self.http_session)
+            self._clients[access_token] = (expires_at or now + 3600, client)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+                self.evictions += 1
+            return client
+
+    def _evict_expired(self, now):
+        expired = [token for token, (expires_at, _) in self._clients.items() if expires_at <= now]
+        for token in expired:
+            del self._clients[token]
+        self.evictions += len(expired)
+
+    def stats(self):
+        open_connections = 0
+        idle_connections = 0
+        for adapter in set(self.http_session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    open_connections += pool.num_connections
+                    # Die Queue ist mit None-Platzhaltern vorbelegt; nur echte Verbindungen zählen
+                    idle_connections += sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool else 0
+        with self._lock:
+            return {
+                'clients': len(self._clients),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'connections_opened': open_connections,
+                'idle_connections': idle_connections,
+            }
+
+spotify_clients = SpotifyClientPool(spotify_client_pool_size)
 
 def get_spotify_client():
-    """Erstellt einen Spotipy-Client, wenn der Nutzer angemeldet ist."""
+    """Liefert einen (wiederverwendeten) Spotipy-Client, wenn der Nutzer angemeldet ist."""
     token_info = get_token()
     if not token_info:
         return None
-    return spotipy.Spotify(auth=token_info['access_token'])
+    return spotify_clients.get(token_info['access_token'], token_info.get('expires_at'))
+
+
+### 🧹 TITELBEREINIGUNG ###
+
+def _title_rule_keyword(pattern):
+    """Längstes Wort, das jeder Treffer der Regel enthalten muss; 'Remastered' zählt als 'Remaster'."""
+    keyword = max(re.findall(r"[A-Za-z]{3,}", pattern), key=len)
+    return 'Remaster' if keyword == 'Remastered' else keyword
+
+_TITLE_CLEANUP_RULES = [(_title_rule_keyword(pattern), re.compile(pattern, re.IGNORECASE)) for pattern in TITLE_CLEANUP_PATTERNS]
+# Vorfilter: ein Durchlauf sucht die Schlüsselwörter (Remaster, Live, Edit, ...); nur Regeln, deren Wort im
+# Titel vorkommt, laufen danach in der festen Reihenfolge. Ohne Schlüsselwort bleibt nur das Trimmen übrig.
+_TITLE_KEYWORDS = sorted({keyword for keyword, _ in _TITLE_CLEANUP_RULES})
+_TITLE_KEYWORD_SCAN = re.compile("|".join(f"(?P<{keyword}>{keyword})" for keyword in _TITLE_KEYWORDS), re.IGNORECASE)
+
+def _normalize_title_uncached(title):
+    # Nach dem ersten Trimmen ändert nur eine angewendete Regel den Titel: nur dann wird erneut getrimmt und
+    # neu gesucht (das Entfernen kann Bruchstücke zu einem neuen Schlüsselwort zusammenfügen)
+    title = title.strip()
+    present = {match.lastgroup for match in _TITLE_KEYWORD_SCAN.finditer(title)}
+    for keyword, rule in _TITLE_CLEANUP_RULES:
+        if keyword in present:
+            cleaned = rule.sub("", title).strip()
+            if cleaned != title:
+                title = cleaned
+                present = {match.lastgroup for match in _TITLE_KEYWORD_SCAN.finditer(title)}
+    return title
+
+@functools.lru_cache(maxsize=title_cache_max_entries)
+def normalize_title(title):
+    """Entfernt Zusätze wie "- Remastered" oder "(Live)" aus einem Songtitel (vorkompiliert und gecacht)."""
+    start = time.perf_counter()
+    cleaned = _normalize_title_uncached(title)
+    elapsed = time.perf_counter() - start
+    metrics.observe('quiz_title_normalize_seconds', elapsed)
+    record_phase('normalize', elapsed)
+    return cleaned
+
+
+### 🗄️ CACHE FÜR AUFGELÖSTE ORIGINALVERSIONEN ###
+
+_redis_client = None
+
+def get_redis():
+    """Gibt einen gemeinsamen Redis-Client zurück oder None, wenn kein REDIS_URL gesetzt ist."""
+    global _redis_client
+    if not REDIS_URL:
+        return None
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+    return _redis_client
+
+class ResolutionCache:
+    """Zweistufiger Cache (LRU im Prozess + optional Redis) für Originaljahr, Originalalbum und bereinigten Titel je Track-ID."""
+
+    def __init__(self, max_entries, ttl_seconds, redis_client=None, key_prefix='quiz:resolution:'):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.redis_client = redis_client
+        self.key_prefix = key_prefix
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, track_id, count=True):
+        """Liefert die gespeicherte Auflösung oder None; mit count=False fließt der Zugriff nicht in die Statistik ein."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(track_id)
+            if entry is not None:
+                expires_at, resolution = entry
+                if expires_at > now:
+                    self._entries.move_to_end(track_id)
+                    self.hits += 1 if count else 0
+                    return resolution
+                del self._entries[track_id]
+
+        resolution = self._redis_get(track_id)
+        with self._lock:
+            if resolution is None:
+                self.misses += 1 if count else 0
+                return None
+            self.redis_hits += 1 if count else 0
+        self._store_local(track_id, resolution)
+        return resolution
+
+    def set(self, track_id, resolution):
+        self._store_local(track_id, resolution)
+        if self.redis_client is not None:
+            try:
+                self.redis_client.set(self.key_prefix + track_id, json.dumps(resolution), ex=self.ttl_seconds)
+            except redis.RedisError:
+                pass
+
+    def _store_local(self, track_id, resolution):
+        with self._lock:
+            self._entries[track_id] = (time.time() + self.ttl_seconds, resolution)
+            self._entries.move_to_end(track_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _redis_get(self, track_id):
+        if self.redis_client is None:
+            return None
+        try:
+            raw = self.redis_client.get(self.key_prefix + track_id)
+        except redis.RedisError:
+            return None
+        return json.loads(raw) if raw else None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.redis_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'redis_hits': self.redis_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round((self.hits + self.redis_hits) / lookups, 3) if lookups else 0.0,
+                'redis_enabled': self.redis_client is not None,
+            }
+
+resolution_cache = ResolutionCache(resolution_cache_max_entries, resolution_cache_ttl_seconds, redis_client=get_redis())
+
+### 🧬 VERSIONS-CLUSTER ###
+
+class VersionClusters:
+    """Gruppiert Aufnahmen nach ISRC und (bereinigter Titel, Hauptinterpret) und merkt sich je Cluster das früheste Jahr."""
+
+    # Nur gesehene Songs (aktueller Song, Warteschlange) legen unvollständige Cluster an bzw. ergänzen sie um
+    # ISRC und Jahr. Vollständig wird ein Cluster, sobald für eines seiner Mitglieder die Spotify-Suche gelaufen
+    # ist; danach wird jedes Mitglied, auch ein vorher nur gesehenes, per Dictionary-Lookup aufgelöst.
+    def __init__(self, max_clusters):
+        self.max_clusters = max_clusters
+        self._clusters = OrderedDict()
+        self._isrc_index = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.partial = 0
+
+    @staticmethod
+    def _release_year(item):
+        return int(item['album']['release_date'].split('-')[0])
+
+    @staticmethod
+    def _isrc(item):
+        return (item.get('external_ids') or {}).get('isrc')
+
+    def _key(self, item, cleaned_title):
+        isrc = self._isrc(item)
+        if isrc and isrc in self._isrc_index:
+            return self._isrc_index[isrc]
+        return (cleaned_title.lower(), item['artists'][0]['name'].lower())
+
+    def lookup(self, item):
+        """Gibt die Auflösung aus einem vollständigen Cluster zurück oder None."""
+        cleaned_title = normalize_title(item['name'])
+        with self._lock:
+            cluster = self._clusters.get(self._key(item, cleaned_title))
+            if cluster is None or not cluster['complete']:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._clusters.move_to_end(cluster['key'])
+            year, album = cluster['year'], cluster['album']
+        own_year = self._release_year(item)
+        if own_year <= year:
+            year, album = own_year, item['album']['name']
+        return {'original_year': year, 'original_album': album, 'cleaned_title': cleaned_title}
+
+    def observe(self, item):
+        """Nimmt einen nur gesehenen Song ohne Suche auf: sein Cluster lernt ISRC, Jahr und Album, bleibt aber unvollständig."""
+        try:
+            cleaned_title = normalize_title(item['name'])
+            year = self._release_year(item)
+            album = item['album']['name']
+        except (KeyError, ValueError, TypeError):
+            return
+        with self._lock:
+            self._merge(self._key(item, cleaned_title), year, album, [item], complete=False)
+
+    def add_search_result(self, item, resolution, matches):
+        """Legt nach einer Suche den Cluster des Songs an bzw. vervollständigt ihn, inklusive aller passenden Treffer."""
+        with self._lock:
+            self._merge(self._key(item, resolution['cleaned_title']), resolution['original_year'],
+                        resolution['original_album'], [item] + matches, complete=True)
+
+    def _merge(self, key, year, album, members, complete):
+        cluster = self._clusters.get(key)
+        if cluster is None:
+            cluster = {'key': key, 'year': year, 'album': album, 'complete': False, 'isrcs': set()}
+            self._clusters[key] = cluster
+            self.partial += 1
+        elif year < cluster['year']:
+            cluster['year'], cluster['album'] = year, album
+        if complete and not cluster['complete']:
+            cluster['complete'] = True
+            self.partial -= 1
+        self._clusters.move_to_end(key)
+        for member in members:
+            isrc = self._isrc(member)
+            if isrc:
+                self._isrc_index[isrc] = key
+                cluster['isrcs'].add(isrc)
+        while len(self._clusters) > self.max_clusters:
+            _, evicted = self._clusters.popitem(last=False)
+            self.partial -= 0 if evicted['complete'] else 1
+            for isrc in evicted['isrcs']:
+                if self._isrc_index.get(isrc) == evicted['key']:
+                    del self._isrc_index[isrc]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'clusters': len(self._clusters),
+                'partial_clusters': self.partial,
+                'isrcs': len(self._isrc_index),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+version_clusters = VersionClusters(version_cluster_max_entries)
+
+
+### 📚 VORAB ERSTELLTER INDEX DER ORIGINALJAHRE ###
+
+class OriginalIndex:
+    """SQLite-Datei mit vorab aufgelösten Originalversionen je Track-ID (erstellt mit 'flask build-index')."""
+
+    SCHEMA = """CREATE TABLE IF NOT EXISTS originals (
+        track_id TEXT PRIMARY KEY,
+        original_year INTEGER NOT NULL,
+        original_album TEXT NOT NULL,
+        cleaned_title TEXT NOT NULL
+    ) WITHOUT ROWID"""
+
+    def __init__(self, path):
+        self.path = path
+        # Eine gemeinsame Verbindung für alle Threads bzw. Greenlets (threading.local wäre unter gevent eine pro
+        # Greenlet, jeweils mit neuem Öffnen samt DDL); die Abfragen sind kurz, der Lock serialisiert sie
+        self._connection = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(self.SCHEMA)
+        return self._connection
+
+    def get(self, track_id):
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT original_year, original_album, cleaned_title FROM originals WHERE track_id = ?", (track_id,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return {'original_year': row[0], 'original_album': row[1], 'cleaned_title': row[2]}
+
+    def known_ids(self):
+        with self._lock:
+            return {row[0] for row in self._connect().execute("SELECT track_id FROM originals")}
+
+    def put_many(self, resolutions):
+        """Schreibt (track_id, Auflösung)-Paare in einer Transaktion."""
+        with self._lock, self._connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO originals VALUES (?, ?, ?, ?)",
+                [(track_id, r['original_year'], r['original_album'], r['cleaned_title']) for track_id, r in resolutions])
+
+    def stats(self):
+        with self._lock:
+            return {'path': self.path, 'hits': self.hits, 'misses': self.misses}
+
+original_index = OriginalIndex(ORIGINAL_INDEX_PATH) if ORIGINAL_INDEX_PATH and os.path.exists(ORIGINAL_INDEX_PATH) else None
+
+def resolve_original_version(sp, item):
+    """Liefert Originaljahr und -album eines Songs: aus dem Cache, dem vorab erstellten Index oder per Suche."""
+    track_id = item.get('id')
+    if track_id:
+        cached = resolution_cache.get(track_id)
+        if cached is not None:
+            return cached
+        if original_index is not None:
+            indexed = original_index.get(track_id)
+            if indexed is not None:
+                resolution_cache.set(track_id, indexed)
+                return indexed
+
+    resolution = version_clusters.lookup(item)
+    if resolution is None:
+        # Nach einem vorzeitigen Abbruch landet das Ergebnis erst im Cache, wenn alle Varianten geantwortet haben
+        store = (lambda complete_resolution: resolution_cache.set(track_id, complete_resolution)) if track_id else None
+        resolution, _ = search_original_version(sp, item, on_complete=store)
+        return resolution
+    if track_id:
+        resolution_cache.set(track_id, resolution)
+    return resolution
+
+class SearchFanout:
+    """Führt mehrere Suchvarianten parallel aus und gibt ihre Treffer in der Reihenfolge des Eintreffens zurück."""
+
+    def __init__(self, max_workers, background_workers):
+        # Vorausladen und CLI bekommen eigene Threads, damit eine Auflösung auf der Seite nie hinter ihnen wartet
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='search')
+        self._background_executor = ThreadPoolExecutor(max_workers=background_workers, thread_name_prefix='search-bg')
+        self._lock = threading.Lock()
+        self.searches = 0
+        self.queries = 0
+        self.failed_queries = 0
+        self.early_exits = 0
+        self.deadline_exits = 0
+        self.finished_in_background = 0
+
+    def search(self, sp, queries, deadline_seconds, is_confident, on_remaining=None):
+        """Liefert (Index, Trefferliste) je Variante, bis is_confident() gilt, alle fertig sind oder die Deadline abläuft.
+
+        Gescheiterte Varianten (auch vom Ratenbudget abgelehnte) kommen als (Index, None). Mit on_remaining
+        laufen die bei Abbruch noch offenen Varianten weiter und kommen danach gesammelt als Liste solcher Paare.
+        """
+        # Die Deadline zählt ab dem Absenden; scheitern alle Varianten, wird der erste Fehler weitergereicht
+        # Jede Variante läuft mit dem Kontext des Aufrufers (z.B. dessen Spotify-Priorität)
+        executor = self._background_executor if spotify_call_priority.get() == PRIORITY_BACKGROUND else self._executor
+        deadline = time.monotonic() + deadline_seconds
+        futures = [executor.submit(contextvars.copy_context().run, sp.search, q=query, type="track", limit=limit)
+                   for query, limit in queries]
+        with self._lock:
+            self.searches += 1
+            self.queries += len(futures)
+        pending = set(futures)
+        answered = False
+        first_error = None
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+                if not done:
+                    with self._lock:
+                        self.deadline_exits += 1
+                    return
+                for future in sorted(done, key=futures.index):
+                    try:
+                        items = future.result()['tracks']['items']
+                    except Exception as e:
+                        with self._lock:
+                            self.failed_queries += 1
+                        first_error = first_error or e
+                        yield futures.index(future), None
+                        continue
+                    answered = True
+                    yield futures.index(future), items
+                if answered and pending and is_confident():
+                    with self._lock:
+                        self.early_exits += 1
+                    return
+            if not answered and first_error is not None:
+                raise first_error
+        finally:
+            if pending and on_remaining is not None:
+                self._finish_in_background(futures, pending, on_remaining)
+            else:
+                for future in pending:
+                    future.cancel()
+
+    def _finish_in_background(self, futures, pending, on_remaining):
+        """Übergibt die Ergebnisse der noch offenen Varianten an on_remaining(), sobald die letzte fertig ist."""
+        results = []
+        lock = threading.Lock()
+        with self._lock:
+            self.finished_in_background += 1
+
+        def collect(future):
+            try:
+                items = future.result()['tracks']['items']
+            except Exception:
+                items = None
+                with self._lock:
+                    self.failed_queries += 1
+            with lock:
+                results.append((futures.index(future), items))
+                last = len(results) == len(pending)
+            if last:
+                on_remaining(sorted(results, key=lambda result: result[0]))
+
+        for future in list(pending):
+            future.add_done_callback(collect)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'searches': self.searches,
+                'queries': self.queries,
+                'failed_queries': self.failed_queries,
+                'early_exits': self.early_exits,
+                'deadline_exits': self.deadline_exits,
+                'finished_in_background': self.finished_in_background,
+            }
+
+search_fanout = SearchFanout(search_fanout_workers, search_fanout_background_workers)
+
+def _search_queries(cleaned_track_name, artist_names, release_year):
+    """Suchvarianten: die ursprüngliche Abfrage, je Interpret, ohne Feldfilter und nur frühere Jahre."""
+    queries = [(f"track:{cleaned_track_name} artist:{', '.join(artist_names)}", 50)]
+    if len(artist_names) > 1:
+        queries += [(f"track:{cleaned_track_name} artist:{name}", search_variant_limit) for name in artist_names[:search_max_artist_variants]]
+    queries.append((f"{cleaned_track_name} {artist_names[0]}", search_variant_limit))
+    if release_year > 1900:
+        queries.append((f"track:{cleaned_track_name} artist:{artist_names[0]} year:1900-{release_year - 1}", search_variant_limit))
+    return queries
+
+def search_original_version(sp, item, early_exit=None, on_complete=None):
+    """Sucht die früheste Veröffentlichung eines Songs über mehrere parallele Suchvarianten; gibt (Auflösung, vollständig) zurück.
+
+    Vollständig ist das Ergebnis nur, wenn jede Variante geantwortet hat; nur dann darf es in Caches, Cluster
+    und Index. Vorzeitig abbrechen (early_exit) darf standardmäßig nur der interaktive Aufruf; die übrigen
+    Varianten laufen dann im Hintergrund zu Ende. on_complete(Auflösung) wird aufgerufen, sobald ein
+    vollständiges Ergebnis vorliegt, also sofort oder erst nach den nachlaufenden Varianten.
+    """
+    if early_exit is None:
+        early_exit = spotify_call_priority.get() == PRIORITY_INTERACTIVE
+    artist_names = [artist["name"] for artist in item["artists"]]
+    initial_release_year = int(item["album"]["release_date"].split('-')[0])
+    cleaned_track_name = normalize_title(item["name"])
+    original_artist_names = [name.lower() for name in artist_names]
+    queries = _search_queries(cleaned_track_name, artist_names, initial_release_year)
+    # Die ursprüngliche Abfrage (limit 50) und die auf frühere Jahre gefilterte sehen am weitesten zurück
+    authoritative = {0, len(queries) - 1} if initial_release_year > 1900 else {0}
+    # Stand der Suche; nach einem Abbruch ergänzen ihn die nachlaufenden Varianten aus einem anderen Thread
+    state = {'year': initial_release_year, 'album': item["album"]["name"], 'failed': False}
+    matches = []
+    seen = set()
+    answered = set()
+    # Frühestes Jahr jeder Variante, die tatsächlich einen passenden Treffer hatte
+    variant_years = []
+    state_lock = threading.Lock()
+
+    def absorb(index, items):
+        if items is None:
+            state['failed'] = True
+            return
+        answered.add(index)
+        variant_year = None
+        for result in items:
+            try:
+                cleaned_result_track_name = normalize_title(result['name'])
+
+                if cleaned_track_name.lower() == cleaned_result_track_name.lower():
+                    result_artist_names = [artist["name"].lower() for artist in result["artists"]]
+                    if any(artist_name in result_artist_names for artist_name in original_artist_names):
+                        result_key = result.get('id') or (result['name'], result['album']['name'])
+                        if result_key not in seen:
+                            seen.add(result_key)
+                            matches.append(result)
+                        result_year = int(result['album']['release_date'].split('-')[0])
+                        variant_year = result_year if variant_year is None else min(variant_year, result_year)
+                        if result_year < state['year']:
+                            state['year'] = result_year
+                            state['album'] = result['album']['name']
+            except (KeyError, ValueError):
+                continue
+        if variant_year is not None:
+            variant_years.append(variant_year)
+
+    def snapshot():
+        resolution = {'original_year': state['year'], 'original_album': state['album'], 'cleaned_title': cleaned_track_name}
+        # Abgebrochene oder gescheiterte Varianten können ein früheres Jahr verpasst haben
+        return resolution, not state['failed'] and len(answered) == len(queries)
+
+    def store(resolution):
+        version_clusters.add_search_result(item, resolution, list(matches))
+        if on_complete is not None:
+            on_complete(resolution)
+
+    def is_confident():
+        # Sicher genug, sobald eine der weit zurückreichenden Abfragen geantwortet hat und zwei Varianten
+        # unabhängig dasselbe früheste Jahr liefern
+        return early_exit and bool(answered & authoritative) and variant_years.count(state['year']) >= 2
+
+    def finish(remaining):
+        with state_lock:
+            for index, items in remaining:
+                absorb(index, items)
+            resolution, complete = snapshot()
+        if complete:
+            store(resolution)
+
+    for index, items in search_fanout.search(sp, queries, search_deadline_seconds, is_confident, on_remaining=finish):
+        with state_lock:
+            absorb(index, items)
+
+    with state_lock:
+        resolution, complete = snapshot()
+    if complete:
+        store(resolution)
+    return resolution, complete
+
+
+### 🚦 GEMEINSAMES RATENBUDGET FÜR SPOTIFY ###
+
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_BACKGROUND = 'background'
+# Priorität der Spotify-Aufrufe im aktuellen Kontext (Request, Greenlet oder Hintergrund-Thread)
+spotify_call_priority = contextvars.ContextVar('spotify_call_priority', default=PRIORITY_INTERACTIVE)
+
+@contextlib.contextmanager
+def spotify_priority(priority):
+    """Setzt die Priorität für alle Spotify-Aufrufe innerhalb des Blocks."""
+    token = spotify_call_priority.set(priority)
+    try:
+        yield
+    finally:
+        spotify_call_priority.reset(token)
+
+class SpotifyRateLimited(spotipy.SpotifyException):
+    """Der Aufruf wurde wegen des aufgebrauchten Budgets oder eines Retry-After nicht (erneut) ausgeführt."""
+
+    def __init__(self, retry_after):
+        super().__init__(429, -1, f"Spotify-Ratenlimit erreicht, erneut in {retry_after:.1f} s",
+                         headers={'Retry-After': str(math.ceil(retry_after))})
+        self.retry_after = retry_after
+
+# Token-Bucket und Sperre nach 429 atomar in Redis; KEYS: Bucket, Sperre; ARGV: Rate, Kapazität, Reserve
+_TOKEN_BUCKET_SCRIPT = """
+local blocked = redis.call('PTTL', KEYS[2])
+if blocked > 0 then return {0, tostring(blocked / 1000)} end
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local reserve = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = math.min(capacity, (tonumber(bucket[1]) or capacity) + math.max(0, now - (tonumber(bucket[2]) or now)) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= reserve + 1 then
+  tokens = tokens - 1
+  allowed = 1
+else
+  wait = (reserve + 1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+class RateGovernor:
+    """Token-Bucket für alle Spotify-Aufrufe der App (mit Redis über alle Worker), beachtet Retry-After und hält Budget für interaktive Aufrufe frei."""
+
+    def __init__(self, rate_per_second, burst, background_reserve_ratio, interactive_max_wait, background_max_wait,
+                 redis_client=None, key_prefix='quiz:ratelimit:'):
+        self.rate = rate_per_second
+        self.capacity = burst
+        # Hintergrundaufrufe dürfen den Bucket nur bis auf diese Reserve leeren
+        self.background_reserve = burst * background_reserve_ratio
+        self.interactive_max_wait = interactive_max_wait
+        self.background_max_wait = background_max_wait
+        self.redis_client = redis_client
+        self.bucket_key = key_prefix + 'bucket'
+        self.blocked_key = key_prefix + 'blocked'
+        self._script = redis_client.register_script(_TOKEN_BUCKET_SCRIPT) if redis_client is not None else None
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.granted = {PRIORITY_INTERACTIVE: 0, PRIORITY_BACKGROUND: 0}
+        self.throttled = {PRIORITY_INTERACTIVE: 0, PRIORITY_BACKGROUND: 0}
+        self.waits = 0
+        self.upstream_429 = 0
+        self.redis_errors = 0
+
+    def acquire(self, priority):
+        """Wartet höchstens die für die Priorität erlaubte Zeit auf ein Token, sonst SpotifyRateLimited."""
+        interactive = priority == PRIORITY_INTERACTIVE
+        reserve = 0 if interactive else self.background_reserve
+        deadline = time.monotonic() + (self.interactive_max_wait if interactive else self.background_max_wait)
+        while True:
+            allowed, wait_seconds = self._take(reserve)
+            if allowed:
+                with self._lock:
+                    self.granted[priority] += 1
+                return
+            if time.monotonic() + wait_seconds > deadline:
+                with self._lock:
+                    self.throttled[priority] += 1
+                metrics.inc('quiz_spotify_throttled_total', priority=priority,
+                            reason='retry_after' if self._blocked_for() > 0 else 'budget')
+                raise SpotifyRateLimited(wait_seconds)
+            with self._lock:
+                self.waits += 1
+            time.sleep(wait_seconds)
+
+    def rate_limited(self, headers):
+        """Verarbeitet ein 429 von Spotify: sperrt alle Worker für die Dauer von Retry-After und gibt diese zurück."""
+        try:
+            retry_after = max(float((headers or {}).get('Retry-After', 1)), 0.1)
+        except (TypeError, ValueError):
+            retry_after = 1.0
+        with self._lock:
+            self.upstream_429 += 1
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        if self.redis_client is not None:
+            try:
+                self.redis_client.set(self.blocked_key, '1', px=int(retry_after * 1000))
+            except redis.RedisError:
+                with self._lock:
+                    self.redis_errors += 1
+        return retry_after
+
+    def _blocked_for(self):
+        with self._lock:
+            return max(self._blocked_until - time.monotonic(), 0.0)
+
+    def _take(self, reserve):
+        blocked = self._blocked_for()
+        if blocked > 0:
+            return False, blocked
+        if self._script is not None:
+            try:
+                allowed, wait_seconds = self._script(keys=[self.bucket_key, self.blocked_key],
+                                                     args=[self.rate, self.capacity, reserve])
+                return bool(int(allowed)), float(wait_seconds)
+            except redis.RedisError:
+                with self._lock:
+                    self.redis_errors += 1
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= reserve + 1:
+                self._tokens -= 1
+                return True, 0.0
+            return False, (reserve + 1 - self._tokens) / self.rate
+
+    def stats(self):
+        blocked = self._blocked_for()
+        with self._lock:
+            return {
+                'shared': self._script is not None,
+                'granted_interactive': self.granted[PRIORITY_INTERACTIVE],
+                'granted_background': self.granted[PRIORITY_BACKGROUND],
+                'throttled_interactive': self.throttled[PRIORITY_INTERACTIVE],
+                'throttled_background': self.throttled[PRIORITY_BACKGROUND],
+                'waits': self.waits,
+                'upstream_429': self.upstream_429,
+                'blocked_seconds': round(blocked, 2),
+                'local_tokens': None if self._script is not None else round(self._tokens, 1),
+                'redis_errors': self.redis_errors,
+            }
+
+rate_governor = RateGovernor(spotify_rate_limit_per_second, spotify_rate_limit_burst, spotify_background_reserve_ratio,
+                             spotify_interactive_max_wait_seconds, spotify_background_max_wait_seconds, redis_client=get_redis())
+
+
+### 🎧 WIEDERGABE-SNAPSHOTS (SINGLE-FLIGHT) ###
+
+class _Flight:
+    """Eine laufende currently_playing()-Anfrage, auf die weitere Aufrufer warten können."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class PlaybackSnapshots:
+    """Hält pro Nutzer den letzten currently_playing()-Stand und bündelt gleichzeitige Abfragen zu einem Upstream-Aufruf."""
+
+    def __init__(self, max_age_seconds, max_users):
+        self.max_age_seconds = max_age_seconds
+        self.max_users = max_users
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.upstream_calls = 0
+        self.fresh_hits = 0
+        self.coalesced = 0
+        self.invalidations = 0
+        self.degraded = 0
+
+    def get(self, user_key, fetch, max_age_seconds=None):
+        """Gibt einen höchstens max_age_seconds alten Snapshot zurück; fetch() wird pro Nutzer nur einmal gleichzeitig ausgeführt."""
+        max_age = self.max_age_seconds if max_age_seconds is None else max_age_seconds
+        with self._lock:
+            entry = self._entries.get(user_key)
+            if entry is not None and time.monotonic() - entry[0] <= max_age:
+                self.fresh_hits += 1
+                return entry[1]
+            flight = self._inflight.get(user_key)
+            is_leader = flight is None
+            if is_leader:
+                flight = _Flight()
+                self._inflight[user_key] = flight
+                self.upstream_calls += 1
+            else:
+                self.coalesced += 1
+
+        if not is_leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        stale = False
+        try:
+            flight.value = fetch()
+        except SpotifyRateLimited as e:
+            # Budget erschöpft: lieber den letzten bekannten Stand zeigen als einen Fehler
+            last_known = self.peek(user_key)
+            if last_known is None:
+                flight.error = e
+                raise
+            flight.value, stale = last_known, True
+            with self._lock:
+                self.degraded += 1
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                # invalidate() nimmt die laufende Abfrage aus _inflight: ein zwischenzeitlich invalidierter
+                # oder nur wiederverwendeter Stand wird nicht neu gespeichert
+                current = self._inflight.get(user_key) is flight
+                if current:
+                    del self._inflight[user_key]
+                if flight.error is None and not stale and current:
+                    self._entries[user_key] = (time.monotonic(), flight.value)
+                    self._entries.move_to_end(user_key)
+                    while len(self._entries) > self.max_users:
+                        self._entries.popitem(last=False)
+            flight.done.set()
+        return flight.value
+
+    def peek(self, user_key):
+        """Letzter bekannter Stand unabhängig vom Alter (oder None), ohne Spotify zu fragen."""
+        with self._lock:
+            entry = self._entries.get(user_key)
+            return entry[1] if entry is not None else None
+
+    def invalidate(self, user_key):
+        """Verwirft den Snapshot nach einem Steuerbefehl, damit die nächste Abfrage den neuen Zustand holt."""
+        with self._lock:
+            self._entries.pop(user_key, None)
+            self._inflight.pop(user_key, None)
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'users': len(self._entries),
+                'upstream_calls': self.upstream_calls,
+                'fresh_hits': self.fresh_hits,
+                'coalesced': self.coalesced,
+                'saved_calls': self.fresh_hits + self.coalesced,
+                'invalidations': self.invalidations,
+                'degraded': self.degraded,
+            }
+
+playback_snapshots = PlaybackSnapshots(playback_snapshot_max_age_seconds, playback_snapshot_max_users)
+
+def get_current_playback(sp, max_age_seconds=None):
+    """currently_playing() für den angemeldeten Nutzer über den gemeinsamen Snapshot."""
+    return playback_snapshots.get(get_user_key(), sp.currently_playing, max_age_seconds)
+
+
+### 🔮 VORAUSLADEN DER AUFLÖSUNGEN ###
+
+def pooled_client_for(token_info):
+    return spotify_clients.get(token_info['access_token'], token_info.get('expires_at'))
+
+class ResolutionPrefetcher:
+    """Löst im Hintergrund das Originaljahr des aktuellen und der nächsten Songs in der Warteschlange auf."""
+
+    def __init__(self, max_workers, lookahead, max_pending, budget_per_user, budget_window_seconds, client_factory=pooled_client_for):
+        # client_factory erlaubt es, statt der echten Spotify-API einen lokalen Ersatz zu verwenden
+        self.lookahead = lookahead
+        self.max_pending = max_pending
+        self.budget_per_user = budget_per_user
+        self.budget_window_seconds = budget_window_seconds
+        self.client_factory = client_factory
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch')
+        self._inflight = {}
+        self._budgets = {}
+        self._last_track = {}
+        self._pruned_at = time.time()
+        self._lock = threading.Lock()
+        self.scheduled = 0
+        self.resolved = 0
+        self.already_cached = 0
+        self.over_budget = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def track_changed(self, user_key, token_info, item):
+        """Wird bei jedem erkannten Songwechsel aufgerufen: aktuellen Song sofort auflösen, dann die Warteschlange."""
+        track_id = item.get('id') if item else None
+        if not user_key or not track_id:
+            return
+        version_clusters.observe(item)
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            last_track_id, _ = self._last_track.get(user_key, (None, 0))
+            self._last_track[user_key] = (track_id, now)
+            if last_track_id == track_id:
+                return
+        self._schedule(user_key, token_info, item)
+        if self.lookahead > 0 and self._take_budget(user_key):
+            self._executor.submit(self._prefetch_queue, user_key, token_info)
+
+    def wait_for(self, track_id, timeout=prefetch_wait_seconds):
+        """Wartet auf eine bereits laufende Auflösung dieses Songs, statt dieselbe Suche ein zweites Mal zu starten."""
+        with self._lock:
+            future = self._inflight.get(track_id)
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            return None
+
+    def _prune(self, now):
+        """Vergisst (höchstens einmal pro Budgetfenster) Nutzer, deren letzter Songwechsel länger als ein Fenster zurückliegt."""
+        if now - self._pruned_at < self.budget_window_seconds:
+            return
+        self._pruned_at = now
+        for user_key in [key for key, (_, seen_at) in self._last_track.items() if now - seen_at > self.budget_window_seconds]:
+            del self._last_track[user_key]
+            self._budgets.pop(user_key, None)
+
+    def _take_budget(self, user_key):
+        now = time.time()
+        with self._lock:
+            window = self._budgets.setdefault(user_key, deque())
+            while window and now - window[0] > self.budget_window_seconds:
+                window.popleft()
+            if len(window) >= self.budget_per_user:
+                self.over_budget += 1
+                return False
+            window.append(now)
+            return True
+
+    def _schedule(self, user_key, token_info, item):
+        track_id = item['id']
+        if resolution_cache.get(track_id, count=False) is not None:
+            with self._lock:
+                self.already_cached += 1
+            return
+        with self._lock:
+            if track_id in self._inflight:
+                return
+            if len(self._inflight) >= self.max_pending:
+                self.dropped += 1
+                return
+        if not self._take_budget(user_key):
+            return
+        with self._lock:
+            if track_id in self._inflight:
+                return
+            self._inflight[track_id] = self._executor.submit(self._resolve, track_id, token_info, item)
+            self.scheduled += 1
+
+    def _resolve(self, track_id, token_info, item):
+        try:
+            with spotify_priority(PRIORITY_BACKGROUND):
+                resolution = resolve_original_version(self.client_factory(token_info), item)
+            with self._lock:
+                self.resolved += 1
+            return resolution
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(track_id, None)
+
+    def _prefetch_queue(self, user_key, token_info):
+        try:
+            with spotify_priority(PRIORITY_BACKGROUND):
+                upcoming = self.client_factory(token_info).queue().get('queue') or []
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            return
+        tracks = [item for item in upcoming if item and item.get('id') and item.get('type', 'track') == 'track']
+        # Die ganze Warteschlange füttert die Cluster, aufgelöst werden nur die nächsten Songs
+        for item in tracks:
+            version_clusters.observe(item)
+        for item in tracks[:self.lookahead]:
+            self._schedule(user_key, token_info, item)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._inflight),
+                'users': len(self._last_track),
+                'scheduled': self.scheduled,
+                'resolved': self.resolved,
+                'already_cached': self.already_cached,
+                'over_budget': self.over_budget,
+                'dropped': self.dropped,
+                'errors': self.errors,
+            }
+
+resolution_prefetcher = ResolutionPrefetcher(prefetch_workers, prefetch_lookahead, prefetch_max_pending,
+                                             prefetch_budget_per_user, prefetch_budget_window_seconds)
+
+def build_solution(sp, item):
+    """Lösung eines Songs für die Anzeige: Titel, Interpreten, Cover und die (vorab) aufgelöste Originalversion."""
+    album_image_url = "https://via.placeholder.com/300/1a1a1a?text=Error"
+    if item["album"]["images"]:
+        album_image_url = item["album"]["images"][0]["url"]
+    with timed_phase('resolve'):
+        resolution = resolution_prefetcher.wait_for(item['id']) or resolve_original_version(sp, item)
+    initial_release_year = int(item["album"]["release_date"].split('-')[0])
+    return {
+        'track_name': item["name"],
+        'artists': ", ".join([artist["name"] for artist in item["artists"]]),
+        'album_name': item["album"]["name"],
+        'album_image_url': album_image_url,
+        'initial_release_year': initial_release_year,
+        'original_release_year': resolution['original_year'],
+        'original_album_name': resolution['original_album'],
+        'cleaned_track_name': resolution['cleaned_title'],
+        'has_original': resolution['original_year'] < initial_release_year,
+    }
+
+
+### 🔑 TOKEN-ERNEUERUNG ###
+
+class TokenManager:
+    """Erneuert Access-Tokens höchstens einmal gleichzeitig pro Nutzer (mit Redis auch über alle Worker) und vorausschauend im Hintergrund."""
+
+    def __init__(self, redis_client=None, key_prefix='quiz:token:'):
+        self.redis_client = redis_client
+        self.key_prefix = key_prefix
+        self._tokens = {}
+        self._last_used = {}
+        self._user_locks = {}
+        self._lock = threading.Lock()
+        self._refresher = None
+        self.refreshes = 0
+        self.proactive_refreshes = 0
+        self.coalesced = 0
+        self.failures = 0
+        self.refresh_seconds_total = 0.0
+        self.refresh_seconds_max = 0.0
+
+    def get_valid_token(self, user_key, token_info):
+        """Gibt das neueste bekannte Token zurück und erneuert es nur, wenn es in weniger als token_refresh_margin_seconds abläuft."""
+        self._ensure_refresher()
+        token_info = self._newest(user_key, token_info)
+        with self._lock:
+            self._tokens[user_key] = token_info
+            self._last_used[user_key] = time.time()
+        if not self._expires_within(token_info, token_refresh_margin_seconds):
+            return token_info
+        return self._refresh(user_key, token_info, token_refresh_margin_seconds)
+
+    def _expires_within(self, token_info, seconds):
+        return token_info['expires_at'] - int(time.time()) < seconds
+
+    def _newest(self, user_key, token_info):
+        """Wählt unter Session-, Prozess- und Redis-Stand das Token mit der spätesten Ablaufzeit."""
+        candidates = [token_info]
+        with self._lock:
+            if user_key in self._tokens:
+                candidates.append(self._tokens[user_key])
+        shared = self._redis_get(user_key)
+        if shared is not None:
+            candidates.append(shared)
+        return max(candidates, key=lambda candidate: candidate['expires_at'])
+
+    def _user_lock(self, user_key):
+        with self._lock:
+            return self._user_locks.setdefault(user_key, threading.Lock())
+
+    def _refresh(self, user_key, token_info, margin_seconds, proactive=False):
+        with self._user_lock(user_key):
+            # Ein anderer Thread oder Worker hat das Token womöglich gerade erneuert
+            token_info = self._newest(user_key, token_info)
+            if not self._expires_within(token_info, margin_seconds):
+                with self._lock:
+                    self.coalesced += 1
+                return token_info
+            shared_lock = self._shared_lock(user_key)
+            try:
+                acquired = shared_lock.acquire() if shared_lock is not None else False
+            except redis.RedisError:
+                acquired = False
+            try:
+                token_info = self._newest(user_key, token_info)
+                if not self._expires_within(token_info, margin_seconds):
+                    with self._lock:
+                        self.coalesced += 1
+                    return token_info
+                start = time.perf_counter()
+                try:
+                    sp_oauth = create_spotify_oauth(cache_handler=spotipy.cache_handler.MemoryCacheHandler())
+                    with timed_phase('token_refresh'):
+                        token_info = sp_oauth.refresh_access_token(token_info['refresh_token'])
+                except Exception:
+                    with self._lock:
+                        self.failures += 1
+                    raise
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self._tokens[user_key] = token_info
+                    self.refreshes += 1
+                    self.proactive_refreshes += 1 if proactive else 0
+                    self.refresh_seconds_total += elapsed
+                    self.refresh_seconds_max = max(self.refresh_seconds_max, elapsed)
+                self._redis_set(user_key, token_info)
+                return token_info
+            finally:
+                if acquired:
+                    try:
+                        shared_lock.release()
+                    except redis.RedisError:
+                        pass
+
+    def _shared_lock(self, user_key):
+        if self.redis_client is None:
+            return None
+        return self.redis_client.lock(f"{self.key_prefix}lock:{user_key}", timeout=10, blocking_timeout=5)
+
+    def _redis_get(self, user_key):
+        if self.redis_client is None:
+            return None
+        try:
+            raw = self.redis_client.get(self.key_prefix + user_key)
+        except redis.RedisError:
+            return None
+        return json.loads(raw) if raw else None
+
+    def _redis_set(self, user_key, token_info):
+        if self.redis_client is None:
+            return
+        try:
+            ttl = max(token_info['expires_at'] - int(time.time()), 60)
+            self.redis_client.set(self.key_prefix + user_key, json.dumps(token_info), ex=ttl)
+        except redis.RedisError:
+            pass
+
+    def _ensure_refresher(self):
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._refresh_ahead, name='token-refresher', daemon=True)
+                self._refresher.start()
+
+    def _refresh_ahead(self):
+        """Erneuert Tokens aktiver Nutzer, bevor sie ablaufen, damit kein Request darauf warten muss."""
+        while True:
+            time.sleep(token_refresher_interval_seconds)
+            now = time.time()
+            with self._lock:
+                for user_key in [key for key, last_used in self._last_used.items() if now - last_used > token_refresher_active_user_seconds]:
+                    self._last_used.pop(user_key, None)
+                    self._tokens.pop(user_key, None)
+                    self._user_locks.pop(user_key, None)
+                due = [(key, token_info) for key, token_info in self._tokens.items()
+                       if self._expires_within(token_info, token_proactive_refresh_seconds)]
+            for user_key, token_info in due:
+                try:
+                    self._refresh(user_key, token_info, token_proactive_refresh_seconds, proactive=True)
+                except Exception:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'users': len(self._tokens),
+                'refreshes': self.refreshes,
+                'proactive_refreshes': self.proactive_refreshes,
+                'coalesced': self.coalesced,
+                'failures': self.failures,
+                'refresh_ms_avg': round(self.refresh_seconds_total / self.refreshes * 1000, 1) if self.refreshes else 0.0,
+                'refresh_ms_max': round(self.refresh_seconds_max * 1000, 1),
+            }
+
+token_manager = TokenManager(redis_client=get_redis())
+
+
+### ⏯️ BESTÄTIGUNG VON STEUERBEFEHLEN ###
+
+def mark_pending_change(kind, **expected):
+    """Merkt sich nach einem Steuerbefehl, welche Änderung die nächste Seitenanzeige abwarten soll."""
+    session['pending_change'] = dict(expected, kind=kind, since=time.time())
+
+def _pending_change_applied(pending_change, current_track):
+    if not current_track or not current_track.get('item'):
+        return True
+    if pending_change['kind'] == 'track':
+        if current_track['item']['id'] != pending_change.get('track_id'):
+            return True
+        return pending_change.get('allow_restart', False) and current_track.get('progress_ms', 0) < 2000
+    return current_track.get('is_playing') != pending_change.get('is_playing')
+
+def confirm_pending_change(sp, pending_change, current_track):
+    """Fragt mit Backoff nach, bis Spotify den neuen Zustand meldet, höchstens bis control_confirm_timeout_seconds nach dem Befehl."""
+    deadline = pending_change['since'] + control_confirm_timeout_seconds
+    delay = control_confirm_initial_delay_seconds
+    with timed_phase('control_confirm'):
+        while not _pending_change_applied(pending_change, current_track):
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, control_confirm_max_delay_seconds)
+            current_track = get_current_playback(sp, max_age_seconds=0)
+    return current_track
+
+
+### 📡 LIVE-UPDATES PER SERVER-SENT EVENTS ###
+
+def next_check_delay(current_track):
+    """Sekunden bis zur nächsten Abfrage: kurz nach dem erwarteten Songende, sonst mit Backoff (pausiert, früh im Song) und Jitter."""
+    if not current_track or not current_track.get('item') or not current_track.get('is_playing'):
+        delay = polling_paused_interval_seconds
+    else:
+        duration_ms = current_track['item'].get('duration_ms') or 0
+        remaining = (duration_ms - current_track.get('progress_ms', 0)) / 1000
+        if duration_ms and remaining <= polling_max_interval_seconds:
+            # Jitter hier nur nach hinten, damit die Abfrage nie vor dem Songwechsel liegt
+            return max(remaining + polling_track_end_margin_seconds * random.uniform(1, 2), polling_min_interval_seconds)
+        delay = polling_max_interval_seconds
+    # Nach unten streuen, damit viele Clients nicht im Gleichtakt abfragen
+    return delay * random.uniform(1 - polling_jitter_ratio, 1)
+
+class PlaybackWatcher:
+    """Ein Hintergrund-Thread pro Nutzer, der currently_playing() abfragt und Songwechsel an alle offenen Tabs verteilt.
+
+    Listener (z. B. ein Raum des Nutzers) bekommen nach jeder Abfrage den vollen Wiedergabestand.
+    """
+
+    def __init__(self, user_key, token_info):
+        self.user_key = user_key
+        self.token_info = token_info
+        self.track_id = None
+        self.has_state = False
+        self.polls = 0
+        self._subscribers = []
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._idle_since = time.time()
+        self._poll_requested_at = None
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"watcher-{user_key}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def update_token(self, token_info):
+        self.token_info = token_info
+
+    def subscribe(self):
+        subscriber = queue.Queue()
+        with self._lock:
+            self._subscribers.append(subscriber)
+            if self.has_state:
+                subscriber.put({'track_id': self.track_id})
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+            if not self._subscribers:
+                self._idle_since = time.time()
+
+    def add_listener(self, listener):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+            if not self._listeners:
+                self._idle_since = time.time()
+
+    def poll_soon(self, delay):
+        """Zieht die nächste Abfrage vor (z. B. nach einem Steuerbefehl aus der App)."""
+        with self._lock:
+            requested_at = time.monotonic() + delay
+            if self._poll_requested_at is None or requested_at < self._poll_requested_at:
+                self._poll_requested_at = requested_at
+        self._wake.set()
+
+    def _sleep_until_next_poll(self, delay):
+        poll_at = time.monotonic() + delay
+        while True:
+            with self._lock:
+                if self._poll_requested_at is not None:
+                    poll_at = min(poll_at, self._poll_requested_at)
+                remaining = poll_at - time.monotonic()
+                if remaining <= 0:
+                    self._poll_requested_at = None
+                    return
+            self._wake.wait(remaining)
+            self._wake.clear()
+
+    def _publish(self, event):
+        with self._lock:
+            for subscriber in self._subscribers:
+                subscriber.put(event)
+
+    def _is_idle(self):
+        with self._lock:
+            return not self._subscribers and not self._listeners and time.time() - self._idle_since > watcher_idle_grace_seconds
+
+    def _should_stop(self):
+        with _watchers_lock:
+            if not self._is_idle():
+                return False
+            if _watchers.get(self.user_key) is self:
+                del _watchers[self.user_key]
+            return True
+
+    def _run(self):
+        spotify_call_priority.set(PRIORITY_BACKGROUND)
+        while not self._should_stop():
+            delay = polling_interval_seconds
+            try:
+                self.token_info = token_manager.get_valid_token(self.user_key, self.token_info)
+                client = spotify_clients.get(self.token_info['access_token'], self.token_info.get('expires_at'))
+                current_track = playback_snapshots.get(self.user_key, client.currently_playing)
+                self.polls += 1
+                delay = next_check_delay(current_track)
+                track_id = current_track['item']['id'] if current_track and current_track.get('item') else None
+                if not self.has_state or track_id != self.track_id:
+                    self.track_id = track_id
+                    self.has_state = True
+                    self._publish({'track_id': track_id})
+                    if track_id:
+                        resolution_prefetcher.track_changed(self.user_key, self.token_info, current_track['item'])
+                with self._lock:
+                    listeners = list(self._listeners)
+                for listener in listeners:
+                    try:
+                        listener(current_track, client)
+                    except Exception:
+                        pass
+            except Exception:
+                pass
+            self._sleep_until_next_poll(delay)
+
+_watchers = {}
+_watchers_lock = threading.Lock()
+
+def _watcher_for(user_key, token_info):
+    """Gibt den Watcher des Nutzers zurück und startet ihn bei Bedarf (Aufrufer hält _watchers_lock)."""
+    watcher = _watchers.get(user_key)
+    if watcher is None:
+        watcher = PlaybackWatcher(user_key, token_info)
+        _watchers[user_key] = watcher
+        watcher.start()
+    else:
+        watcher.update_token(token_info)
+    return watcher
+
+def subscribe_to_playback(user_key, token_info):
+    """Meldet einen Tab beim Watcher des Nutzers an (startet ihn bei Bedarf) und gibt Watcher und Queue zurück."""
+    with _watchers_lock:
+        watcher = _watcher_for(user_key, token_info)
+        return watcher, watcher.subscribe()
+
+def listen_to_playback(user_key, token_info, listener):
+    """Hängt einen Listener an den Watcher des Nutzers; er hält den Watcher am Leben, bis er wieder entfernt wird."""
+    with _watchers_lock:
+        watcher = _watcher_for(user_key, token_info)
+        watcher.add_listener(listener)
+        return watcher
+
+def poll_playback_soon(user_key):
+    """Lässt einen laufenden Watcher kurz nach einem Steuerbefehl nachsehen, statt auf seinen Abfrageplan zu warten."""
+    with _watchers_lock:
+        watcher = _watchers.get(user_key)
+    if watcher is not None:
+        watcher.poll_soon(polling_after_control_seconds)
+
+def sse_message(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+### 🎉 RÄUME (PARTY-MODUS) ###
+
+# Ohne leicht verwechselbare Zeichen (0/O, 1/I/L), damit Gäste den Code abtippen können
+_ROOM_CODE_ALPHABET = 'ABCDEFGHJKMNPQRSTUVWXYZ23456789'
+
+class Room:
+    """Ein Raum: der Watcher des Hosts liefert den Wiedergabestand, alle Gäste bekommen ihn als fertigen Snapshot gepusht.
+
+    Gäste lösen keine eigenen Spotify-Aufrufe aus; Polling und Auflösung laufen einmal für den Host,
+    egal wie viele Gäste zusehen.
+    """
+
+    def __init__(self, code, host_key):
+        self.code = code
+        self.host_key = host_key
+        self.player_mode = False
+        self.state = None
+        self.closed = False
+        self.watcher = None
+        self.listener = None
+        self.last_host_activity = time.time()
+        self.broadcasts = 0
+        self.deliveries = 0
+        self.dropped = 0
+        self._revealed_track_id = None
+        self._solution = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+
+    @property
+    def viewers(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=room_viewer_queue_size)
+        with self._lock:
+            self._subscribers.append(subscriber)
+            if self.state is not None:
+                subscriber.put(self.state)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def update(self, current_track, sp, host_state=None):
+        """Übernimmt einen Wiedergabestand (vom Watcher oder aus einer Seitenanzeige des Hosts) und verteilt ihn bei Änderungen."""
+        if not current_track or not current_track.get('item'):
+            return
+        item = current_track['item']
+        with self._update_lock:
+            if host_state is not None:
+                self.last_host_activity = time.time()
+                self.player_mode = host_state['is_player_mode']
+                if host_state['is_solved']:
+                    self._revealed_track_id = item['id']
+                if host_state.get('solution'):
+                    self._solution = (item['id'], host_state['solution'])
+            show_solution = self.player_mode or self._revealed_track_id == item['id']
+            if show_solution and (self._solution is None or self._solution[0] != item['id']):
+                self._solution = (item['id'], build_solution(sp, item))
+            state = {
+                'track_id': item['id'],
+                'progress_ms': current_track.get('progress_ms', 0),
+                'duration_ms': item.get('duration_ms', 0),
+                'is_playing': current_track.get('is_playing', False),
+                'is_player_mode': False,
+                'is_solved': show_solution,
+                'show_solution': show_solution,
+            }
+            if show_solution:
+                state['solution'] = self._solution[1]
+            if self._changed(state):
+                self.publish(state)
+
+    def _changed(self, state):
+        """Neu verteilt wird bei Songwechsel, Play/Pause, Auflösung oder wenn der Fortschritt spürbar von der Hochrechnung abweicht."""
+        previous = self.state
+        if previous is None:
+            return True
+        if any(state[key] != previous[key] for key in ('track_id', 'is_playing', 'show_solution')):
+            return True
+        if ('solution' in state) != ('solution' in previous):
+            return True
+        expected = previous['progress_ms']
+        if previous['is_playing']:
+            expected += (time.time() - previous['published_at']) * 1000
+        return abs(state['progress_ms'] - expected) > room_progress_drift_ms
+
+    def publish(self, state):
+        """Legt den Snapshot in die Queue jedes Gastes; bei vollen Queues verdrängt er den ältesten, da nur der neueste Stand zählt."""
+        start = time.perf_counter()
+        state = dict(state, published_at=time.time())
+        with self._lock:
+            self.state = state
+            self.broadcasts += 1
+            for subscriber in self._subscribers:
+                self._offer(subscriber, state)
+            self.deliveries += len(self._subscribers)
+        metrics.observe('quiz_room_broadcast_seconds', time.perf_counter() - start)
+
+    def _offer(self, subscriber, event):
+        try:
+            subscriber.put_nowait(event)
+        except queue.Full:
+            try:
+                subscriber.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+            subscriber.put_nowait(event)
+
+    def close(self):
+        """Schließt den Raum; offene Gast-Streams bekommen None und enden."""
+        with self._lock:
+            self.closed = True
+            for subscriber in self._subscribers:
+                self._offer(subscriber, None)
+
+    def is_idle(self):
+        return not self.viewers and time.time() - self.last_host_activity > room_idle_seconds
+
+class RoomHub:
+    """Verteiler für alle Räume dieses Prozesses (Code → Raum); jeder Raum hängt als Listener am Watcher seines Hosts.
+
+    Räume leben nur im Speicher des Worker-Prozesses: bei mehreren Workern müssen Host und Gäste
+    auf demselben landen (ein gevent-Worker oder Sticky-Routing).
+    """
+
+    def __init__(self, max_rooms):
+        self.max_rooms = max_rooms
+        self.created = 0
+        self.expired = 0
+        # Zähler geschlossener Räume, damit die Summen in stats() nicht zurückspringen
+        self._closed_totals = {'broadcasts': 0, 'deliveries': 0, 'dropped': 0}
+        self._rooms = {}
+        self._by_host = {}
+        self._lock = threading.Lock()
+
+    def open(self, host_key, token_info):
+        """Öffnet einen Raum für den Host (oder gibt seinen bestehenden zurück); None, wenn das Limit erreicht ist."""
+        self._expire_idle()
+        with self._lock:
+            room = self._by_host.get(host_key)
+            if room is not None:
+                return room
+            if len(self._rooms) >= self.max_rooms:
+                return None
+            code = self._new_code()
+            room = Room(code, host_key)
+            self._rooms[code] = room
+            self._by_host[host_key] = room
+            self.created += 1
+        room.listener = lambda current_track, client: self._on_playback(room, current_track, client)
+        room.watcher = listen_to_playback(host_key, token_info, room.listener)
+        return room
+
+    def _new_code(self):
+        while True:
+            code = ''.join(secrets.choice(_ROOM_CODE_ALPHABET) for _ in range(room_code_length))
+            if code not in self._rooms:
+                return code
+
+    def get(self, code):
+        with self._lock:
+            return self._rooms.get(code.upper())
+
+    def for_host(self, host_key):
+        with self._lock:
+            return self._by_host.get(host_key)
+
+    def close(self, room):
+        """Entfernt den Raum und löst ihn vom Watcher des Hosts; False, wenn er schon geschlossen war."""
+        with self._lock:
+            if self._rooms.get(room.code) is not room:
+                return False
+            del self._rooms[room.code]
+            del self._by_host[room.host_key]
+        if room.watcher is not None:
+            room.watcher.remove_listener(room.listener)
+        room.close()
+        with self._lock:
+            for key in self._closed_totals:
+                self._closed_totals[key] += getattr(room, key)
+        return True
+
+    def _on_playback(self, room, current_track, client):
+        # Verlassene Räume schließen sich beim nächsten Poll selbst, damit ihr Watcher endet
+        if room.is_idle():
+            self._expire(room)
+            return
+        room.update(current_track, client)
+
+    def _expire(self, room):
+        if self.close(room):
+            with self._lock:
+                self.expired += 1
+
+    def _expire_idle(self):
+        with self._lock:
+            idle = [room for room in self._rooms.values() if room.is_idle()]
+        for room in idle:
+            self._expire(room)
+
+    def stats(self):
+        with self._lock:
+            rooms = list(self._rooms.values())
+            totals = dict(self._closed_totals)
+        return {
+            'rooms': len(rooms),
+            'viewers': sum(room.viewers for room in rooms),
+            'created': self.created,
+            'expired': self.expired,
+            **{key: total + sum(getattr(room, key) for room in rooms) for key, total in totals.items()},
+        }
+
+room_hub = RoomHub(room_max_rooms)
+
+
+### 🍪 SERVERSEITIGE SESSIONS ###
+
+# Kurze Schlüssel im gespeicherten Datensatz; andere Schlüssel werden unverändert abgelegt
+_SESSION_SHORT_KEYS = {TOKEN_INFO_KEY: 't', 'user_key': 'u', 'quiz_state': 'q', 'player_mode': 'p', 'theme': 'th', 'pending_change': 'c'}
+_SESSION_LONG_KEYS = {short: key for key, short in _SESSION_SHORT_KEYS.items()}
+_SESSION_ID = re.compile(r'[A-Za-z0-9_-]{32}')
+
+def pack_session(data):
+    """Serialisiert die Session kompakt; vom Token bleiben nur Access-Token, Refresh-Token und Ablaufzeit (Scope nur, wenn abweichend)."""
+    record = {}
+    for key, value in data.items():
+        if key == TOKEN_INFO_KEY and value:
+            value = [value['access_token'], value['refresh_token'], value['expires_at']] + ([value['scope']] if value.get('scope', scope) != scope else [])
+        record[_SESSION_SHORT_KEYS.get(key, key)] = value
+    return json.dumps(record, separators=(',', ':'))
+
+def unpack_session(raw):
+    data = {}
+    for key, value in json.loads(raw).items():
+        key = _SESSION_LONG_KEYS.get(key, key)
+        if key == TOKEN_INFO_KEY and value:
+            access_token, refresh_token, expires_at = value[:3]
+            value = {
+                'access_token': access_token, 'refresh_token': refresh_token, 'expires_at': expires_at,
+                'expires_in': max(expires_at - int(time.time()), 0), 'token_type': 'Bearer',
+                'scope': value[3] if len(value) > 3 else scope,
+            }
+        data[key] = value
+    return data
+
+class SessionStore:
+    """Kompakte Session-Datensätze: in Redis (für alle Worker) oder im Prozess (LRU mit Ablaufzeit)."""
+
+    # Die Version im Präfix ändert sich mit dem Standard-Scope: Datensätze ohne Scope-Feld meinen den damaligen
+    def __init__(self, max_entries, ttl_seconds, redis_client=None, key_prefix='quiz:session:2:'):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.redis_client = redis_client
+        self.key_prefix = key_prefix
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.misses = 0
+        self.saves = 0
+        self.deletes = 0
+        self.evictions = 0
+        self.redis_errors = 0
+        self.saved_bytes = 0
+
+    def load(self, sid):
+        raw = self._get(sid)
+        with self._lock:
+            self.loads += 1
+            if raw is None:
+                self.misses += 1
+                return None
+        return unpack_session(raw)
+
+    def save(self, sid, data):
+        raw = pack_session(data)
+        with self._lock:
+            self.saves += 1
+            self.saved_bytes += len(raw)
+        if self.redis_client is not None:
+            try:
+                self.redis_client.set(self.key_prefix + sid, raw, ex=self.ttl_seconds)
+            except redis.RedisError:
+                with self._lock:
+                    self.redis_errors += 1
+            return
+        with self._lock:
+            self._entries[sid] = (time.time() + self.ttl_seconds, raw)
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, sid):
+        with self._lock:
+            self.deletes += 1
+            self._entries.pop(sid, None)
+        if self.redis_client is not None:
+            try:
+                self.redis_client.delete(self.key_prefix + sid)
+            except redis.RedisError:
+                with self._lock:
+                    self.redis_errors += 1
+
+    def _get(self, sid):
+        if self.redis_client is not None:
+            try:
+                raw = self.redis_client.get(self.key_prefix + sid)
+            except redis.RedisError:
+                with self._lock:
+                    self.redis_errors += 1
+                return None
+            return raw.decode('utf-8') if raw else None
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            expires_at, raw = entry
+            if expires_at <= time.time():
+                del self._entries[sid]
+                return None
+            self._entries.move_to_end(sid)
+            return raw
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'redis' if self.redis_client is not None else 'memory',
+                'entries': len(self._entries),
+                'loads': self.loads,
+                'misses': self.misses,
+                'saves': self.saves,
+                'deletes': self.deletes,
+                'evictions': self.evictions,
+                'redis_errors': self.redis_errors,
+                'avg_record_bytes': round(self.saved_bytes / self.saves) if self.saves else 0,
+            }
+
+class ServerSession(SecureCookieSession):
+    """Session-Daten mit zufälliger ID; Lese- und Schreibzugriffe werden wie bei Flask-Cookie-Sessions verfolgt."""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        super().__init__(initial)
+        self.sid = sid or secrets.token_urlsafe(24)
+        self.new = new
+        self.replaced_sid = None
+
+    def regenerate(self):
+        """Neue ID nach dem Login, damit eine vorher bekannte ID nicht weiterverwendet werden kann."""
+        self.replaced_sid = self.replaced_sid or self.sid
+        self.sid = secrets.token_urlsafe(24)
+        self.modified = True
+
+class ServerSessionInterface(SessionInterface):
+    """Hält die Session serverseitig; der Cookie trägt nur die ID, geschrieben wird nur bei Änderungen."""
+
+    def __init__(self, store):
+        self.store = store
+        # Alte signierte Cookie-Sessions werden beim ersten Request einmalig übernommen
+        self.legacy = SecureCookieSessionInterface()
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and _SESSION_ID.fullmatch(sid):
+            data = self.store.load(sid)
+            if data is not None:
+                return ServerSession(data, sid=sid)
+        elif sid:
+            legacy = self.legacy.open_session(app, request)
+            if legacy:
+                migrated = ServerSession(dict(legacy), new=True)
+                migrated.modified = True
+                return migrated
+        return ServerSession(new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.accessed:
+            response.vary.add('Cookie')
+        if session.replaced_sid:
+            self.store.delete(session.replaced_sid)
+        if not session:
+            if session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=self.get_cookie_secure(app),
+                                       partitioned=self.get_cookie_partitioned(app), samesite=self.get_cookie_samesite(app),
+                                       httponly=self.get_cookie_httponly(app))
+            return
+        if not session.modified:
+            return
+        self.store.save(session.sid, dict(session))
+        response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session),
+                            httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                            secure=self.get_cookie_secure(app), partitioned=self.get_cookie_partitioned(app),
+                            samesite=self.get_cookie_samesite(app))
+
+session_store = None
+if SESSION_BACKEND in ('redis', 'memory'):
+    session_store = SessionStore(session_store_max_entries, session_ttl_seconds,
+                                 redis_client=get_redis() if SESSION_BACKEND == 'redis' else None)
+    app.session_interface = ServerSessionInterface(session_store)
+
+
+### 🎨 TEMPLATES ###
+
+# Statische Einstellungen, die in jedem Template verfügbar sind
+app.jinja_env.globals.update(
+    wave_animation_speed=wave_animation_speed,
+    progress_bar_fps=progress_bar_fps,
+    progress_wave_frames=progress_wave_frames,
+    polling_interval_seconds=polling_interval_seconds,
+    sse_enabled=SSE_ENABLED,
+    arrow_size=arrow_size,
+    arrow_thickness=arrow_thickness,
+    progress_bar_thickness=progress_bar_thickness,
+    album_art_hover_scale=album_art_hover_scale,
+    arrow_hover_scale=arrow_hover_scale,
+    button_hover_scale=button_hover_scale,
+    progress_bar_hover_increase_px=progress_bar_hover_increase_px,
+)
+
+# Beim Start erzeugte CSS/JS-Dateien: Dateiname mit Inhalts-Hash -> Inhalt, gzip-Variante, MIME-Typ
+STATIC_ASSETS = {}
+ASSET_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+def register_asset(stem, extension, content, mimetype):
+    """Legt ein Asset unter einem Namen mit Inhalts-Hash ab (inkl. vorkomprimierter gzip-Variante) und gibt den Dateinamen zurück."""
+    body = content.encode('utf-8')
+    digest = hashlib.sha256(body).hexdigest()[:12]
+    filename = f"{stem}.{digest}.{extension}"
+    STATIC_ASSETS[filename] = {
+        'body': body,
+        'gzip': gzip.compress(body, compresslevel=9, mtime=0),
+        'mimetype': mimetype,
+        'etag': digest,
+    }
+    return filename
+
+def prerender_palette_fragments():
+    """Rendert alle Teile, die nur von der Farbpalette abhängen, einmalig beim Start."""
+    fragments = {}
+    for key, colors in PALETTES.items():
+        fragments[key] = {
+            'colors': colors,
+            'stylesheet': register_asset(f"quiz-{key}", 'css', app.jinja_env.get_template('quiz.css').render(colors=colors), 'text/css'),
+            'theme_picker': Markup(app.jinja_env.get_template('theme_picker.html').render(colors=colors, palettes=PALETTES)),
+            'login_page': app.jinja_env.get_template('login.html').render(colors=colors),
+        }
+    return fragments
+
+PALETTE_FRAGMENTS = prerender_palette_fragments()
+app.jinja_env.globals['quiz_script'] = register_asset('quiz', 'js', app.jinja_env.get_template('quiz.js').render(), 'text/javascript')
+# Seiten-Templates schon beim Start kompilieren, nicht erst beim ersten Request
+for template_name in ('quiz.html', 'error.html'):
+    app.jinja_env.get_template(template_name)
+# Fließt in die ETags der Quiz-Seite ein, damit ein neues Deployment (Template oder Assets) alte Validatoren entwertet
+QUIZ_PAGE_VERSION = hashlib.sha256((app.jinja_env.loader.get_source(app.jinja_env, 'quiz.html')[0]
+                                    + ''.join(sorted(STATIC_ASSETS))).encode('utf-8')).hexdigest()[:12]
+CONDITIONAL_CACHE_CONTROL = 'private, no-cache'
+
+# Renderzeit aus den Flask-Signalen um jedes render_template()
+_render_timer = threading.local()
+
+@before_render_template.connect_via(app)
+def _render_started(sender, template, context, **extra):
+    _render_timer.start = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def _render_finished(sender, template, context, **extra):
+    start = getattr(_render_timer, 'start', None)
+    if start is not None:
+        elapsed = time.perf_counter() - start
+        _render_timer.start = None
+        metrics.observe('quiz_template_render_seconds', elapsed, template=template.name)
+        record_phase('render', elapsed)
 
 
 ### 🚀 ROUTEN ###
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.phases = {}
+
+@app.after_request
+def record_request_metrics(response):
+    """Misst die Dauer pro Route und loggt langsame Requests mit ihren Phasen."""
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.observe('quiz_http_request_duration_seconds', elapsed, route=route, method=request.method, status=response.status_code)
+    if SLOW_REQUEST_LOG_SECONDS and elapsed >= SLOW_REQUEST_LOG_SECONDS:
+        phases = sorted(g.get('phases', {}).items(), key=lambda item: -item[1][0])
+        breakdown = ", ".join(f"{phase} {seconds * 1000:.0f} ms ({count}x)" for phase, (seconds, count) in phases)
+        app.logger.warning("Langsamer Request %s %s: %.0f ms, Phasen: %s", request.method, request.path,
+                           elapsed * 1000, breakdown or "keine")
+    return response
+
 @app.route("/login")
 def login():
     """Leitet den Nutzer zur Spotify-Anmeldeseite weiter."""
@@ -123,6 +2292,10 @@ def logout():
     session.pop(TOKEN_INFO_KEY, None)
     session.pop('quiz_state', None)
     session.pop('player_mode', None)
+    room = room_hub.for_host(get_user_key())
+    if room is not None:
+        room_hub.close(room)
+    session.pop('user_key', None)
     return redirect(url_for('home'))
 
 @app.route("/callback")
@@ -130,371 +2303,161 @@ def callback():
     """Wird von Spotify nach der Anmeldung aufgerufen."""
     sp_oauth = create_spotify_oauth()
     code = request.args.get('code')
-    token_info = sp_oauth.get_access_token(code)
+    with timed_phase('token_exchange'):
+        token_info = sp_oauth.get_access_token(code)
     
+    if isinstance(session, ServerSession):
+        session.regenerate()
     session[TOKEN_INFO_KEY] = token_info
+    session['user_key'] = user_key_for(token_info)
     return redirect(url_for('home'))
 
+def current_quiz_state(sp):
+    """Ermittelt Song, Quizstand, Fortschritt und (falls sichtbar) die aufgelöste Lösung für die Seite und /api/state."""
+    is_player_mode = session.get('player_mode', False)
+    current_track = get_current_playback(sp)
+    pending_change = session.pop('pending_change', None)
+    if pending_change:
+        current_track = confirm_pending_change(sp, pending_change, current_track)
+    if not current_track or not current_track.get('item'):
+        raise ValueError("Kein abspielbarer Song gefunden.")
+
+    item = current_track['item']
+    quiz_state = session.get('quiz_state', {})
+    if item['id'] != quiz_state.get('track_id'):
+        quiz_state = {'track_id': item['id'], 'is_solved': False}
+        session['quiz_state'] = quiz_state
+        resolution_prefetcher.track_changed(get_user_key(), get_token(), item)
+
+    show_solution = is_player_mode or quiz_state.get('is_solved', False)
+    state = {
+        'track_id': item['id'],
+        'progress_ms': current_track.get('progress_ms', 0),
+        'duration_ms': item.get('duration_ms', 0),
+        'is_playing': current_track.get('is_playing', False),
+        'is_player_mode': is_player_mode,
+        'is_solved': quiz_state.get('is_solved', False),
+        'show_solution': show_solution,
+    }
+    if show_solution:
+        # Titel, Interpret und Cover erst mit der Auflösung herausgeben
+        state['solution'] = build_solution(sp, item)
+
+    room = room_hub.for_host(get_user_key())
+    if room is not None:
+        state['hosted_room'] = {'code': room.code, 'viewers': room.viewers}
+        room.update(current_track, sp, host_state=state)
+    return state
+
+def quiz_page_etag(track_id, is_solved, is_player_mode, theme_name, hosted_room):
+    """ETag der Quiz-Seite aus allem, was ihr Markup bestimmt (auch Code und Gästezahl eines eigenen Raums);
+    den Fortschritt holt sich die Seite selbst über /api/state."""
+    key = json.dumps([QUIZ_PAGE_VERSION, track_id, is_solved, is_player_mode, theme_name, hosted_room], sort_keys=True)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:20]
+
+def not_modified(etag):
+    """304 ohne Body für einen unveränderten Stand."""
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = CONDITIONAL_CACHE_CONTROL
+    return response
+
 @app.route("/")
 def home():
     sp = get_spotify_client()
     
     # Wähle die Farbpalette basierend auf der Session aus
     theme_name = session.get('theme', 'default')
-    colors = PALETTES.get(theme_name, PALETTES['default'])
+    palette = PALETTE_FRAGMENTS.get(theme_name, PALETTE_FRAGMENTS['default'])
 
     if not sp:
-        # Login-Seite
-        login_html = f"""
-        <!DOCTYPE html><html lang="de"><head><meta charset="UTF-8"><title>Login</title>
-        <style>
-            body {{
-                font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif;
-                background-color: #121212;
-                color: #B3B3B3;
-                display: flex;
-                flex-direction: column;
-                align-items: center;
-                justify-content: flex-start;
-                min-height: 100vh;
-                margin: 0;
-                text-align: center;
-                padding-top: 5vh;
-                padding-bottom: 5vh;
-            }}
-            .container {{
-                width: calc(100% - 2rem);
-                max-width: 600px;
-                padding: 3rem;
-                border-radius: 12px;
-                background-color: #1a1a1a;
-                box-shadow: 0 4px 15px rgba(0, 0, 0, 0.5);
-            }}
-            h1 {{
-                color: #FFFFFF;
-                font-size: clamp(1.5rem, 6vw, 2.5rem);
-                margin-bottom: 2rem;
-            }}
-            .button {{
-                padding: 12px 24px;
-                background-color: {colors['highlight_color']};
-                color: {colors['button_text_color']};
-                text-decoration: none;
-                border-radius: 50px;
-                font-weight: bold;
-                transition: background-color 0.3s, transform 0.3s;
-                display: inline-block;
-            }}
-            .button:hover {{
-                background-color: {colors['button_hover_color']};
-                transform: scale(1.05);
-            }}
-        </style></head><body><div class="container">
-            <h1>Spotify Song Quiz</h1>
-            <a href="/login" class="button">Mit Spotify anmelden</a>
-        </div></body></html>"""
-        return render_template_string(login_html)
+        # Login-Seite (pro Palette schon beim Start gerendert)
+        return palette['login_page']
 
     try:
-        is_player_mode = session.get('player_mode', False)
-        current_track = sp.currently_playing()
-        if not current_track or not current_track.get('item'):
-            raise ValueError("Kein abspielbarer Song gefunden.")
-
-        current_track_id = current_track['item']['id']
+        # Validator aus dem (gecachten) Wiedergabe-Snapshot: bei unverändertem Stand entfallen Auflösung und Rendern
+        current_track = get_current_playback(sp)
         quiz_state = session.get('quiz_state', {})
-        
-        if current_track_id != quiz_state.get('track_id'):
-            quiz_state = {'track_id': current_track_id, 'is_solved': False}
-            session['quiz_state'] = quiz_state
-            
-        show_solution = is_player_mode or quiz_state.get('is_solved', False)
-        
-        # ... (Logik zur Song-Anzeige bleibt gleich) ...
-        progress_ms = current_track.get('progress_ms', 0)
-        duration_ms = current_track['item'].get('duration_ms', 0)
-        is_playing = current_track.get('is_playing', False)
-
-        display_title = "Welcher Song ist das?"
-        display_artist = "Wer ist der Interpret?"
-        year_question_html = f'<h3 class="year-question">Aus welchem Jahr?</h3>'
-        info_section_html = ""
-        button_text = "Auflösen"
-        button_link = "/solve"
-        player_mode_checked = 'checked' if is_player_mode else ''
-
-        image_html = f"""
-        <div class="placeholder-quiz">
-            <svg class="quiz-icon" xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24" fill="none" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
-                <circle cx="12" cy="12" r="10"></circle>
-                <path d="M9.09 9a3 3 0 0 1 5.83 1c0 2-3 3-3 3"></path>
-                <line x1="12" y1="17" x2="12.01" y2="17"></line>
-            </svg>
-        </div>
-        """
+        if (current_track and current_track.get('item') and 'pending_change' not in session
+                and current_track['item']['id'] == quiz_state.get('track_id')):
+            room = room_hub.for_host(get_user_key())
+            etag = quiz_page_etag(quiz_state['track_id'], quiz_state.get('is_solved', False), session.get('player_mode', False),
+                                  theme_name, {'code': room.code, 'viewers': room.viewers} if room is not None else None)
+            if request.if_none_match.contains(etag):
+                return not_modified(etag)
 
-        track_name_raw = current_track["item"]["name"]
-        artists_string = ", ".join([artist["name"] for artist in current_track["item"]["artists"]])
-        album_name = current_track["item"]["album"]["name"]
-        initial_release_year = int(current_track["item"]["album"]["release_date"].split('-')[0])
-        album_image_url = "https://via.placeholder.com/300/1a1a1a?text=Error"
-        if current_track["item"]["album"]["images"]:
-            album_image_url = current_track["item"]["album"]["images"][0]["url"]
-
-        if show_solution:
-            display_title = track_name_raw
-            display_artist = artists_string
-            year_question_html = ""
-            button_text = "Nächstes Lied"
-            button_link = "/next"
-            image_html = f'<img class="album-art" src="{album_image_url}" alt="Album Cover">'
-
-            original_release_year = initial_release_year
-            original_album_name = album_name
-            
-            terms_to_remove = [
-                r"\s*-\s*\d{4}\s*Remastered.*", r"\s*-\s*Remastered.*",
-                r"\s*-\s*\d{4}\s*Remaster.*", r"\s*-\s*Remaster.*",
-                r"\(Remastered\)", r"\[Remastered\]",
-                r"\(Remaster\)", r"\[Remaster\]",
-                r"\s+-\s*Live.*", r"\(Live\)", r"\[Live\]",
-                r"\s*-\s*Edit.*", r"\(Edit\)",
-                r"\s*-\s*Single.*",  r"\(Single Version\)",
-                r"\s*-\s*Mono.*", r"\(Mono Version\)",
-                r"\s*-\s*Stereo.*", r"\(Stereo Version\)",
-                r"\s*-\s*Original.*", r"\(Original Version\)", r"\(Original\)",
-                r"\s*-\s*Radio.*", r"\(Radio Version\)", r"\(Radio\)"
-            ]
-            
-            cleaned_track_name = track_name_raw
-            for pattern in terms_to_remove: 
-                cleaned_track_name = re.sub(pattern, "", cleaned_track_name, flags=re.IGNORECASE).strip()
-            
-            original_artist_names = [artist["name"].lower() for artist in current_track["item"]["artists"]]
-            
-            results = sp.search(q=f"track:{cleaned_track_name} artist:{artists_string}", type="track", limit=50)
-            for result in results['tracks']['items']:
-                try:
-                    result_track_name_raw = result['name']
-                    cleaned_result_track_name = result_track_name_raw
-                    for pattern in terms_to_remove:
-                        cleaned_result_track_name = re.sub(pattern, "", cleaned_result_track_name, flags=re.IGNORECASE).strip()
-
-                    if cleaned_track_name.lower() == cleaned_result_track_name.lower():
-                        result_artist_names = [artist["name"].lower() for artist in result["artists"]]
-                        if any(artist_name in result_artist_names for artist_name in original_artist_names):
-                            result_year = int(result['album']['release_date'].split('-')[0])
-                            if result_year < original_release_year:
-                                original_release_year = result_year
-                                original_album_name = result['album']['name']
-                except (KeyError, ValueError): 
-                    continue
-
-            initial_year_html = ""
-            original_info_html = ""
-            prominent_year_html = f'<p class="prominent-year">{initial_release_year}</p>'
-            if original_release_year < initial_release_year: #or track_name_raw != cleaned_track_name:
-                prominent_year_html = f'<p class="prominent-year">{original_release_year}</p>'
-                initial_year_html = f'<p><strong>Veröffentlichungsjahr:</strong> {initial_release_year}</p>'
-                original_info_html = f"""<div class="info-box"><h3>Originalversion</h3><p><strong>Original-Titel für Suche:</strong> {cleaned_track_name}</p><p><strong>Original-Album:</strong> {original_album_name}</p></div>"""
-            
-            info_section_html = f"""
-            <div class="info-section">
-                <hr class="info-divider">
-                <div class="info-box">
-                    <p><strong>Album:</strong> {album_name}</p>
-                    {initial_year_html}
-                </div>
-                {original_info_html}
-                {prominent_year_html}
-            </div>
-            """
-        
-        # HTML-Block für den interaktiven Farbwähler erstellen
-        options_html = ""
-        for key, palette in PALETTES.items():
-            options_html += f'<a href="/set-theme/{key}" class="theme-dot" style="background-color: {palette["highlight_color"]};" title="{palette["name"]}"></a>'
-
-        theme_selector_html = f"""
-        <div class="theme-picker">
-            <div id="theme-picker-toggle" class="theme-dot main-dot" style="background-color: {colors['highlight_color']};" title="Farbe ändern"></div>
-            <div id="theme-options" class="theme-options-container">
-                {options_html}
-            </div>
-        </div>
-        """
-        
-        html_content = f"""
-        <!DOCTYPE html>
-        <html lang="de">
-        <head>
-        <meta charset="UTF-8"><meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <link rel="preconnect" href="https://fonts.googleapis.com">
-        <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
-        <link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;700&display=swap" rel="stylesheet">
-        <title>Spotify Song Quiz</title>
-        <style>
-            * {{ box-sizing: border-box; }}
-            body {{ font-family: 'Inter', -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif; background-color: #121212; color: #B3B3B3; display: flex; flex-direction: column; align-items: center;justify-content: flex-start;min-height: 100vh; margin: 0; text-align: center;padding-top: 5vh;padding-bottom: 5vh;}}
-            .container {{ width: calc(100% - 2rem); max-width: 600px; padding: 2rem; border-radius: 12px; background-color: #1a1a1a; box-shadow: 0 4px 15px rgba(0, 0, 0, 0.5); }}
-            .album-art-container {{ display: flex; align-items: center; justify-content: center; gap: 20px; width: 100%; max-width: 450px; margin: 0 auto 1.5rem; }}
-            .album-art-link {{ flex: 1 1 0; min-width: 0; display: flex; justify-content: center; transition: transform 0.3s ease; }}
-            .album-art-link:hover {{ transform: scale({album_art_hover_scale}); }}
-            .album-art, .placeholder-quiz {{ width: 100%; max-width: 300px; height: auto; aspect-ratio: 1 / 1; border-radius: 8px; box-shadow: 0 4px 10px rgba(0, 0, 0, 0.3); }}
-            .placeholder-quiz {{ display: flex; align-items: center; justify-content: center; background-color: #282828; }}
-            .quiz-icon {{ width: 60%; height: auto; stroke: {colors['highlight_color']}; transition: stroke 0.2s ease-in-out; }}
-            .album-art-link:hover .quiz-icon {{ stroke: {colors['button_hover_color']}; }}
-            .control-arrow svg {{ width: {arrow_size}; height: {arrow_size}; stroke: {colors['highlight_color']}; stroke-width: {arrow_thickness}; transition: transform 0.3s ease, stroke 0.3s ease; }}
-            .control-arrow:hover svg {{ stroke: {colors['button_hover_color']}; transform: scale({arrow_hover_scale}); }}
-            h1 {{ color: #FFFFFF; font-size: clamp(1.5rem, 6vw, 2.5rem); margin-bottom: 0.5rem; min-height: 1.2em; }}
-            h2 {{ color: #B3B3B3; font-size: clamp(1rem, 3vw, 1.2rem); margin: 0.5rem 0 1.5rem; min-height: 1.2em; }}
-            .year-question {{ color: {colors['highlight_color']}; font-size: clamp(1.1rem, 4vw, 1.4rem); font-weight: bold; margin-top: 2rem; margin-bottom: 1.5rem;}}
-            .info-section {{ width: 100%; text-align: center; }}
-            .info-box strong {{ color: #FFFFFF; }}
-            .info-box h3 {{ color: #FFFFFF; margin-top: 1.5rem; margin-bottom: 0.5rem;}}
-            .info-divider {{ margin: 2rem 0; border: 0; border-top: 1px solid #333; }}
-            .button {{ padding: 12px 24px; background-color: {colors['highlight_color']}; color: {colors['button_text_color']}; text-decoration: none; border-radius: 50px; font-weight: bold; margin-top: 20px; display: inline-block; transition: background-color 0.3s, transform 0.3s ease; }}
-            .button:hover {{ background-color: {colors['button_hover_color']}; transform: scale({button_hover_scale}); }}
-            .prominent-year {{ font-size: clamp(3rem, 12vw, 4rem); font-weight: bold; color: {colors['highlight_color']}; margin: 1rem 0; }}
-            .progress-svg-container {{ width: 80%; max-width: 350px; margin: 20px auto 0; }}
-            .progress-interactive-area {{ width: 80%; margin: 0 auto; height: 14px; cursor: pointer; }}
-            .progress-interactive-area svg {{ width: 100%; height: 100%; overflow: visible; }}
-            #progressTrack, #progressFill {{ fill: none; stroke-width: {progress_bar_thickness}; stroke-linecap: round; stroke-linejoin: round; transition: stroke-width 0.2s ease, stroke 0.2s ease; }}
-            #progressTrack {{ stroke: #444; }}
-            #progressFill {{ stroke: {colors['highlight_color']}; }}
-            .progress-interactive-area:hover #progressFill, .progress-interactive-area:hover #progressTrack {{ stroke-width: {progress_bar_thickness + progress_bar_hover_increase_px}; }}
-            .progress-interactive-area:hover #progressFill {{ stroke: {colors['button_hover_color']}; }}
-            .player-mode-toggle {{ margin-top: 30px; margin-bottom: 15px; display: flex; flex-direction: column; align-items: center; gap: 10px; }}
-            .toggle-label {{ font-size: 0.9rem; color: #B3B3B3; }}
-            .switch {{ position: relative; display: inline-block; width: 50px; height: 28px; }}
-            .switch input {{ opacity: 0; width: 0; height: 0; }}
-            .slider {{ position: absolute; cursor: pointer; top: 0; left: 0; right: 0; bottom: 0; background-color: #444; transition: .4s; border-radius: 28px; }}
-            .slider:before {{ position: absolute; content: ""; height: 22px; width: 22px; left: 3px; bottom: 3px; background-color: white; transition: .4s; border-radius: 50%; }}
-            input:checked + .slider {{ background-color: {colors['highlight_color']}; }}
-            input:checked + .slider:before {{ transform: translateX(22px); }}
-            
-            /* --- CSS für den interaktiven Farbwähler --- */
-            .theme-picker {{
-                position: relative;
-                margin-top: 25px;
-                margin-bottom: 20px;
-                display: flex;
-                justify-content: center;
-            }}
-            .theme-options-container {{
-                position: absolute;
-                bottom: 130%;
-                left: 50%;
-                transform: translateX(-50%);
-                display: flex;
-                gap: 12px;
-                padding: 10px;
-                background-color: #282828;
-                border-radius: 50px;
-                box-shadow: 0 4px 10px rgba(0,0,0,0.4);
-                opacity: 0;
-                visibility: hidden;
-                transform: translate(-50%, 10px);
-                transition: opacity 0.3s ease, transform 0.3s ease, visibility 0.3s;
-            }}
-            .theme-options-container.active {{
-                opacity: 1;
-                visibility: visible;
-                transform: translate(-50%, 0);
-            }}
-            .theme-dot {{
-                width: 24px;
-                height: 24px;
-                border-radius: 50%;
-                border: 2px solid #555;
-                transition: transform 0.2s;
-                display: block;
-                cursor: pointer;
-            }}
-            .theme-dot:hover {{
-                transform: scale(1.2);
-            }}
-            .main-dot {{
-                 width: 30px;
-                 height: 30px;
-                 border-color: #888;
-            }}
-        </style>
-        </head>
-        <body>
-        <div class="container">
-            <div class="album-art-container">
-                <a href="/previous" class="control-arrow"><svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-linecap="round" stroke-linejoin="round"><polyline points="15 18 9 12 15 6"></polyline></svg></a>
-                <a href="/play_pause" class="album-art-link">{image_html}</a>
-                <a href="/next" class="control-arrow"><svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-linecap="round" stroke-linejoin="round"><polyline points="9 18 15 12 9 6"></polyline></svg></a>
-            </div>
-            <div class="progress-svg-container"><div class="progress-interactive-area"><svg viewBox="0 0 300 14"><path id="progressTrack" d=""></path><path id="progressFill" d=""></path></svg></div></div>
-            <h1>{display_title}</h1><h2>{display_artist}</h2>{year_question_html}{info_section_html}
-            <a href="{button_link}" class="button">{button_text}</a>
-            <div class="player-mode-toggle"><label for="playerMode" class="toggle-label">Player-Modus</label><label class="switch"><input type="checkbox" id="playerMode" name="playerMode" {player_mode_checked}><span class="slider"></span></label></div>
-            {theme_selector_html}
-            <a href="/logout" style="font-size: 0.8rem; color: #888; margin-top: 10px; display:inline-block;">Logout</a>
-        </div>
-        
-        <script>
-            document.addEventListener('DOMContentLoaded', function() {{
-                const progressTrack = document.getElementById('progressTrack'); const progressFill = document.getElementById('progressFill'); const interactiveArea = document.querySelector('.progress-interactive-area'); const svgWidth = 300; const svgHeight = 14; const midHeight = svgHeight / 2; const amplitude = 6; const frequency = 0.05; const segments = 150; const waveSpeed = {wave_animation_speed};
-                let initialTrackId = '{current_track_id}'; const pollingInterval = {polling_interval_seconds} * 1000;
-                if (initialTrackId === 'None') {{ initialTrackId = null; }}
-                let currentProgress = {progress_ms}; const totalDuration = {duration_ms}; const isPlaying = {str(is_playing).lower()};
-                let animationFrameId = null; let animationStartTime = performance.now();
-                function generateWavePath(phase) {{ let path = `M 0 ${{midHeight}}`; for (let i = 0; i <= segments; i++) {{ const x = (i / segments) * svgWidth; const fadeWidth = svgWidth * 0.1; let currentAmplitude = amplitude; if (x < fadeWidth) {{ currentAmplitude = amplitude * Math.sin((x / fadeWidth) * (Math.PI / 2)); }} else if (x > svgWidth - fadeWidth) {{ currentAmplitude = amplitude * Math.sin(((svgWidth - x) / fadeWidth) * (Math.PI / 2)); }} const y = midHeight + Math.sin(x * frequency + phase) * currentAmplitude; path += ` L ${{x.toFixed(3)}} ${{y.toFixed(3)}}`; }} return path; }}
-                function updateProgressBar(progress) {{ if (totalDuration > 0) {{ const progressRatio = Math.min(progress / totalDuration, 1); const dynamicPhase = progressRatio * Math.PI * waveSpeed; const wavePath = generateWavePath(dynamicPhase); progressTrack.setAttribute('d', wavePath); progressFill.setAttribute('d', wavePath); const totalLength = progressFill.getTotalLength(); if (totalLength > 0) {{ progressFill.style.strokeDasharray = totalLength; progressFill.style.strokeDashoffset = totalLength * (1 - progressRatio); }} }} }}
-                function animate(currentTime) {{ const elapsedTime = currentTime - animationStartTime; const newProgress = currentProgress + elapsedTime; updateProgressBar(newProgress); if (newProgress < totalDuration) {{ animationFrameId = requestAnimationFrame(animate); }} }}
-                function startAnimation() {{ if (isPlaying) {{ animationStartTime = performance.now(); animationFrameId = requestAnimationFrame(animate); }} }}
-                function stopAnimation() {{ if (animationFrameId) {{ cancelAnimationFrame(animationFrameId); animationFrameId = null; }} }}
-                updateProgressBar(currentProgress); startAnimation();
-                interactiveArea.addEventListener('click', function(event) {{ if (totalDuration > 0) {{ stopAnimation(); const rect = interactiveArea.getBoundingClientRect(); const clickX = event.clientX - rect.left; const clickPercentage = Math.max(0, Math.min(1, clickX / rect.width)); const seekPositionMs = Math.round(clickPercentage * totalDuration); currentProgress = seekPositionMs; updateProgressBar(currentProgress); startAnimation(); fetch('/seek', {{ method: 'POST', headers: {{ 'Content-Type': 'application/json' }}, body: JSON.stringify({{ position_ms: seekPositionMs }}) }}).catch(error => console.error('Error seeking track:', error)); }} }});
-                setInterval(function() {{ fetch('/check-song').then(response => response.ok ? response.json() : Promise.reject('Network response was not ok')).then(data => {{ if (data && data.track_id !== initialTrackId) {{ window.location.reload(); }} }}).catch(error => console.error('Error during polling:', error)); }}, pollingInterval);
-                const playerModeToggle = document.getElementById('playerMode');
-                if (playerModeToggle) {{ playerModeToggle.addEventListener('change', function() {{ const isEnabled = this.checked; fetch('/toggle-player-mode', {{ method: 'POST', headers: {{ 'Content-Type': 'application/json' }}, body: JSON.stringify({{ playerMode: isEnabled }}) }}).then(response => response.ok ? response.json() : Promise.reject('Failed to toggle mode')).then(data => {{ if (data.success) {{ window.location.reload(); }} }}).catch(error => console.error('Error:', error)); }}); }}
-                
-                const themePickerToggle = document.getElementById('theme-picker-toggle');
-                const themeOptions = document.getElementById('theme-options');
-
-                if (themePickerToggle && themeOptions) {{
-                    themePickerToggle.addEventListener('click', function(event) {{
-                        event.stopPropagation(); 
-                        themeOptions.classList.toggle('active');
-                    }});
-
-                    document.addEventListener('click', function() {{
-                        if (themeOptions.classList.contains('active')) {{
-                            themeOptions.classList.remove('active');
-                        }}
-                    }});
-                }}
-            }});
-        </script>
-        </body>
-        </html>
-        """
-        
-        return render_template_string(html_content)
+        state = current_quiz_state(sp)
+        solution = state.get('solution') or {}
+        # rendered_at verrät dem Seitenskript, ob die Seite aus dem Browser-Cache kommt und der Fortschritt nachgeladen werden muss
+        response = make_response(render_template('quiz.html', palette=palette, page_data=dict(state, rendered_at=int(time.time() * 1000)),
+                                                 is_player_mode=state['is_player_mode'], show_solution=state['show_solution'], solution=solution))
+        response.set_etag(quiz_page_etag(state['track_id'], state['is_solved'], state['is_player_mode'], theme_name,
+                                          state.get('hosted_room')))
+        response.headers['Cache-Control'] = CONDITIONAL_CACHE_CONTROL
+        return response
 
     except Exception as e:
-        theme_name = session.get('theme', 'default')
-        colors = PALETTES.get(theme_name, PALETTES['default'])
-        error_html = f"""<!DOCTYPE html><html lang="de"><head><meta charset="UTF-8"><title>Fehler</title><style>body{{font-family:-apple-system,sans-serif;background-color:#121212;color:#b3b3b3;display:flex;flex-direction:column;align-items:center;justify-content:center;min-height:100vh;margin:0;text-align:center;padding:1rem}}.container{{width:calc(100% - 2rem);max-width:600px;padding:2.5rem;border-radius:12px;background-color:#1a1a1a;box-shadow:0 4px 15px rgba(0,0,0,0.5)}}h1{{color:#fff;margin-bottom:1rem}}p{{margin:1rem 0;line-height:1.6}}.button{{padding:12px 24px;background-color:{colors['highlight_color']};color: {colors['button_text_color']};text-decoration:none;border-radius:50px;font-weight:700;margin-top:20px;display:inline-block;transition:background-color .3s,transform .3s ease}}.button:hover{{background-color:{colors['button_hover_color']};transform:scale(1.05)}}.error-details{{margin-top:2rem;font-size:.8rem;color:#666}}</style></head><body><div class="container"><h1>Fehler oder kein Song aktiv</h1><p>Möglicherweise wird gerade ein lokaler Song abgespielt, oder es ist kein Titel aktiv. Bitte stelle sicher, dass ein Song von Spotify wiedergegeben wird.</p><a href="/" class="button">Aktualisieren / Neu anmelden</a><p class="error-details"><small>Details: {e}</small></p></div></body></html>"""
-        return render_template_string(error_html)
+        return render_template('error.html', colors=palette['colors'], error=e)
+
+@app.route("/api/state")
+def api_state():
+    """Kompakter Quiz- und Wiedergabestand als JSON; das Seitenskript patcht damit nur die geänderten Abschnitte."""
+    sp = get_spotify_client()
+    if not sp: return jsonify({'track_id': None})
+    try:
+        response = jsonify(current_quiz_state(sp))
+    except Exception:
+        response = jsonify({'track_id': None})
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
 
 # Die restlichen Routen müssen jetzt auch den Spotify-Client über die Helfer-Funktion holen
 @app.route("/check-song")
 def check_song():
+    """Aktuelle Track-ID (mit ETag) plus Hinweis im Header X-Next-Check-Ms, wann der Client wieder nachfragen soll."""
     sp = get_spotify_client()
     if not sp: return jsonify({'track_id': None})
+    current_track = None
     try:
-        current_track = sp.currently_playing()
+        # Polling ist Hintergrundlast; bei knappem Budget kommt der letzte bekannte Stand
+        with spotify_priority(PRIORITY_BACKGROUND):
+            current_track = get_current_playback(sp)
         track_id = current_track['item']['id'] if current_track and current_track.get('item') else None
-        return jsonify({'track_id': track_id})
     except Exception:
-        return jsonify({'track_id': None})
+        track_id = None
+    # Der Body hängt nur an der Track-ID; der Abfrageplan steht im Header und kommt so auch mit jeder 304
+    response = jsonify({'track_id': track_id})
+    response.headers['X-Next-Check-Ms'] = str(round(next_check_delay(current_track) * 1000))
+    response.headers['Cache-Control'] = CONDITIONAL_CACHE_CONTROL
+    response.set_etag(hashlib.sha256(f"{QUIZ_PAGE_VERSION}:{track_id}".encode('utf-8')).hexdigest()[:20])
+    return response.make_conditional(request)
+
+@app.route("/events")
+def events():
+    """Server-Sent-Events-Stream, der bei jedem Songwechsel ein 'track'-Event sendet."""
+    token_info = get_token()
+    if not token_info or not SSE_ENABLED:
+        # 204 beendet die automatischen Reconnects von EventSource
+        return Response(status=204)
+    watcher, subscriber = subscribe_to_playback(get_user_key(), token_info)
+
+    def stream():
+        try:
+            # Der Stream endet regelmäßig, damit der Browser neu verbindet und dabei das Token erneuert wird
+            yield f"retry: {polling_interval_seconds * 1000}\n\n"
+            deadline = time.time() + sse_stream_seconds
+            while time.time() < deadline:
+                try:
+                    event = subscriber.get(timeout=min(sse_keepalive_seconds, max(deadline - time.time(), 0.1)))
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield sse_message('track', event)
+        finally:
+            watcher.unsubscribe(subscriber)
+
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/seek', methods=['POST'])
 def seek():
@@ -505,7 +2468,8 @@ def seek():
         position_ms = data.get('position_ms')
         if isinstance(position_ms, int):
             sp.seek_track(position_ms)
-            time.sleep(0.2)
+            playback_snapshots.invalidate(get_user_key())
+            poll_playback_soon(get_user_key())
             return jsonify({'success': True})
         return jsonify({'success': False, 'error': 'Invalid position'})
     except Exception as e:
@@ -520,12 +2484,15 @@ def toggle_player_mode():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
-@app.route("/solve")
+@app.route("/solve", methods=['GET', 'POST'])
 def solve():
     if 'quiz_state' in session:
         quiz_state = session['quiz_state']
         quiz_state['is_solved'] = True
         session['quiz_state'] = quiz_state
+    # Das Seitenskript löst per POST auf und bekommt direkt den neuen Stand zurück
+    if request.method == 'POST':
+        return api_state()
     return redirect(url_for('home'))
 
 @app.route("/play_pause")
@@ -533,12 +2500,15 @@ def play_pause():
     sp = get_spotify_client()
     if not sp: return redirect(url_for('home'))
     try:
-        current_track = sp.currently_playing()
-        if current_track and current_track['is_playing']:
+        current_track = get_current_playback(sp)
+        was_playing = bool(current_track and current_track['is_playing'])
+        if was_playing:
             sp.pause_playback()
         else:
             sp.start_playback()
-        time.sleep(0.5)
+        playback_snapshots.invalidate(get_user_key())
+        poll_playback_soon(get_user_key())
+        mark_pending_change('playback', is_playing=was_playing)
     except Exception:
         pass
     return redirect(url_for('home'))
@@ -549,8 +2519,10 @@ def next_track():
     if not sp: return redirect(url_for('home'))
     try:
         sp.next_track()
-        session.pop('quiz_state', None)
-        time.sleep(0.5)
+        playback_snapshots.invalidate(get_user_key())
+        poll_playback_soon(get_user_key())
+        previous_track_id = session.pop('quiz_state', {}).get('track_id')
+        mark_pending_change('track', track_id=previous_track_id)
     except Exception:
         pass
     return redirect(url_for('home'))
@@ -561,12 +2533,139 @@ def previous_track():
     if not sp: return redirect(url_for('home'))
     try:
         sp.previous_track()
-        session.pop('quiz_state', None)
-        time.sleep(0.5)
+        playback_snapshots.invalidate(get_user_key())
+        poll_playback_soon(get_user_key())
+        previous_track_id = session.pop('quiz_state', {}).get('track_id')
+        # "Zurück" kann auch nur den aktuellen Song neu starten
+        mark_pending_change('track', track_id=previous_track_id, allow_restart=True)
     except Exception:
         pass
     return redirect(url_for('home'))
 
+@app.route("/rooms", methods=['POST'])
+def open_room():
+    """Öffnet einen Raum, dessen Gäste den Wiedergabestand des Hosts live mitverfolgen."""
+    token_info = get_token()
+    if token_info:
+        room_hub.open(get_user_key(), token_info)
+    return redirect(url_for('home'))
+
+@app.route("/rooms/close", methods=['POST'])
+def close_room():
+    room = room_hub.for_host(get_user_key())
+    if room is not None:
+        room_hub.close(room)
+    return redirect(url_for('home'))
+
+@app.route("/room")
+def join_room():
+    """Leitet das Beitrittsformular (?code=...) auf die Gastseite weiter."""
+    return redirect(url_for('room_page', code=request.args.get('code', '').strip().upper()))
+
+def get_room_or_404(code):
+    room = room_hub.get(code)
+    if room is None:
+        abort(404)
+    return room
+
+@app.route("/room/<code>")
+def room_page(code):
+    """Gastseite eines Raums; braucht keine Anmeldung und löst keine Spotify-Aufrufe aus."""
+    theme_name = session.get('theme', 'default')
+    palette = PALETTE_FRAGMENTS.get(theme_name, PALETTE_FRAGMENTS['default'])
+    room = room_hub.get(code)
+    if room is None:
+        return render_template('error.html', colors=palette['colors'], error=f"Raum {code} nicht gefunden."), 404
+    state = room.state or {'track_id': None, 'progress_ms': 0, 'duration_ms': 0, 'is_playing': False, 'show_solution': False}
+    return render_template('quiz.html', palette=palette, page_data=dict(state, guest_room=room.code), is_player_mode=False,
+                           show_solution=state['show_solution'], solution=state.get('solution') or {}, guest_room=room.code)
+
+@app.route("/room/<code>/state")
+def room_state(code):
+    """Letzter verteilter Stand des Raums (Fallback für Browser ohne EventSource)."""
+    state = get_room_or_404(code).state
+    response = jsonify(state or {'track_id': None})
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.route("/room/<code>/events")
+def room_events(code):
+    """Server-Sent-Events-Stream eines Raums: jeder neue Stand kommt als 'state'-Event, das Schließen als 'closed'."""
+    room = room_hub.get(code)
+    if room is None or not SSE_ENABLED:
+        return Response(status=204)
+    subscriber = room.subscribe()
+
+    def stream():
+        try:
+            yield f"retry: {polling_interval_seconds * 1000}\n\n"
+            deadline = time.time() + sse_stream_seconds
+            while time.time() < deadline:
+                try:
+                    state = subscriber.get(timeout=min(sse_keepalive_seconds, max(deadline - time.time(), 0.1)))
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if state is None:
+                    yield sse_message('closed', {'room': room.code})
+                    return
+                yield sse_message('state', state)
+        finally:
+            room.unsubscribe(subscriber)
+
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route("/assets/<filename>")
+def static_asset(filename):
+    """Liefert CSS/JS mit Inhalts-Hash im Namen; solche Dateien ändern sich nie und dürfen unbegrenzt gecacht werden."""
+    asset = STATIC_ASSETS.get(filename)
+    if asset is None:
+        abort(404)
+    use_gzip = request.accept_encodings['gzip'] > 0
+    response = Response(asset['gzip'] if use_gzip else asset['body'], mimetype=asset['mimetype'])
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Cache-Control'] = ASSET_CACHE_CONTROL
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.set_etag(asset['etag'])
+    return response
+
+def collect_stats():
+    """Statistiken aller Caches und Hintergrunddienste (für /stats und /metrics)."""
+    title_cache = normalize_title.cache_info()
+    return {
+        'resolution_cache': resolution_cache.stats(),
+        'playback_snapshots': playback_snapshots.stats(),
+        'spotify_clients': spotify_clients.stats(),
+        'tokens': token_manager.stats(),
+        'prefetch': resolution_prefetcher.stats(),
+        'version_clusters': version_clusters.stats(),
+        'search': search_fanout.stats(),
+        'original_index': original_index.stats() if original_index is not None else None,
+        'title_cache': {'entries': title_cache.currsize, 'hits': title_cache.hits, 'misses': title_cache.misses},
+        'sessions': session_store.stats() if session_store is not None else None,
+        'rate_limit': rate_governor.stats(),
+        'rooms': room_hub.stats(),
+    }
+
+def require_metrics_token():
+    """Bricht mit 404 ab, wenn METRICS_TOKEN fehlt oder der Request nicht das passende Bearer-Token mitbringt."""
+    expected = f"Bearer {METRICS_TOKEN}".encode('utf-8') if METRICS_TOKEN else None
+    if expected is None or not hmac.compare_digest(request.headers.get('Authorization', '').encode('utf-8'), expected):
+        abort(404)
+
+@app.route("/stats")
+def stats():
+    """Liefert Cache-Statistiken als JSON (nur mit METRICS_TOKEN)."""
+    require_metrics_token()
+    return jsonify(collect_stats())
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Latenz-Histogramme und Zähler dieses Worker-Prozesses im Prometheus-Textformat (nur mit METRICS_TOKEN)."""
+    require_metrics_token()
+    return Response(metrics.render(collect_stats()), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route("/set-theme/<theme_name>")
 def set_theme(theme_name):
     """Speichert die vom Nutzer gewählte Farbpalette in der Session."""
@@ -575,5 +2674,102 @@ def set_theme(theme_name):
     return redirect(url_for('home'))
 
 
+### 🛠️ KOMMANDOZEILE ###
+
+class RateLimiter:
+    """Verteilt Aufrufe gleichmäßig auf höchstens rate_per_second pro Sekunde (threadsicher)."""
+
+    def __init__(self, rate_per_second):
+        self.interval = 1.0 / rate_per_second
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+class RateLimitedSearch:
+    """Lässt jede Suchanfrage eines Clients (also jede Suchvariante) durch einen RateLimiter laufen."""
+
+    def __init__(self, sp, limiter):
+        self.sp = sp
+        self.limiter = limiter
+
+    def search(self, *args, **kwargs):
+        self.limiter.wait()
+        return self.sp.search(*args, **kwargs)
+
+def _collect_tracks(sp, playlists, track_refs):
+    """Lädt die Track-Objekte aus Playlists (URL, URI oder ID) und einzelnen Track-Referenzen."""
+    items = []
+    for playlist in playlists:
+        page = sp.playlist_items(playlist, additional_types=('track',))
+        while page:
+            items.extend(entry['track'] for entry in page['items'] if entry.get('track'))
+            page = sp.next(page) if page.get('next') else None
+    for start in range(0, len(track_refs), 50):
+        items.extend(track for track in sp.tracks(track_refs[start:start + 50])['tracks'] if track)
+    unique = {}
+    for item in items:
+        if item.get('id') and item.get('type', 'track') == 'track':
+            unique.setdefault(item['id'], item)
+    return list(unique.values())
+
+@app.cli.command('build-index')
+@click.argument('track_refs', nargs=-1)
+@click.option('--playlist', 'playlists', multiple=True, help='Playlist-URL, -URI oder -ID (mehrfach möglich).')
+@click.option('--tracks-file', type=click.File('r'), help='Datei mit einer Track-URL, -URI oder -ID pro Zeile.')
+@click.option('--index', 'index_path', default=ORIGINAL_INDEX_PATH, show_default=True, help='Pfad der SQLite-Indexdatei.')
+@click.option('--workers', default=8, show_default=True, help='Parallel aufgelöste Tracks.')
+@click.option('--rate', default=10.0, show_default=True,
+              help='Maximale Suchanfragen pro Sekunde (jede Suchvariante zählt, 3-6 pro Track); '
+                   'das gemeinsame Ratenbudget der App (spotify_rate_limit_per_second) gilt zusätzlich.')
+@click.option('--refresh', is_flag=True, help='Bereits indizierte Tracks erneut auflösen.')
+def build_index(track_refs, playlists, tracks_file, index_path, workers, rate, refresh):
+    """Löst Originaljahre für Playlists/Tracks vorab auf und schreibt sie in den Index, den home() zuerst abfragt."""
+    track_refs = list(track_refs)
+    if tracks_file:
+        track_refs.extend(line.strip() for line in tracks_file if line.strip())
+    # Das App-Token nur im Speicher halten, sonst legt spotipy eine .cache-Datei im Arbeitsverzeichnis an
+    credentials = SpotifyClientCredentials(client_id=os.environ.get('CLIENT_ID'), client_secret=os.environ.get('CLIENT_SECRET'),
+                                           cache_handler=spotipy.cache_handler.MemoryCacheHandler())
+    sp = PooledSpotify(auth_manager=use_accounts_url(credentials), requests_session=spotify_clients.http_session)
+    index = OriginalIndex(index_path)
+
+    items = _collect_tracks(sp, playlists, track_refs)
+    if not refresh:
+        known = index.known_ids()
+        items = [item for item in items if item['id'] not in known]
+    click.echo(f"{len(items)} Tracks aufzulösen ({index_path})")
+
+    searcher = RateLimitedSearch(sp, RateLimiter(rate))
+    def resolve(item):
+        try:
+            resolution, complete = search_original_version(searcher, item, early_exit=False)
+        except Exception as e:
+            click.echo(f"Fehler bei {item['id']} ({item.get('name')}): {e}", err=True)
+            return item['id'], None
+        if not complete:
+            # Teilergebnisse nicht dauerhaft festschreiben; ein späterer Lauf löst den Track erneut auf
+            click.echo(f"Unvollständige Suche bei {item['id']} ({item.get('name')}), übersprungen", err=True)
+            return item['id'], None
+        return item['id'], resolution
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = [(track_id, resolution) for track_id, resolution in executor.map(resolve, items) if resolution is not None]
+    elapsed = time.perf_counter() - start
+    index.put_many(results)
+
+    rate_achieved = len(results) / elapsed if elapsed > 0 else 0.0
+    click.echo(f"{len(results)} Tracks in {elapsed:.1f} s aufgelöst ({rate_achieved:.1f} Tracks/s, "
+               f"{search_fanout.stats()['queries']} Suchanfragen), "
+               f"{len(items) - len(results)} Fehler")
+
+
 if __name__ == "__main__":
     app.run(host='0.0.0.0', debug=True)
@@ -0,0 +1,66 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const progressTrack = document.getElementById('progressTrack'); const progressFill = document.getElementById('progressFill'); const interactiveArea = document.querySelector('.progress-interactive-area'); const svgWidth = 300; const svgHeight = 14; const midHeight = svgHeight / 2; const amplitude = 6; const frequency = 0.05; const segments = 150; const waveSpeed = {{ wave_animation_speed }};
+    const quizData = JSON.parse(document.getElementById('quiz-data').textContent);
+    let initialTrackId = quizData.track_id; const guestRoom = quizData.guest_room; const pollingInterval = {{ polling_interval_seconds }} * 1000; const useEvents = {{ 'true' if sse_enabled else 'false' }} && !!window.EventSource;
+    let currentProgress = quizData.progress_ms; let totalDuration = quizData.duration_ms; let isPlaying = quizData.is_playing;
+    let animationFrameId = null; let animationStartTime = performance.now(); let hiddenAt = null;
+    function generateWavePath(phase) { let path = `M 0 ${midHeight}`; for (let i = 0; i <= segments; i++) { const x = (i / segments) * svgWidth; const fadeWidth = svgWidth * 0.1; let currentAmplitude = amplitude; if (x < fadeWidth) { currentAmplitude = amplitude * Math.sin((x / fadeWidth) * (Math.PI / 2)); } else if (x > svgWidth - fadeWidth) { currentAmplitude = amplitude * Math.sin(((svgWidth - x) / fadeWidth) * (Math.PI / 2)); } const y = midHeight + Math.sin(x * frequency + phase) * currentAmplitude; path += ` L ${x.toFixed(3)} ${y.toFixed(3)}`; } return path; }
+    // Renderer und Bildrate lassen sich pro Anzeige per ?fps=, ?renderer=legacy (alter Pfad pro Frame) und ?frame-stats=1 (Messung) einstellen
+    const pageParams = new URLSearchParams(window.location.search); const useLegacyRenderer = pageParams.get('renderer') === 'legacy'; const targetFps = Number(pageParams.get('fps')) || {{ progress_bar_fps }}; const frameBudget = useLegacyRenderer ? 0 : 1000 / targetFps; const waveFrameCount = {{ progress_wave_frames }}; const fullTurn = 2 * Math.PI;
+    function drawLegacy(progress) { if (totalDuration > 0) { const progressRatio = Math.min(progress / totalDuration, 1); const dynamicPhase = progressRatio * Math.PI * waveSpeed; const wavePath = generateWavePath(dynamicPhase); progressTrack.setAttribute('d', wavePath); progressFill.setAttribute('d', wavePath); const totalLength = progressFill.getTotalLength(); if (totalLength > 0) { progressFill.style.strokeDasharray = totalLength; progressFill.style.strokeDashoffset = totalLength * (1 - progressRatio); } } }
+    // Die Welle ist in der Phase periodisch: eine Umdrehung wird einmal pro Seite in waveFrameCount Stufen berechnet (Pfad plus Länge, ohne getTotalLength()); pro Frame ändern sich dann nur Stufe und Dash-Offset
+    const waveFrames = new Array(waveFrameCount); let shownWaveFrame = -1; let shownDashOffset = -1;
+    function waveFrame(index) { if (!waveFrames[index]) { const phase = (index / waveFrameCount) * fullTurn; const fadeWidth = svgWidth * 0.1; let path = `M 0 ${midHeight}`; let length = 0; let previousX = 0; let previousY = midHeight; for (let i = 0; i <= segments; i++) { const x = (i / segments) * svgWidth; let currentAmplitude = amplitude; if (x < fadeWidth) { currentAmplitude = amplitude * Math.sin((x / fadeWidth) * (Math.PI / 2)); } else if (x > svgWidth - fadeWidth) { currentAmplitude = amplitude * Math.sin(((svgWidth - x) / fadeWidth) * (Math.PI / 2)); } const y = midHeight + Math.sin(x * frequency + phase) * currentAmplitude; path += ` L ${x.toFixed(3)} ${y.toFixed(3)}`; length += Math.hypot(x - previousX, y - previousY); previousX = x; previousY = y; } waveFrames[index] = { path: path, length: length }; } return waveFrames[index]; }
+    function drawFromTable(progress) { if (totalDuration > 0) { const progressRatio = Math.min(progress / totalDuration, 1); const index = Math.round(((progressRatio * Math.PI * waveSpeed) % fullTurn) / fullTurn * waveFrameCount) % waveFrameCount; const frame = waveFrame(index); if (index !== shownWaveFrame) { progressTrack.setAttribute('d', frame.path); progressFill.setAttribute('d', frame.path); progressFill.style.strokeDasharray = frame.length; shownWaveFrame = index; } const dashOffset = Math.round(frame.length * (1 - progressRatio) * 10) / 10; if (dashOffset !== shownDashOffset) { progressFill.style.strokeDashoffset = dashOffset; shownDashOffset = dashOffset; } } }
+    const drawProgress = useLegacyRenderer ? drawLegacy : drawFromTable;
+    if (!useLegacyRenderer) { (window.requestIdleCallback || setTimeout)(function() { for (let i = 0; i < waveFrameCount; i++) { waveFrame(i); } }); }
+    // Messung: Skriptzeit pro gezeichnetem Frame und Abstand der Frames; Layout/Paint danach zeigt nur das Performance-Panel der DevTools
+    const frameStats = pageParams.get('frame-stats') ? { work: [], gaps: [], lastAt: 0, box: null } : null;
+    function reportFrameStats() { const work = frameStats.work.slice().sort((a, b) => a - b); const gaps = frameStats.gaps; frameStats.work = []; frameStats.gaps = []; if (!work.length) { return; } const mean = work.reduce((sum, value) => sum + value, 0) / work.length; const p95 = work[Math.min(work.length - 1, Math.floor(work.length * 0.95))]; const longFrames = gaps.filter(gap => gap > 1000 / 60 * 1.5 && gap > frameBudget * 1.5).length; const text = `${useLegacyRenderer ? 'legacy' : 'table'} @ ${useLegacyRenderer ? 'rAF' : targetFps + ' fps'}: ${(work.length / 5).toFixed(1)} frames/s, script ${mean.toFixed(3)} ms avg / ${p95.toFixed(3)} ms p95, ${longFrames} long gaps`; console.log('[frame-stats]', text); if (!frameStats.box) { frameStats.box = document.createElement('div'); frameStats.box.className = 'frame-stats'; document.body.appendChild(frameStats.box); } frameStats.box.textContent = text; }
+    if (frameStats) { setInterval(reportFrameStats, 5000); }
+    function updateProgressBar(progress) { if (!frameStats) { drawProgress(progress); return; } const start = performance.now(); drawProgress(progress); frameStats.work.push(performance.now() - start); if (frameStats.lastAt) { frameStats.gaps.push(start - frameStats.lastAt); } frameStats.lastAt = start; }
+    let lastFrameAt = 0;
+    function animate(currentTime) { const newProgress = currentProgress + (currentTime - animationStartTime); if (newProgress < totalDuration) { animationFrameId = requestAnimationFrame(animate); } else { animationFrameId = null; currentProgress = newProgress; } const sinceLastFrame = currentTime - lastFrameAt; if (sinceLastFrame < frameBudget - 1 && animationFrameId) { return; } lastFrameAt = sinceLastFrame < 2 * frameBudget ? lastFrameAt + frameBudget : currentTime; updateProgressBar(newProgress); }
+    function startAnimation() { if (isPlaying && !animationFrameId && !document.hidden) { animationStartTime = performance.now(); lastFrameAt = 0; animationFrameId = requestAnimationFrame(animate); } }
+    function stopAnimation() { if (animationFrameId) { cancelAnimationFrame(animationFrameId); animationFrameId = null; currentProgress += performance.now() - animationStartTime; } }
+    // Im Hintergrund-Tab nichts zeichnen; beim Zurückkehren kommt die verborgene Zeit auf den gemerkten Stand, nach längerer Pause gleicht die Seite zusätzlich mit dem Server ab
+    document.addEventListener('visibilitychange', function() { if (document.hidden) { stopAnimation(); hiddenAt = performance.now(); } else { const hiddenFor = hiddenAt === null ? 0 : performance.now() - hiddenAt; hiddenAt = null; if (isPlaying) { currentProgress = Math.min(currentProgress + hiddenFor, totalDuration); } updateProgressBar(currentProgress); startAnimation(); if (hiddenFor > pollingInterval) { loadState(guestRoom ? `/room/${guestRoom}/state` : '/api/state'); } } });
+    updateProgressBar(currentProgress); startAnimation();
+    interactiveArea.addEventListener('click', function(event) { if (totalDuration > 0 && !guestRoom) { stopAnimation(); const rect = interactiveArea.getBoundingClientRect(); const clickX = event.clientX - rect.left; const clickPercentage = Math.max(0, Math.min(1, clickX / rect.width)); const seekPositionMs = Math.round(clickPercentage * totalDuration); currentProgress = seekPositionMs; updateProgressBar(currentProgress); startAnimation(); fetch('/seek', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ position_ms: seekPositionMs }) }).catch(error => console.error('Error seeking track:', error)); } });
+    const albumArt = document.getElementById('album-art'); const albumPlaceholder = document.getElementById('album-placeholder'); const solutionSection = document.getElementById('solution-section'); const questionSection = document.getElementById('question-section'); const playerModeToggle = document.getElementById('playerMode');
+    const solutionFields = ['track_name', 'artists', 'album_name', 'initial_release_year', 'cleaned_track_name', 'original_album_name'];
+    function setHidden(element, hidden) { if (element && element.hidden !== hidden) { element.hidden = hidden; } }
+    function setField(field, value) { const text = value == null ? '' : String(value); document.querySelectorAll(`[data-field="${field}"]`).forEach(element => { if (element.textContent !== text) { element.textContent = text; } }); }
+    function syncProgress(state) { stopAnimation(); currentProgress = state.progress_ms; totalDuration = state.duration_ms; isPlaying = state.is_playing; if (document.hidden) { hiddenAt = performance.now(); } updateProgressBar(currentProgress); startAnimation(); }
+    // Nur die Abschnitte anfassen, die sich gegenüber dem angezeigten Stand geändert haben
+    function applyState(state) { if (!state || !state.track_id) { return; } const solution = state.solution; setHidden(solutionSection, !solution); setHidden(questionSection, !!solution); setHidden(albumPlaceholder, !!solution); setHidden(albumArt, !solution); if (solution) { if (albumArt.getAttribute('src') !== solution.album_image_url) { albumArt.setAttribute('src', solution.album_image_url); } solutionFields.forEach(field => setField(field, solution[field])); setField('display_year', solution.has_original ? solution.original_release_year : solution.initial_release_year); document.querySelectorAll('[data-original-only]').forEach(element => setHidden(element, !solution.has_original)); } if (playerModeToggle && playerModeToggle.checked !== state.is_player_mode) { playerModeToggle.checked = state.is_player_mode; } initialTrackId = state.track_id; syncProgress(state); }
+    let pendingState = null;
+    function loadState(url, options) { if (pendingState && !options) { return pendingState; } const request = fetch(url, options).then(response => response.ok ? response.json() : Promise.reject('Failed to load state')).then(applyState).catch(error => console.error('Error loading state:', error)).finally(() => { if (pendingState === request) { pendingState = null; } }); pendingState = request; return request; }
+    // Eine per 304 bestätigte Seite kommt aus dem Browser-Cache; ihr Fortschritt ist dann veraltet
+    if (!guestRoom && quizData.rendered_at && Math.abs(Date.now() - quizData.rendered_at) > 2000) { loadState('/api/state'); }
+    function handleTrackId(trackId) { if (trackId && trackId !== initialTrackId) { loadState('/api/state'); } }
+    // Gäste eines Raums bekommen den fertigen Stand des Hosts gepusht und fragen nichts selbst ab
+    if (guestRoom) { if (useEvents) { const roomEvents = new EventSource(`/room/${guestRoom}/events`); roomEvents.addEventListener('state', function(event) { applyState(JSON.parse(event.data)); }); roomEvents.addEventListener('closed', function() { roomEvents.close(); window.location.reload(); }); } else { setInterval(function() { loadState(`/room/${guestRoom}/state`); }, pollingInterval); } }
+    else if (useEvents) { const trackEvents = new EventSource('/events'); trackEvents.addEventListener('track', function(event) { handleTrackId(JSON.parse(event.data).track_id); }); }
+    // Ohne SSE (kein gevent-Betrieb oder kein EventSource) fragt die Seite nach dem Plan des Servers ab (kurz nach Songende, sonst seltener)
+    else { const checkSong = function() { fetch('/check-song').then(response => response.ok ? response.json().then(data => { handleTrackId(data.track_id); setTimeout(checkSong, parseInt(response.headers.get('X-Next-Check-Ms'), 10) || pollingInterval); }) : Promise.reject('Network response was not ok')).catch(error => { console.error('Error during polling:', error); setTimeout(checkSong, pollingInterval); }); }; setTimeout(checkSong, pollingInterval); }
+    if (playerModeToggle) { playerModeToggle.addEventListener('change', function() { const isEnabled = this.checked; fetch('/toggle-player-mode', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ playerMode: isEnabled }) }).then(response => response.ok ? response.json() : Promise.reject('Failed to toggle mode')).then(data => { if (data.success) { loadState('/api/state'); } }).catch(error => console.error('Error:', error)); }); }
+    const solveButton = document.getElementById('solve-button');
+    if (solveButton) { solveButton.addEventListener('click', function(event) { event.preventDefault(); loadState('/solve', { method: 'POST' }); }); }
+
+    const themePickerToggle = document.getElementById('theme-picker-toggle');
+    const themeOptions = document.getElementById('theme-options');
+
+    if (themePickerToggle && themeOptions) {
+        themePickerToggle.addEventListener('click', function(event) {
+            event.stopPropagation(); 
+            themeOptions.classList.toggle('active');
+        });
+
+        document.addEventListener('click', function() {
+            if (themeOptions.classList.contains('active')) {
+                themeOptions.classList.remove('active');
+            }
+        });
+    }
+});
@@ -0,0 +1,162 @@
+"""Tests für ResolutionPrefetcher mit einem lokalen Ersatz für den Spotify-Client."""
+import importlib
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+quiz = importlib.import_module('spotify-quiz')
+
+
+def track(track_id):
+    return {'id': track_id, 'type': 'track', 'name': f"Song {track_id}", 'artists': [{'name': "Interpret"}],
+            'album': {'name': f"Album {track_id}", 'release_date': "2001-05-01"}}
+
+
+class StubSpotify:
+    """Beantwortet queue() und search() lokal; mit block=True hält jede Suche an, bis release() gerufen wird."""
+
+    def __init__(self, queue=(), block=False):
+        self._queue = list(queue)
+        self._released = threading.Event()
+        if not block:
+            self._released.set()
+        self._lock = threading.Lock()
+        self.searched = []
+
+    def queue(self):
+        return {'queue': self._queue}
+
+    def search(self, q, type, limit):
+        with self._lock:
+            self.searched.append(q)
+        self._released.wait(timeout=10)
+        return {'tracks': {'items': []}}
+
+    def release(self):
+        self._released.set()
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Bedingung nicht rechtzeitig erfüllt")
+        time.sleep(0.01)
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches(monkeypatch):
+    """Jeder Test beginnt ohne gecachte Auflösungen, Cluster und Index."""
+    monkeypatch.setattr(quiz, 'resolution_cache', quiz.ResolutionCache(100, 3600))
+    monkeypatch.setattr(quiz, 'version_clusters', quiz.VersionClusters(100))
+    monkeypatch.setattr(quiz, 'original_index', None)
+
+
+@pytest.fixture
+def make_prefetcher():
+    stubs = []
+
+    def make(stub, lookahead=0, max_pending=64, budget_per_user=30):
+        stubs.append(stub)
+        return quiz.ResolutionPrefetcher(max_workers=4, lookahead=lookahead, max_pending=max_pending,
+                                         budget_per_user=budget_per_user, budget_window_seconds=600,
+                                         client_factory=lambda token_info: stub)
+
+    yield make
+    # Blockierte Suchen freigeben, damit keine Threads hängen bleiben
+    for stub in stubs:
+        stub.release()
+
+
+def test_resolves_current_track_and_queue(make_prefetcher):
+    stub = StubSpotify(queue=[track('q1'), track('q2'), track('q3')])
+    prefetcher = make_prefetcher(stub, lookahead=2)
+
+    prefetcher.track_changed('user', {}, track('now'))
+
+    wait_until(lambda: prefetcher.stats()['resolved'] == 3)
+    for track_id in ('now', 'q1', 'q2'):
+        assert quiz.resolution_cache.get(track_id, count=False)['original_year'] == 2001
+    assert quiz.resolution_cache.get('q3', count=False) is None
+
+
+def test_same_track_is_scheduled_once_per_change(make_prefetcher):
+    prefetcher = make_prefetcher(StubSpotify())
+
+    prefetcher.track_changed('user', {}, track('a'))
+    prefetcher.track_changed('user', {}, track('a'))
+
+    wait_until(lambda: prefetcher.stats()['resolved'] == 1)
+    assert prefetcher.stats()['scheduled'] == 1
+
+
+def test_budget_exhaustion(make_prefetcher):
+    prefetcher = make_prefetcher(StubSpotify(), budget_per_user=2)
+
+    for track_id in ('a', 'b', 'c'):
+        prefetcher.track_changed('user', {}, track(track_id))
+    prefetcher.track_changed('other', {}, track('d'))
+
+    wait_until(lambda: prefetcher.stats()['resolved'] == 3)
+    stats = prefetcher.stats()
+    assert stats['scheduled'] == 3
+    assert stats['over_budget'] == 1
+    assert quiz.resolution_cache.get('c', count=False) is None
+    assert quiz.resolution_cache.get('d', count=False) is not None
+
+
+def test_drops_when_max_pending_is_reached(make_prefetcher):
+    stub = StubSpotify(block=True)
+    prefetcher = make_prefetcher(stub, max_pending=1)
+
+    prefetcher.track_changed('first', {}, track('a'))
+    prefetcher.track_changed('second', {}, track('b'))
+
+    stats = prefetcher.stats()
+    assert stats['in_flight'] == 1
+    assert stats['dropped'] == 1
+    stub.release()
+    wait_until(lambda: prefetcher.stats()['in_flight'] == 0)
+    assert quiz.resolution_cache.get('b', count=False) is None
+
+
+def test_skips_tracks_in_flight_or_cached(make_prefetcher):
+    stub = StubSpotify(block=True)
+    prefetcher = make_prefetcher(stub)
+    quiz.resolution_cache.set('cached', {'original_year': 1970, 'original_album': "Alt", 'cleaned_title': "Song cached"})
+
+    prefetcher.track_changed('first', {}, track('cached'))
+    prefetcher.track_changed('first', {}, track('a'))
+    prefetcher.track_changed('second', {}, track('a'))
+
+    stats = prefetcher.stats()
+    assert stats['already_cached'] == 1
+    assert stats['scheduled'] == 1
+    stub.release()
+    wait_until(lambda: prefetcher.stats()['resolved'] == 1)
+    assert not any('cached' in query for query in stub.searched)
+
+
+def test_wait_for_hands_over_in_flight_result(make_prefetcher):
+    stub = StubSpotify(block=True)
+    prefetcher = make_prefetcher(stub)
+    assert prefetcher.wait_for('a', timeout=0.01) is None
+
+    prefetcher.track_changed('user', {}, track('a'))
+    wait_until(lambda: stub.searched)
+    result = {}
+    waiter = threading.Thread(target=lambda: result.setdefault('resolution', prefetcher.wait_for('a', timeout=5)))
+    waiter.start()
+    time.sleep(0.05)
+    assert 'resolution' not in result
+    searches = len(stub.searched)
+
+    stub.release()
+    waiter.join(timeout=5)
+    assert result['resolution'] == {'original_year': 2001, 'original_album': "Album a", 'cleaned_title': "Song a"}
+    # Der Wartende hat keine eigene Suche gestartet
+    assert len(stub.searched) == searches